@@ -6,9 +6,16 @@ import re
 import csv
 import asyncio
 import base64
+import hashlib
+import math
+import pickle
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional, Set
+from typing import List, Dict, Tuple, Optional, Set, Union
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 
@@ -30,6 +37,12 @@ from fuzzywuzzy import fuzz, process
 from PIL import Image
 import io
 
+try:
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+    HAVE_RAPIDFUZZ = True
+except ImportError:  # 未安装 rapidfuzz 时退回 fuzzywuzzy 逐个打分
+    HAVE_RAPIDFUZZ = False
+
 
 class MatchMode(Enum):
     EXACT_ONLY = "exact_only"
@@ -163,6 +176,9 @@ class Config:
     support_image_formats: List[str] = None
     max_image_size: int = 1024
     batch_delay: float = 1.0
+    image_concurrency: int = 4
+    response_cache_enabled: bool = True
+    response_cache_max_mb: int = 512
     prompt_templates: PromptTemplates = field(default_factory=PromptTemplates)
     
     def __post_init__(self):
@@ -213,10 +229,18 @@ class Project:
             return cls(**data)
 
 class ImageUtils:
+    # LANCZOS 之前先按整数倍 reduce 到目标尺寸的 3 倍以内，画质几乎无差别但快得多
+    REDUCING_GAP = 3.0
+    
     @staticmethod
     def resize_image(image_path: str, max_size: int = 1024) -> Image.Image:
         with Image.open(image_path) as img:
-            if img.mode != 'RGB':
+            # JPEG 直接在解码时按 1/2、1/4、1/8 缩小，8K 大图不必整幅解码
+            if img.format == 'JPEG':
+                img.draft('RGB', (max_size, max_size))
+            
+            # 调色板/二值图缩放只能用最近邻，先转 RGB；其余模式缩小后再转换，省内存
+            if img.mode in ('1', 'P', 'PA'):
                 img = img.convert('RGB')
             
             width, height = img.size
@@ -224,16 +248,25 @@ class ImageUtils:
                 scale = max_size / max(width, height)
                 new_width = int(width * scale)
                 new_height = int(height * scale)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS,
+                                 reducing_gap=ImageUtils.REDUCING_GAP)
             
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.load()
             return img
     
     @staticmethod
     def image_to_base64(image: Image.Image, format: str = 'JPEG') -> str:
+        return ImageUtils.image_to_base64_bytes(image, format).decode('ascii')
+    
+    @staticmethod
+    def image_to_base64_bytes(image: Image.Image, format: str = 'JPEG') -> bytes:
+        """编码为 base64 字节串，直接读 BytesIO 的内部缓冲区，不再 getvalue 复制一份"""
         buffer = io.BytesIO()
         image.save(buffer, format=format, quality=85)
-        image_bytes = buffer.getvalue()
-        return base64.b64encode(image_bytes).decode('utf-8')
+        with buffer.getbuffer() as view:
+            return base64.b64encode(view)
     
     @staticmethod
     def get_images_from_folder(folder_path: str, supported_formats: List[str]) -> List[str]:
@@ -244,46 +277,247 @@ class ImageUtils:
                     image_files.append(os.path.join(root, file))
         return sorted(image_files)
 
+def file_digest(path: str) -> str:
+    """图片文件内容的 SHA-256，作为响应缓存的内容地址"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def prepare_image_base64(image_path: str, max_size: int) -> bytes:
+    """缩放并编码图片，供进程池调用（需为模块级函数才能被 pickle）"""
+    image = ImageUtils.resize_image(image_path, max_size)
+    return ImageUtils.image_to_base64_bytes(image)
+
+class TagIndex:
+    """标签模糊匹配索引：按长度分桶 + 三元组倒排表，在 load_tags 时一次性构建。
+
+    fuzz.ratio >= threshold 时两个字符串的长度比和编辑距离都有上界，据此只挑出
+    可能达标的候选标签（过滤是精确的，不会漏掉逐个比对能找到的结果），
+    再用 rapidfuzz.process.cdist 对一批词一次性打分。
+    """
+    NGRAM = 3
+
+    def __init__(self, tags: List[str]):
+        self.tags = tags
+        self.lengths = [len(tag) for tag in tags]
+        self.ids = {tag: tag_id for tag_id, tag in enumerate(tags)}
+        self.by_length: Dict[int, List[int]] = {}
+        self.postings: Dict[str, List[int]] = {}
+        for tag_id, tag in enumerate(tags):
+            self.by_length.setdefault(len(tag), []).append(tag_id)
+            for gram in self._grams(tag):
+                self.postings.setdefault(gram, []).append(tag_id)
+        # 每个长度桶的标签文本，打分时直接整桶交给 cdist，免去逐次拼列表
+        self.bucket_tags = {length: [tags[i] for i in ids] for length, ids in self.by_length.items()}
+
+    def __len__(self):
+        return len(self.tags)
+
+    @classmethod
+    def _grams(cls, text: str) -> Set[str]:
+        padded = f" {text} "
+        return {padded[i:i + cls.NGRAM] for i in range(len(padded) - cls.NGRAM + 1)}
+
+    def _plan(self, word: str, threshold: float) -> Tuple[List[int], Dict[int, int]]:
+        """
+        计算一个词需要比对的长度桶
+        返回: (整桶比对的长度列表, {需按三元组过滤的长度: 最少共享三元组数})
+        """
+        la = len(word)
+        t = threshold / 100.0
+        if la == 0 or t <= 0:
+            return list(self.by_length.keys()), {}
+        # ratio = 2*LCS/(la+lb)*100，LCS <= min(la, lb)，由此得到长度窗口
+        lo = max(1, math.ceil(la * t / (2 - t) - 1e-9))
+        hi = math.floor(la * (2 - t) / t + 1e-9)
+        q = self.NGRAM
+        gram_count = len(self._grams(word))
+        dense, sparse = [], {}
+        for length in range(lo, hi + 1):
+            if length not in self.by_length:
+                continue
+            # 删除一个字符最多破坏 q 个三元组、插入最多破坏 q-1 个
+            lcs_min = math.ceil(t * (la + length) / 2 - 1e-9)
+            need = gram_count - q * (la - lcs_min) - (q - 1) * (length - lcs_min)
+            if need > 0:
+                sparse[length] = need
+            else:
+                dense.append(length)
+        return dense, sparse
+
+    def _filtered_ids(self, word: str, sparse: Dict[int, int]) -> List[int]:
+        counts = Counter()
+        for gram in self._grams(word):
+            counts.update(self.postings.get(gram, ()))
+        lengths = self.lengths
+        return [tag_id for tag_id, c in counts.items()
+                if lengths[tag_id] in sparse and c >= sparse[lengths[tag_id]]]
+
+    def candidates(self, word: str, threshold: float) -> List[int]:
+        """返回可能达到阈值的候选标签 id"""
+        dense, sparse = self._plan(word, threshold)
+        ids = [tag_id for length in dense for tag_id in self.by_length[length]]
+        if sparse:
+            ids.extend(self._filtered_ids(word, sparse))
+        return ids
+
+    def match_batch(self, words: List[str], threshold: float, limit: int = 5,
+                    exclude: Set[str] = None) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        批量模糊匹配
+        返回: {词: [(标签, 相似度分数)]}，按分数降序、同分按标签库顺序
+        """
+        exclude_ids = {self.ids[tag] for tag in (exclude or ()) if tag in self.ids}
+        hits: Dict[str, Dict[int, float]] = {word: {} for word in words}
+        if not HAVE_RAPIDFUZZ:
+            for word in hits:
+                for tag_id in self.candidates(word, threshold):
+                    score = fuzz.ratio(word, self.tags[tag_id])
+                    if score >= threshold:
+                        hits[word][tag_id] = score
+        else:
+            dense_groups: Dict[int, List[str]] = {}
+            for word in hits:
+                dense, sparse = self._plan(word, threshold)
+                for length in dense:
+                    dense_groups.setdefault(length, []).append(word)
+                if sparse:
+                    ids = self._filtered_ids(word, sparse)
+                    if ids:
+                        scores = rf_process.cdist([word], [self.tags[i] for i in ids],
+                                                  scorer=rf_fuzz.ratio, score_cutoff=threshold)[0]
+                        for col in scores.nonzero()[0]:
+                            hits[word][ids[col]] = float(scores[col])
+            # 同一长度桶的所有词一次 cdist，矩阵运算在 C 层多线程完成
+            for length, group in dense_groups.items():
+                matrix = rf_process.cdist(group, self.bucket_tags[length], scorer=rf_fuzz.ratio,
+                                          score_cutoff=threshold, workers=-1)
+                bucket = self.by_length[length]
+                for row, word in enumerate(group):
+                    scores = matrix[row]
+                    for col in scores.nonzero()[0]:
+                        hits[word][bucket[col]] = float(scores[col])
+
+        results = {}
+        for word, found in hits.items():
+            ranked = sorted((item for item in found.items() if item[0] not in exclude_ids),
+                            key=lambda x: (-x[1], x[0]))
+            results[word] = [(self.tags[tag_id], score) for tag_id, score in ranked[:limit]]
+        return results
+
 class TagManager:
+    # 标签库缓存格式版本，TagIndex 结构变化时需要递增
+    CACHE_VERSION = 1
+    
     def __init__(self, csv_path: str = None):
         self.tags_df = None
         self.tags_dict = {}  
         self.synonyms_dict = {}  
+        self.tag_index = TagIndex([])
         self.blacklist = set()
+        self.load_info = ""
+        self.library_key = ""  # 已加载标签库文件的标识（路径+修改时间+大小），用于响应缓存失效
         if csv_path and os.path.exists(csv_path):
             self.load_tags(csv_path)
     
+    @staticmethod
+    def cache_path_for(csv_path: str) -> str:
+        return csv_path + ".tagcache"
+    
     def load_tags(self, csv_path: str):
         try:
-            # 读取CSV文件，假设格式为：tag,category,weight,synonyms
-            self.tags_df = pd.read_csv(csv_path, header=None, encoding='utf-8')
-            self.tags_df.columns = ['tag', 'category', 'weight', 'synonyms']
+            start = time.perf_counter()
+            stat = os.stat(csv_path)
+            cache_key = (self.CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+            was_empty = not self.tags_dict
             
-            # 构建标签字典和同义词字典
-            for _, row in self.tags_df.iterrows():
-                tag = row['tag']
-                weight = row['weight']
-                synonyms = str(row['synonyms']).split(',') if pd.notna(row['synonyms']) else []
-                
-                self.tags_dict[tag] = weight
-                
-                # 构建同义词映射
-                for synonym in synonyms:
-                    synonym = synonym.strip()
-                    if synonym:
-                        self.synonyms_dict[synonym.lower()] = tag
-                        
+            cached = self._read_cache(csv_path, cache_key)
+            if cached:
+                tags_dict, synonyms_dict, tag_index = cached
+                self.tags_df = None
+                source = "缓存"
+            else:
+                tags_dict, synonyms_dict = self._parse_csv(csv_path)
+                tag_index = None
+                source = "CSV"
+            
+            self.tags_dict.update(tags_dict)
+            self.synonyms_dict.update(synonyms_dict)
+            
+            # 缓存里的索引只覆盖这一个文件，叠加加载多个标签库时需要重建
+            if tag_index is None or not was_empty:
+                # 模糊匹配索引只收字符串标签（与逐个比对时 fuzz.ratio 的输入一致）
+                tag_index = TagIndex([tag for tag in self.tags_dict if isinstance(tag, str) and tag])
+            self.tag_index = tag_index
+            
+            if not cached:
+                self._write_cache(csv_path, cache_key, tags_dict, synonyms_dict,
+                                  tag_index if was_empty else None)
+            
+            self.library_key += f"{os.path.abspath(csv_path)}:{stat.st_mtime_ns}:{stat.st_size};"
+            self.load_info = f"{len(tags_dict)} 个标签，来自{source}，耗时 {time.perf_counter() - start:.2f}s"
             return True
         except Exception as e:
             print(f"加载标签库失败: {e}")
             return False
     
+    def _parse_csv(self, csv_path: str) -> Tuple[Dict, Dict]:
+        # 读取CSV文件，假设格式为：tag,category,weight,synonyms
+        self.tags_df = pd.read_csv(csv_path, header=None, encoding='utf-8')
+        self.tags_df.columns = ['tag', 'category', 'weight', 'synonyms']
+        
+        # 构建标签字典（重复标签以后出现的为准，与逐行写入一致）
+        tags_dict = dict(zip(self.tags_df['tag'].tolist(), self.tags_df['weight'].tolist()))
+        
+        # 构建同义词映射：按逗号拆开后展开成一行一个
+        rows = self.tags_df.loc[self.tags_df['synonyms'].notna(), ['tag', 'synonyms']]
+        synonyms = rows.assign(synonyms=rows['synonyms'].astype(str).str.split(',')).explode('synonyms')
+        synonyms['synonyms'] = synonyms['synonyms'].str.strip()
+        synonyms = synonyms[synonyms['synonyms'] != '']
+        synonyms_dict = dict(zip(synonyms['synonyms'].str.lower().tolist(), synonyms['tag'].tolist()))
+        
+        return tags_dict, synonyms_dict
+    
+    def _read_cache(self, csv_path: str, cache_key: Tuple) -> Optional[Tuple[Dict, Dict, Optional[TagIndex]]]:
+        cache_path = self.cache_path_for(csv_path)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('key') != cache_key:
+                return None
+            return data['tags_dict'], data['synonyms_dict'], data.get('tag_index')
+        except Exception as e:
+            print(f"标签库缓存无效，重新读取CSV: {e}")
+            return None
+    
+    def _write_cache(self, csv_path: str, cache_key: Tuple, tags_dict: Dict, synonyms_dict: Dict,
+                     tag_index: Optional[TagIndex]):
+        cache_path = self.cache_path_for(csv_path)
+        tmp_path = cache_path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({
+                    'key': cache_key,
+                    'tags_dict': tags_dict,
+                    'synonyms_dict': synonyms_dict,
+                    'tag_index': tag_index,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # 标签库所在目录不可写时只是少了缓存，不影响使用
+            print(f"写入标签库缓存失败: {e}")
+    
     def search_tags(self, words: List[str], match_mode: MatchMode, threshold: int = 80) -> Dict[str, Tuple[str, int, float]]:
         """
         搜索标签
         返回: {原词: (匹配的标准tag, 权重, 相似度分数)}
         """
         results = {}
+        fuzzy_words = {}
         
         for word in words:
             word_lower = word.lower().strip()
@@ -296,24 +530,23 @@ class TagManager:
                     results[word] = (None, 0, 0.0)
                     
             elif match_mode == MatchMode.FUZZY_ONLY:
-                candidates = self.fuzzy_match(word_lower, threshold)
-                if candidates:
-                    results[word] = candidates
-                else:
-                    results[word] = (None, 0, 0.0)
+                fuzzy_words[word] = word_lower
                     
             elif match_mode == MatchMode.EXACT_THEN_FUZZY:
                 result = self._exact_match(word_lower)
                 if result:
                     results[word] = result
                 else:
-                    candidates = self.fuzzy_match(word_lower, threshold)
-                    if candidates:
-                        results[word] = candidates
-                    else:
-                        results[word] = (None, 0, 0.0)
+                    fuzzy_words[word] = word_lower
         
-        return results
+        # 需要模糊匹配的词一次性交给索引批量打分
+        if fuzzy_words:
+            batch = self._fuzzy_batch(list(set(fuzzy_words.values())), threshold)
+            for word, word_lower in fuzzy_words.items():
+                candidates = batch.get(word_lower)
+                results[word] = candidates if candidates else (None, 0, 0.0)
+        
+        return {word: results[word] for word in words}
     
     def _exact_match(self, word: str) -> Optional[Tuple[str, int, float]]:
         if word in self.tags_dict and word not in self.blacklist:
@@ -325,19 +558,17 @@ class TagManager:
         
         return None
     
+    def _fuzzy_batch(self, words: List[str], threshold: int = 80,
+                     max_candidates: int = 5) -> Dict[str, List[Tuple[str, int, float]]]:
+        # 复制一份黑名单：并发处理图片时其他任务可能正在往里加
+        matches = self.tag_index.match_batch(words, threshold, max_candidates, set(self.blacklist))
+        return {
+            word: [(tag, self.tags_dict[tag], score) for tag, score in found]
+            for word, found in matches.items()
+        }
+    
     def fuzzy_match(self, word: str, threshold: int = 80, max_candidates: int = 5) -> List[Tuple[str, int, float]]:
-        candidates = []
-        
-        for tag in self.tags_dict.keys():
-            if tag in self.blacklist:
-                continue
-                
-            score = fuzz.ratio(word, tag)
-            if score >= threshold:
-                candidates.append((tag, self.tags_dict[tag], score))
-        
-        candidates.sort(key=lambda x: x[2], reverse=True)
-        return candidates[:max_candidates]
+        return self._fuzzy_batch([word], threshold, max_candidates)[word]
     
     def add_to_blacklist(self, tag: str):
         self.blacklist.add(tag)
@@ -345,13 +576,84 @@ class TagManager:
     def clear_blacklist(self):
         self.blacklist.clear()
 
+class ResponseCache:
+    """
+    图片识别结果的本地缓存（SQLite）
+    键由图片内容哈希 + 模型 + 提示词模板等拼出，内容不变就直接复用上次的结果；
+    总大小超过上限时按最近使用时间淘汰。
+    """
+    
+    def __init__(self, db_path: str = "aitag_cache.db", max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return row[0]
+    
+    def put(self, key: str, value: str):
+        size = len(value.encode('utf-8'))
+        old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, value, size, time.time())
+        )
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+    
+    def _evict(self):
+        # 一次淘汰到上限的 90%，避免每次写入都触发
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        removed = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            removed.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+    
+    def stats(self) -> str:
+        return f"命中 {self.hits}，未命中 {self.misses}，占用 {self.total_bytes / 1024 / 1024:.1f} MB"
+    
+    def close(self):
+        self.conn.close()
+
 class OpenAIClient:
+    # 请求体里图片数据的占位符：先序列化 JSON，再把 base64 字节原样拼进去，
+    # 省去大字符串的 JSON 转义和多次复制
+    IMAGE_PLACEHOLDER = "__AITAG_IMAGE_BASE64__"
+    
     def __init__(self, config: Config):
         self.config = config
         self.session = None
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # 所有并发请求共用一个会话，连接池上限随并发数放宽，避免排队等连接
+        connector = aiohttp.TCPConnector(limit=max(10, self.config.image_concurrency * 2))
+        self.session = aiohttp.ClientSession(connector=connector)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -379,7 +681,7 @@ class OpenAIClient:
             print(f"获取模型列表失败: {e}")
             return []
     
-    async def chat_completion(self, messages: List[Dict], stream: bool = True):
+    async def chat_completion(self, messages: List[Dict], stream: bool = True, image_data: bytes = None):
         headers = {
             "Authorization": f"Bearer {self.config.api_key}",
             "Content-Type": "application/json"
@@ -393,11 +695,18 @@ class OpenAIClient:
             "stream": stream
         }
         
+        if image_data is not None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            prefix, suffix = body.split(self.IMAGE_PLACEHOLDER.encode('ascii'), 1)
+            request_body = {"data": b"".join((prefix, image_data, suffix))}
+        else:
+            request_body = {"json": payload}
+        
         try:
             async with self.session.post(
                 f"{self.config.api_base}/chat/completions",
                 headers=headers,
-                json=payload
+                **request_body
             ) as response:
                 if stream:
                     async for line in response.content:
@@ -420,7 +729,7 @@ class OpenAIClient:
         except Exception as e:
             yield f"错误: {str(e)}"
     
-    async def extract_image_words(self, image_base64: str) -> str:
+    async def extract_image_words(self, image_base64: Union[str, bytes]) -> str:
         """从图片中提取词汇"""
         messages = [
             {
@@ -434,7 +743,7 @@ class OpenAIClient:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
+                            "url": f"data:image/jpeg;base64,{self.IMAGE_PLACEHOLDER}",
                             "detail": "high"
                         }
                     }
@@ -442,13 +751,16 @@ class OpenAIClient:
             }
         ]
         
+        if isinstance(image_base64, str):
+            image_base64 = image_base64.encode('ascii')
+        
         response_text = ""
-        async for chunk in self.chat_completion(messages, stream=True):
+        async for chunk in self.chat_completion(messages, stream=True, image_data=image_base64):
             response_text += chunk
         
         return response_text
     
-    async def generate_final_image_prompt(self, image_base64: str, matched_tags: List[str], unmatched_words: List[str]) -> str:
+    async def generate_final_image_prompt(self, image_base64: Union[str, bytes], matched_tags: List[str], unmatched_words: List[str]) -> str:
         """基于图片和标签生成最终提示词"""
         prompt = self.config.prompt_templates.image_final_user.format(
             matched_tags=', '.join(matched_tags),
@@ -467,7 +779,7 @@ class OpenAIClient:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
+                            "url": f"data:image/jpeg;base64,{self.IMAGE_PLACEHOLDER}",
                             "detail": "high"
                         }
                     }
@@ -475,8 +787,11 @@ class OpenAIClient:
             }
         ]
         
+        if isinstance(image_base64, str):
+            image_base64 = image_base64.encode('ascii')
+        
         response_text = ""
-        async for chunk in self.chat_completion(messages, stream=True):
+        async for chunk in self.chat_completion(messages, stream=True, image_data=image_base64):
             response_text += chunk
         
         return response_text
@@ -497,6 +812,7 @@ class ImageWorkerThread(QThread):
         self.is_running = False
         self.process_mode = ImageProcessMode.SINGLE
         self.match_mode = MatchMode.EXACT_THEN_FUZZY
+        self.cache: Optional[ResponseCache] = None
         
     def run(self):
         self.is_running = True
@@ -506,32 +822,81 @@ class ImageWorkerThread(QThread):
     async def process_images(self):
         try:
             total_images = len(self.image_paths)
-            self.log_signal.emit(f"开始处理 {total_images} 张图片")
+            concurrency = max(1, min(self.config.image_concurrency, total_images))
+            self.log_signal.emit(f"开始处理 {total_images} 张图片（并发 {concurrency}）")
             
-            async with OpenAIClient(self.config) as client:
-                for i, image_path in enumerate(self.image_paths):
-                    if not self.is_running:
-                        break
-                    
-                    self.log_signal.emit(f"正在处理图片: {os.path.basename(image_path)}")
-                    self.batch_progress_signal.emit(i + 1, total_images)
-                    
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue()
+            for image_path in self.image_paths:
+                queue.put_nowait(image_path)
+            timings = {}
+            done = 0
+            started = time.perf_counter()
+            
+            # 图片缩放编码是 CPU 密集型，批量时放进进程池，不占用事件循环
+            pool = ProcessPoolExecutor(max_workers=min(concurrency, os.cpu_count() or 1)) if total_images > 1 else None
+            self.cache = ResponseCache(max_bytes=self.config.response_cache_max_mb * 1024 * 1024) \
+                if self.config.response_cache_enabled else None
+            
+            async def worker(client: OpenAIClient):
+                nonlocal done
+                while self.is_running:
                     try:
-                        # 处理单张图片
-                        result = await self.process_single_image(client, image_path)
-                        
-                        self.result_signal.emit(image_path, result)
-                        self.log_signal.emit(f"✓ {os.path.basename(image_path)} 处理完成")
+                        image_path = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    name = os.path.basename(image_path)
+                    self.log_signal.emit(f"正在处理图片: {name}")
+                    try:
+                        image_digest = None
+                        result = None
+                        if self.cache:
+                            image_digest = await loop.run_in_executor(pool, file_digest, image_path)
+                            result = self.cache.get(self.result_cache_key(image_digest))
                         
-                        # 批量处理时添加延迟
-                        if self.process_mode == ImageProcessMode.BATCH and i < total_images - 1:
-                            await asyncio.sleep(self.config.batch_delay)
+                        if result is not None:
+                            self.log_signal.emit(f"  [{name}] 使用缓存结果")
+                        else:
+                            stage_start = time.perf_counter()
+                            image_base64 = await loop.run_in_executor(
+                                pool, prepare_image_base64, image_path, self.config.max_image_size
+                            )
+                            timings.setdefault("加载图片", []).append(time.perf_counter() - stage_start)
                             
+                            # 处理单张图片
+                            result = await self.process_single_image(client, image_path, image_base64, timings,
+                                                                     image_digest)
+                        
+                        self.result_signal.emit(image_path, result)
+                        self.log_signal.emit(f"✓ {name} 处理完成")
                     except Exception as e:
-                        self.log_signal.emit(f"✗ {os.path.basename(image_path)} 处理失败: {str(e)}")
+                        self.log_signal.emit(f"✗ {name} 处理失败: {str(e)}")
                         self.result_signal.emit(image_path, f"处理失败: {str(e)}")
-                
-                self.log_signal.emit(f"图片处理完成，共处理 {len(self.image_paths)} 张图片")
+                    
+                    done += 1
+                    self.batch_progress_signal.emit(done, total_images)
+                    
+                    # 批量处理时每个并发通道各自间隔，控制整体请求速率
+                    if self.process_mode == ImageProcessMode.BATCH and not queue.empty():
+                        await asyncio.sleep(self.config.batch_delay)
+            
+            try:
+                async with OpenAIClient(self.config) as client:
+                    await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            finally:
+                if pool:
+                    pool.shutdown(cancel_futures=True)
+                if self.cache:
+                    self.log_signal.emit(f"响应缓存: {self.cache.stats()}")
+                    self.cache.close()
+                    self.cache = None
+            
+            elapsed = time.perf_counter() - started
+            self.log_signal.emit(f"图片处理完成，共处理 {done}/{total_images} 张图片，耗时 {elapsed:.1f}s"
+                                 f"（{done / elapsed * 60 if elapsed else 0:.1f} 张/分钟）")
+            for stage, values in timings.items():
+                self.log_signal.emit(f"  {stage}: 平均 {sum(values) / len(values):.2f}s，"
+                                     f"最长 {max(values):.2f}s，共 {len(values)} 次")
                 
         except Exception as e:
             self.log_signal.emit(f"图片处理错误: {str(e)}")
@@ -539,42 +904,80 @@ class ImageWorkerThread(QThread):
             self.finished_signal.emit()
             self.is_running = False
     
-    async def process_single_image(self, client: OpenAIClient, image_path: str) -> str:
+    def result_cache_key(self, image_digest: str) -> str:
+        """整张图片最终结果的缓存键：图片内容、模型、全部模板与匹配设置都不变才命中"""
+        return ResponseCache.make_key(
+            "result", image_digest, self.config.model, self.config.max_image_size,
+            asdict(self.config.prompt_templates), self.match_mode.value,
+            self.config.fuzzy_threshold, self.tag_manager.library_key
+        )
+    
+    def extract_cache_key(self, image_digest: str) -> str:
+        """词汇提取响应的缓存键：只与图片和提取模板有关，其他模板改了仍可复用"""
+        templates = self.config.prompt_templates
+        return ResponseCache.make_key(
+            "extract", image_digest, self.config.model, self.config.max_image_size,
+            templates.image_extract_system, templates.image_extract_user
+        )
+    
+    async def process_single_image(self, client: OpenAIClient, image_path: str,
+                                   image_base64: bytes = None, timings: Dict[str, List[float]] = None,
+                                   image_digest: str = None) -> str:
         """处理单张图片的完整流程"""
+        if timings is None:
+            timings = {}
+        name = os.path.basename(image_path)
+        
+        def record(stage: str, stage_start: float):
+            timings.setdefault(stage, []).append(time.perf_counter() - stage_start)
+        
         try:
             # 加载和处理图片
             self.step_progress_signal.emit("加载图片", 10)
-            image = ImageUtils.resize_image(image_path, self.config.max_image_size)
-            image_base64 = ImageUtils.image_to_base64(image)
+            if image_base64 is None:
+                stage_start = time.perf_counter()
+                image_base64 = prepare_image_base64(image_path, self.config.max_image_size)
+                record("加载图片", stage_start)
             
             # 提取词汇
             self.step_progress_signal.emit("提取词汇", 25)
-            self.log_signal.emit("  正在提取图片词汇...")
-            words_response = await client.extract_image_words(image_base64)
+            self.log_signal.emit(f"  [{name}] 正在提取图片词汇...")
+            stage_start = time.perf_counter()
+            extract_key = self.extract_cache_key(image_digest) if self.cache and image_digest else None
+            words_response = self.cache.get(extract_key) if extract_key else None
+            cached_words = words_response is not None
+            if not cached_words:
+                words_response = await client.extract_image_words(image_base64)
+                record("提取词汇", stage_start)
             
             # 解析提取的词汇
             words = self.extract_words_from_response(words_response)
             if words:
-                self.log_signal.emit(f"  提取到词汇: {', '.join(words)}")
+                if extract_key and not cached_words:
+                    self.cache.put(extract_key, words_response)
+                self.log_signal.emit(f"  [{name}] 提取到词汇{'（缓存）' if cached_words else ''}: {', '.join(words)}")
             else:
-                self.log_signal.emit("  未能提取到有效词汇")
+                self.log_signal.emit(f"  [{name}] 未能提取到有效词汇")
                 return "无法从图片中提取出有效的词汇"
             
             # 标签库匹配
             self.step_progress_signal.emit("匹配标签", 50)
-            self.log_signal.emit("  正在匹配标签库...")
+            self.log_signal.emit(f"  [{name}] 正在匹配标签库...")
+            stage_start = time.perf_counter()
             
             # 搜索标签（最多3次）
             final_tags = {}
             unmatched_words = []
             
             for attempt in range(3):
-                self.log_signal.emit(f"    第{attempt + 1}次匹配...")
+                self.log_signal.emit(f"    [{name}] 第{attempt + 1}次匹配...")
                 
-                search_results = self.tag_manager.search_tags(
+                # 模糊匹配在线程里跑，不阻塞其他图片的网络请求
+                search_results = await asyncio.to_thread(
+                    self.tag_manager.search_tags,
                     words, 
                     self.match_mode,
-                    threshold=self.config.fuzzy_threshold
+                    self.config.fuzzy_threshold
                 )
                 
                 # 处理搜索结果
@@ -590,14 +993,14 @@ class ImageWorkerThread(QThread):
                             unmatched.append(word)
                     elif result[0]:  # 精确匹配
                         matched_tags[result[0]] = result[1]
-                        self.log_signal.emit(f"    ✓ '{word}' -> '{result[0]}' (权重: {result[1]})")
+                        self.log_signal.emit(f"    [{name}] ✓ '{word}' -> '{result[0]}' (权重: {result[1]})")
                     else:  # 未匹配
                         unmatched.append(word)
-                        self.log_signal.emit(f"    ✗ '{word}' 未找到匹配")
+                        self.log_signal.emit(f"    [{name}] ✗ '{word}' 未找到匹配")
                 
                 # 验证模糊匹配
                 if fuzzy_candidates and self.match_mode != MatchMode.EXACT_ONLY:
-                    self.log_signal.emit(f"    验证{len(fuzzy_candidates)}个模糊匹配...")
+                    self.log_signal.emit(f"    [{name}] 验证{len(fuzzy_candidates)}个模糊匹配...")
                     verified_tags = await self.verify_fuzzy_matches_for_image(
                         client, image_path, fuzzy_candidates
                     )
@@ -605,10 +1008,10 @@ class ImageWorkerThread(QThread):
                     for word, (tag, weight) in verified_tags.items():
                         if tag:
                             matched_tags[tag] = weight
-                            self.log_signal.emit(f"    ✓ '{word}' -> '{tag}' (模糊匹配，权重: {weight})")
+                            self.log_signal.emit(f"    [{name}] ✓ '{word}' -> '{tag}' (模糊匹配，权重: {weight})")
                         else:
                             unmatched.append(word)
-                            self.log_signal.emit(f"    ✗ '{word}' 模糊匹配验证失败")
+                            self.log_signal.emit(f"    [{name}] ✗ '{word}' 模糊匹配验证失败")
                 
                 # 更新最终标签
                 final_tags.update(matched_tags)
@@ -618,12 +1021,15 @@ class ImageWorkerThread(QThread):
                     break
                 
                 # 重新生成未匹配词汇
-                self.log_signal.emit(f"    重新生成未匹配词汇: {', '.join(unmatched)}")
+                self.log_signal.emit(f"    [{name}] 重新生成未匹配词汇: {', '.join(unmatched)}")
                 words = await self.regenerate_words_for_image(client, unmatched)
             
+            record("匹配标签", stage_start)
+            
             # 生成最终提示词
             self.step_progress_signal.emit("生成提示词", 75)
-            self.log_signal.emit("  正在生成最终提示词...")
+            self.log_signal.emit(f"  [{name}] 正在生成最终提示词...")
+            stage_start = time.perf_counter()
             
             # 按权重排序标签
             sorted_tags = sorted(final_tags.items(), key=lambda x: x[1], reverse=True)
@@ -633,6 +1039,7 @@ class ImageWorkerThread(QThread):
             final_response = await client.generate_final_image_prompt(
                 image_base64, tags_list, unmatched_words
             )
+            record("生成提示词", stage_start)
             
             # 提取最终提示词
             match = re.search(r'PROMPT:\s*(.+)', final_response, re.IGNORECASE | re.DOTALL)
@@ -645,11 +1052,14 @@ class ImageWorkerThread(QThread):
                     all_tags.append(f"({word})")
                 final_prompt = ', '.join(all_tags)
             
+            if self.cache and image_digest:
+                self.cache.put(self.result_cache_key(image_digest), final_prompt)
+            
             self.step_progress_signal.emit("完成", 100)
             return final_prompt
             
         except Exception as e:
-            self.log_signal.emit(f"  处理图片时发生错误: {str(e)}")
+            self.log_signal.emit(f"  [{name}] 处理图片时发生错误: {str(e)}")
             return f"处理失败: {str(e)}"
     
     def extract_words_from_response(self, response: str) -> List[str]:
@@ -1394,6 +1804,19 @@ class SettingsDialog(QDialog):
         image_form.addRow("最大图片尺寸:", self.max_image_size_spin)
         image_form.addRow("批量处理延迟:", self.batch_delay_spin)
         
+        self.image_concurrency_spin = QSpinBox()
+        self.image_concurrency_spin.setRange(1, 32)
+        self.image_concurrency_spin.setToolTip("批量处理时同时在途的图片数，过大容易触发接口限流")
+        image_form.addRow("并发处理数:", self.image_concurrency_spin)
+        
+        self.response_cache_check = QCheckBox("复用未变化图片的识别结果")
+        self.response_cache_spin = QSpinBox()
+        self.response_cache_spin.setRange(16, 10240)
+        self.response_cache_spin.setSingleStep(64)
+        self.response_cache_spin.setSuffix(" MB")
+        image_form.addRow("响应缓存:", self.response_cache_check)
+        image_form.addRow("缓存上限:", self.response_cache_spin)
+        
         formats_label = QLabel("支持的图片格式:")
         formats_text = QLabel(", ".join(self.config.support_image_formats))
         image_form.addRow(formats_label, formats_text)
@@ -1436,6 +1859,9 @@ class SettingsDialog(QDialog):
         self.max_candidates_spin.setValue(self.config.max_fuzzy_candidates)
         self.max_image_size_spin.setValue(self.config.max_image_size)
         self.batch_delay_spin.setValue(int(self.config.batch_delay))
+        self.image_concurrency_spin.setValue(self.config.image_concurrency)
+        self.response_cache_check.setChecked(self.config.response_cache_enabled)
+        self.response_cache_spin.setValue(self.config.response_cache_max_mb)
         
         match_mode = MatchMode(self.config.match_mode)
         if match_mode == MatchMode.EXACT_ONLY:
@@ -1482,6 +1908,9 @@ class SettingsDialog(QDialog):
         self.config.max_fuzzy_candidates = self.max_candidates_spin.value()
         self.config.max_image_size = self.max_image_size_spin.value()
         self.config.batch_delay = self.batch_delay_spin.value()
+        self.config.image_concurrency = self.image_concurrency_spin.value()
+        self.config.response_cache_enabled = self.response_cache_check.isChecked()
+        self.config.response_cache_max_mb = self.response_cache_spin.value()
         
         if self.exact_only_radio.isChecked():
             self.config.match_mode = MatchMode.EXACT_ONLY.value
@@ -2014,8 +2443,10 @@ class MainWindow(QMainWindow):
     def load_tag_library(self):
         default_path = "tags.csv"
         if os.path.exists(default_path):
-            self.tag_manager.load_tags(default_path)
-            self.log(f"已加载标签库: {len(self.tag_manager.tags_dict)} 个标签")
+            if self.tag_manager.load_tags(default_path):
+                self.log(f"已加载标签库: {self.tag_manager.load_info}")
+            else:
+                self.log("加载默认标签库 tags.csv 失败")
         else:
             self.log("未找到默认标签库文件 tags.csv")
     
@@ -2029,7 +2460,7 @@ class MainWindow(QMainWindow):
         
         if file_path:
             if self.tag_manager.load_tags(file_path):
-                self.log(f"已加载标签库: {len(self.tag_manager.tags_dict)} 个标签")
+                self.log(f"已加载标签库: {self.tag_manager.load_info}，当前共 {len(self.tag_manager.tags_dict)} 个标签")
                 QMessageBox.information(self, "成功", f"已加载 {len(self.tag_manager.tags_dict)} 个标签")
             else:
                 QMessageBox.warning(self, "失败", "加载标签库失败")
@@ -0,0 +1,105 @@
+# bench_image_encode.py
+"""
+图片缩放编码基准：按尺寸档位比较旧流程与 ImageUtils 快速路径的吞吐和峰值内存
+
+  旧流程：完整解码 -> convert('RGB') -> LANCZOS 缩放 -> getvalue() -> base64 -> str
+  快速路径：JPEG draft 解码缩小 / reduce 预缩小 -> LANCZOS -> 直接读缓冲区 base64
+
+每个档位在独立子进程里运行，峰值内存取子进程开始处理前后的最大常驻内存差值
+（Linux 上子进程会继承父进程的峰值，所以测试图也在子进程里生成，主进程保持很小）。
+
+用法: python bench_image_encode.py [--repeat 5] [--max-size 1024]
+"""
+import argparse
+import base64
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+SIZE_CLASSES = {
+    "1K": (1280, 720),
+    "2K": (2560, 1440),
+    "4K": (3840, 2160),
+    "8K": (7680, 4320),
+}
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位是字节，Linux 是 KB
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+
+def legacy_encode(image_path: str, max_size: int) -> str:
+    with Image.open(image_path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        width, height = img.size
+        if max(width, height) > max_size:
+            scale = max_size / max(width, height)
+            img = img.resize((int(width * scale), int(height * scale)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def fast_encode(image_path: str, max_size: int) -> bytes:
+    from AItag import prepare_image_base64
+    return prepare_image_base64(image_path, max_size)
+
+
+def make_image(path: str, size):
+    # 渐变叠噪声，避免纯色图被编码器压得过小失真
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 64)
+    Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(path)
+
+
+def run_case(method: str, image_path: str, max_size: int, repeat: int, queue):
+    encode = legacy_encode if method == "旧流程" else fast_encode
+    import AItag  # noqa: F401  两种方法都先导入，避免把模块导入算进峰值
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode(image_path, max_size)
+    elapsed = (time.perf_counter() - start) / repeat
+    queue.put((elapsed, peak_rss_mb() - before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片缩放编码基准")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'档位':<6}{'格式':<6}{'方法':<10}{'耗时/张':>10}{'吞吐':>12}{'峰值内存增量':>14}")
+        for label, size in SIZE_CLASSES.items():
+            for fmt in ("JPEG", "PNG"):
+                path = os.path.join(tmp, f"{label}.{fmt.lower()}")
+                maker = ctx.Process(target=make_image, args=(path, size))
+                maker.start()
+                maker.join()
+                for method in ("旧流程", "快速路径"):
+                    queue = ctx.Queue()
+                    proc = ctx.Process(target=run_case, args=(method, path, args.max_size, args.repeat, queue))
+                    proc.start()
+                    elapsed, peak = queue.get()
+                    proc.join()
+                    print(f"{label:<6}{fmt:<6}{method:<10}{elapsed * 1000:>8.1f}ms"
+                          f"{1 / elapsed:>10.1f}/s{peak:>12.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
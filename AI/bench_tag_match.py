@@ -0,0 +1,100 @@
+# bench_tag_match.py
+"""
+标签匹配基准：在合成的 20 万标签库上比较每张图片的匹配耗时
+
+  逐个比对：旧版 TagManager.fuzzy_match 的做法，对每个词用 fuzz.ratio 扫完整个标签库
+  索引匹配：TagIndex（长度分桶 + 三元组倒排 + rapidfuzz.process.cdist 批量打分）
+
+用法: python bench_tag_match.py [--tags 200000] [--words 60] [--images 5] [--threshold 80]
+"""
+import argparse
+import random
+import string
+import time
+
+from AItag import TagManager, TagIndex, MatchMode, HAVE_RAPIDFUZZ, fuzz
+
+
+def make_library(count: int, rng: random.Random):
+    syllables = [a + b for a in "bcdfghklmnprstvwyz" for b in "aeiou"]
+    tags = set()
+    while len(tags) < count:
+        parts = ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4)))
+                 for _ in range(rng.randint(1, 3))]
+        tags.add("_".join(parts))
+    return sorted(tags)
+
+
+def make_words(tags, count: int, rng: random.Random):
+    """一张图片的词：三分之一原样命中，三分之一拼写变体，其余为随机词"""
+    words = []
+    for i in range(count):
+        tag = rng.choice(tags)
+        if i % 3 == 0:
+            words.append(tag)
+        elif i % 3 == 1:
+            chars = list(tag)
+            pos = rng.randrange(len(chars))
+            chars[pos] = rng.choice(string.ascii_lowercase)
+            words.append("".join(chars).replace("_", " "))
+        else:
+            words.append("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 14))))
+    return words
+
+
+def linear_fuzzy(manager: TagManager, word: str, threshold: int, max_candidates: int = 5):
+    candidates = []
+    for tag in manager.tags_dict.keys():
+        if tag in manager.blacklist:
+            continue
+        score = fuzz.ratio(word, tag)
+        if score >= threshold:
+            candidates.append((tag, manager.tags_dict[tag], score))
+    candidates.sort(key=lambda x: x[2], reverse=True)
+    return candidates[:max_candidates]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标签匹配基准")
+    parser.add_argument("--tags", type=int, default=200000)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--threshold", type=int, default=80)
+    parser.add_argument("--linear-images", type=int, default=1, help="逐个比对只跑前几张（很慢）")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    tags = make_library(args.tags, rng)
+    manager = TagManager()
+    manager.tags_dict = {tag: rng.randint(1, 100) for tag in tags}
+
+    start = time.perf_counter()
+    manager.tag_index = TagIndex(tags)
+    print(f"标签数: {len(tags)}  rapidfuzz: {'是' if HAVE_RAPIDFUZZ else '否'}")
+    print(f"建索引: {time.perf_counter() - start:.2f}s")
+
+    images = [make_words(tags, args.words, rng) for _ in range(args.images)]
+
+    timings = []
+    for words in images:
+        start = time.perf_counter()
+        manager.search_tags(words, MatchMode.EXACT_THEN_FUZZY, args.threshold)
+        timings.append(time.perf_counter() - start)
+    print(f"索引匹配: 平均 {sum(timings) / len(timings) * 1000:.1f} ms/图 "
+          f"(最慢 {max(timings) * 1000:.1f} ms)")
+
+    linear = []
+    for words in images[:args.linear_images]:
+        start = time.perf_counter()
+        for word in words:
+            word_lower = word.lower().strip()
+            if manager._exact_match(word_lower) is None:
+                linear_fuzzy(manager, word_lower, args.threshold)
+        linear.append(time.perf_counter() - start)
+    if linear:
+        avg = sum(linear) / len(linear)
+        print(f"逐个比对: 平均 {avg * 1000:.1f} ms/图  加速 {avg / (sum(timings) / len(timings)):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
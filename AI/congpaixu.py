@@ -2,8 +2,13 @@ import sys
 import os
 import re
 import json
+import time
+import sqlite3
+import hashlib
+import random
 import asyncio
 import aiohttp
+from bisect import bisect_right
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
@@ -13,7 +18,7 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout
                             QWidget, QPushButton, QLabel, QLineEdit, QTextEdit, 
                             QFileDialog, QSpinBox, QProgressBar, QGroupBox, 
                             QGridLayout, QScrollArea, QComboBox, QMessageBox,
-                            QSplitter, QFrame, QCheckBox)
+                            QSplitter, QFrame, QCheckBox, QDoubleSpinBox)
 from PyQt6.QtCore import QThread, pyqtSignal, Qt, QTimer
 from PyQt6.QtGui import QFont, QPalette, QColor
 
@@ -32,6 +37,8 @@ class ConfigManager:
             "fixed_words": "",
             "system_prompt": """你是一个强大的Stable Diffusion绘画提示词构造大师，十分擅长各种Stable Diffusion提示词构造，并且能够准确的将用户的提示词严格按照用户需求进行重排序,并且直接提取()包裹里的内容，然后移除提示词的()等包裹符合，然后使用<sdtext></sdtext>包裹排序后的提示词发送回去，仅可发送提示词，其余多余的不进行发送，排序规则严格为：[固定角色名字][人物数量词][人物数量词修饰][发型发色][眼睛颜色][头部发饰][身体服装][腿部服装][服装饰品装饰][表情][服装状态][身体部位][身体部位状态][角色动作][背景]""",
             "max_concurrent": 20,
+            "requests_per_second": 5.0,
+            "max_retries": 4,
             "skip_existing": True
         }
     
@@ -75,14 +82,134 @@ class ConfigManager:
                 backup_file.rename(self.config_file)
 
 
+class TokenBucket:
+    """令牌桶限流：平均每秒 rate 个请求，允许最多 capacity 个突发"""
+    
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RequestStats:
+    """请求吞吐与延迟分布统计，用于在日志里定期输出"""
+    
+    BUCKETS = [1, 2, 5, 10, 30, 60]  # 延迟直方图分桶上界（秒）
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.window_start = self.started
+        self.window_requests = 0
+        self.latencies = []
+        self.retries = 0
+        self.throttled = 0
+    
+    def record(self, latency: float):
+        self.window_requests += 1
+        self.latencies.append(latency)
+    
+    def snapshot(self) -> str:
+        now = time.monotonic()
+        rps = self.window_requests / max(now - self.window_start, 1e-6)
+        self.window_start, self.window_requests = now, 0
+        if not self.latencies:
+            return f"{rps:.2f} 请求/秒，暂无完成的请求"
+        
+        ordered = sorted(self.latencies)
+        p50 = ordered[len(ordered) // 2]
+        p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+        counts = [0] * (len(self.BUCKETS) + 1)
+        for latency in ordered:
+            counts[bisect_right(self.BUCKETS, latency)] += 1
+        labels = [f"<{b}s" for b in self.BUCKETS] + [f">={self.BUCKETS[-1]}s"]
+        histogram = " ".join(f"{label}:{count}" for label, count in zip(labels, counts) if count)
+        return (f"{rps:.2f} 请求/秒 | 延迟 p50 {p50:.1f}s p90 {p90:.1f}s | {histogram} | "
+                f"重试 {self.retries} 次（限流 {self.throttled}）")
+
+
+class JobJournal:
+    """
+    任务日志（SQLite）：记录每个输入在某套模型 + 提示词下的处理结果
+    键为输入内容哈希 + 模型 + 系统提示词 + 固定词，重跑时内容未变且已成功的文件直接跳过，
+    失败的重新处理；历史耗时用来估算吞吐和剩余时间。每条结果立即提交，中途退出也不丢进度。
+    """
+    
+    def __init__(self, db_path: str = "congpaixu_journal.db"):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "key TEXT PRIMARY KEY, path TEXT NOT NULL, model TEXT NOT NULL, status TEXT NOT NULL, "
+            "duration REAL NOT NULL, message TEXT, updated REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_path ON jobs(path)")
+        self.conn.commit()
+    
+    @staticmethod
+    def make_key(content: bytes, model: str, system_prompt: str, fixed_words: str) -> str:
+        payload = json.dumps([hashlib.sha256(content).hexdigest(), model, system_prompt, fixed_words],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def status(self, key: str):
+        row = self.conn.execute("SELECT status FROM jobs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def has_path(self, path: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM jobs WHERE path = ? LIMIT 1", (path,)).fetchone() is not None
+    
+    def record(self, key: str, path: str, model: str, success: bool, duration: float, message: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO jobs (key, path, model, status, duration, message, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, path, model, "success" if success else "failed", duration, message, time.time())
+        )
+        self.conn.commit()
+    
+    def average_duration(self, model: str, recent: int = 200):
+        """该模型最近若干次成功处理的平均耗时（秒），没有历史时返回 None"""
+        row = self.conn.execute(
+            "SELECT AVG(duration) FROM (SELECT duration FROM jobs WHERE model = ? AND status = 'success' "
+            "ORDER BY updated DESC LIMIT ?)", (model, recent)
+        ).fetchone()
+        return row[0]
+    
+    def close(self):
+        self.conn.close()
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}小时{seconds % 3600 // 60}分"
+    return f"{seconds // 60}分{seconds % 60}秒"
+
+
 class APIWorker(QThread):
     progress_updated = pyqtSignal(int, int)  # current, total
     file_processed = pyqtSignal(str, bool, str)  # filename, success, message
     file_skipped = pyqtSignal(str, str)  # filename, reason
+    stats_updated = pyqtSignal(str)  # 吞吐与延迟统计
     finished = pyqtSignal()
     
+    STATS_INTERVAL = 5  # 统计输出间隔（秒）
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    
     def __init__(self, input_folder, output_folder, api_url, api_key, model, 
-                 system_prompt, fixed_words, max_concurrent, skip_existing=True):
+                 system_prompt, fixed_words, max_concurrent, skip_existing=True,
+                 requests_per_second=5.0, max_retries=4):
         super().__init__()
         self.input_folder = input_folder
         self.output_folder = output_folder
@@ -93,6 +220,8 @@ class APIWorker(QThread):
         self.fixed_words = fixed_words
         self.max_concurrent = max_concurrent
         self.skip_existing = skip_existing
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
         self.is_running = True
         
     def run(self):
@@ -110,99 +239,200 @@ class APIWorker(QThread):
             self.finished.emit()
             return
         
-        # 过滤需要处理的文件
+        self.journal = JobJournal()
+        try:
+            await self.run_jobs(txt_files)
+        finally:
+            self.journal.close()
+        self.finished.emit()
+    
+    async def run_jobs(self, txt_files):
+        # 过滤需要处理的文件：日志里内容未变且成功过的跳过；
+        # 没有日志记录的旧输出沿用“输出文件已存在”的判断
         files_to_process = []
         skipped_count = 0
+        retry_count = 0
         
         for txt_file in txt_files:
             output_file = Path(self.output_folder) / txt_file.name
+            content = txt_file.read_bytes()
+            key = JobJournal.make_key(content, self.model, self.system_prompt, self.fixed_words)
+            status = self.journal.status(key)
             
-            if self.skip_existing and output_file.exists():
+            if self.skip_existing and output_file.exists() and status == "success":
+                self.file_skipped.emit(txt_file.name, "内容未变化，上次已处理成功")
+                skipped_count += 1
+            elif (self.skip_existing and output_file.exists() and status is None
+                    and not self.journal.has_path(str(txt_file.resolve()))):
                 self.file_skipped.emit(txt_file.name, "输出文件已存在，跳过处理")
                 skipped_count += 1
             else:
-                files_to_process.append(txt_file)
+                retry_count += status == "failed"
+                files_to_process.append((txt_file, key, content))
         
         if not files_to_process:
-            self.file_processed.emit("", False, f"所有文件都已存在，共跳过 {skipped_count} 个文件")
-            self.finished.emit()
+            self.file_processed.emit("", False, f"所有文件都已处理，共跳过 {skipped_count} 个文件")
             return
         
         # 更新总数为实际需要处理的文件数
         actual_total = len(files_to_process)
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-        
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for i, txt_file in enumerate(files_to_process):
+        self.completed = 0
+        self.started = time.monotonic()
+        self.historical_duration = self.journal.average_duration(self.model)
+        plan = f"待处理 {actual_total} 个文件（其中重试失败 {retry_count} 个），跳过 {skipped_count} 个"
+        if self.historical_duration:
+            plan += (f"，历史平均 {self.historical_duration:.1f} 秒/个，"
+                     f"预计 {format_eta(actual_total / self.expected_rate())}")
+        self.stats_updated.emit(plan)
+        self.stats = RequestStats()
+        self.bucket = TokenBucket(self.requests_per_second)
+        
+        # 有界队列：生产者只领先消费者一小段，停止时没有成堆的待执行协程
+        queue = asyncio.Queue(maxsize=self.max_concurrent * 2)
+        
+        # 连接池与并发数一致，长连接复用；单个请求超时 60 秒
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrent, limit_per_host=self.max_concurrent,
+            ttl_dns_cache=300, keepalive_timeout=60
+        )
+        timeout = aiohttp.ClientTimeout(total=60)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            consumers = [
+                asyncio.create_task(self.consume(session, queue, actual_total))
+                for _ in range(min(self.max_concurrent, actual_total))
+            ]
+            reporter = asyncio.create_task(self.report_stats(actual_total))
+            
+            for job in files_to_process:
                 if not self.is_running:
                     break
-                task = self.process_single_file(session, semaphore, txt_file, i + 1, actual_total)
-                tasks.append(task)
+                await queue.put(job)
+            for _ in consumers:
+                await queue.put(None)  # 结束标记
             
-            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*consumers, return_exceptions=True)
+            reporter.cancel()
         
-        self.finished.emit()
+        self.stats_updated.emit(f"{self.stats.snapshot()} | {self.progress_text(actual_total)}")
+        if not self.is_running:
+            self.file_processed.emit("", False, f"已停止，未处理 {actual_total - self.completed} 个文件")
     
-    async def process_single_file(self, session, semaphore, txt_file, current, total):
-        async with semaphore:
-            if not self.is_running:
+    def expected_rate(self) -> float:
+        """按历史平均耗时估算的吞吐（文件/秒），受并发数和限流共同约束"""
+        return min(self.max_concurrent / max(self.historical_duration, 1e-3), self.requests_per_second)
+    
+    def progress_text(self, total: int) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.completed / elapsed if self.completed else 0.0
+        if not rate and self.historical_duration:
+            rate = self.expected_rate()
+        text = f"已完成 {self.completed}/{total}，{rate:.2f} 文件/秒"
+        if rate and self.completed < total:
+            text += f"，预计剩余 {format_eta((total - self.completed) / rate)}"
+        return text
+    
+    async def report_stats(self, total):
+        while True:
+            await asyncio.sleep(self.STATS_INTERVAL)
+            self.stats_updated.emit(f"{self.stats.snapshot()} | {self.progress_text(total)}")
+    
+    async def consume(self, session, queue, total):
+        while True:
+            job = await queue.get()
+            if job is None:
                 return
-                
+            if not self.is_running:
+                continue  # 停止后只清空队列，不再发请求
+            txt_file, key, content = job
+            started = time.monotonic()
+            result = await self.process_single_file(session, txt_file, content)
+            if result is not None:
+                success, message = result
+                self.file_processed.emit(txt_file.name, success, message)
+                self.journal.record(key, str(txt_file.resolve()), self.model, success,
+                                    time.monotonic() - started, message)
+            self.completed += 1
+            self.progress_updated.emit(self.completed, total)
+    
+    async def post_with_retry(self, session, payload, headers):
+        """发送请求，429/5xx/超时按指数退避（带抖动）重试，返回 (状态码, 响应文本)"""
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            started = time.monotonic()
+            retry_after = None
             try:
-                # 读取文件内容
-                with open(txt_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                
-                if not content:
-                    self.file_processed.emit(txt_file.name, False, "文件内容为空")
-                    self.progress_updated.emit(current, total)
-                    return
-                
-                # 构建请求
-                user_message = f"固定词为[{self.fixed_words}]，请你排序这个提示词：[{content}]"
-                
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "temperature": 0.1
-                }
+                async with session.post(self.api_url, json=payload, headers=headers) as response:
+                    text = await response.text()
+                    self.stats.record(time.monotonic() - started)
+                    if response.status not in self.RETRY_STATUS or attempt == self.max_retries:
+                        return response.status, text
+                    if response.status == 429:
+                        self.stats.throttled += 1
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            
+            if not self.is_running:
+                return None, "已停止"
+            self.stats.retries += 1
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay)
+    
+    async def process_single_file(self, session, txt_file, content: bytes):
+        """处理单个文件，返回 (是否成功, 说明)；中途停止时返回 None"""
+        try:
+            # 文件内容在入队时已读取（用于计算日志键）
+            content = content.decode('utf-8').replace('\r\n', '\n').strip()
+            
+            if not content:
+                return False, "文件内容为空"
+            
+            # 构建请求
+            user_message = f"固定词为[{self.fixed_words}]，请你排序这个提示词：[{content}]"
+            
+            payload = {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": user_message}
+                ],
+                "temperature": 0.1
+            }
+            
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+            
+            # 发送请求
+            status, response_text = await self.post_with_retry(session, payload, headers)
+            if status == 200:
+                result = json.loads(response_text)
+                response_content = result['choices'][0]['message']['content']
                 
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
+                # 提取重排序后的提示词
+                match = re.search(r'<sdtext>(.*?)</sdtext>', response_content, re.DOTALL)
+                if match:
+                    sorted_prompt = match.group(1).strip()
+                    
+                    # 保存到输出文件夹
+                    output_file = Path(self.output_folder) / txt_file.name
+                    with open(output_file, 'w', encoding='utf-8') as f:
+                        f.write(sorted_prompt)
+                    
+                    return True, "处理成功"
+                return False, "未找到<sdtext>标签"
+            if status is not None:
+                return False, f"API错误: {status} - {response_text}"
+            return None
                 
-                # 发送请求
-                async with session.post(self.api_url, json=payload, headers=headers, timeout=60) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        response_content = result['choices'][0]['message']['content']
-                        
-                        # 提取重排序后的提示词
-                        match = re.search(r'<sdtext>(.*?)</sdtext>', response_content, re.DOTALL)
-                        if match:
-                            sorted_prompt = match.group(1).strip()
-                            
-                            # 保存到输出文件夹
-                            output_file = Path(self.output_folder) / txt_file.name
-                            with open(output_file, 'w', encoding='utf-8') as f:
-                                f.write(sorted_prompt)
-                            
-                            self.file_processed.emit(txt_file.name, True, "处理成功")
-                        else:
-                            self.file_processed.emit(txt_file.name, False, "未找到<sdtext>标签")
-                    else:
-                        error_text = await response.text()
-                        self.file_processed.emit(txt_file.name, False, f"API错误: {response.status} - {error_text}")
-                        
-            except Exception as e:
-                self.file_processed.emit(txt_file.name, False, f"处理错误: {str(e)}")
-            
-            self.progress_updated.emit(current, total)
+        except Exception as e:
+            return False, f"处理错误: {str(e)}"
 
 
 class MainWindow(QMainWindow):
@@ -299,6 +529,21 @@ class MainWindow(QMainWindow):
         self.max_concurrent_spin.setValue(20)
         api_layout.addWidget(self.max_concurrent_spin, 2, 3)
         
+        # 限流与重试
+        api_layout.addWidget(QLabel("每秒请求数:"), 3, 0)
+        self.rate_limit_spin = QDoubleSpinBox()
+        self.rate_limit_spin.setRange(0.1, 100)
+        self.rate_limit_spin.setSingleStep(0.5)
+        self.rate_limit_spin.setValue(5.0)
+        self.rate_limit_spin.setToolTip("令牌桶限流，超过接口限额会触发 429")
+        api_layout.addWidget(self.rate_limit_spin, 3, 1)
+        
+        api_layout.addWidget(QLabel("最大重试次数:"), 3, 2)
+        self.max_retries_spin = QSpinBox()
+        self.max_retries_spin.setRange(0, 10)
+        self.max_retries_spin.setValue(4)
+        api_layout.addWidget(self.max_retries_spin, 3, 3)
+        
         config_layout.addWidget(api_group)
         
         # 处理选项
@@ -438,7 +683,7 @@ class MainWindow(QMainWindow):
             QLineEdit:focus, QTextEdit:focus, QComboBox:focus {
                 border-color: #4CAF50;
             }
-            QSpinBox {
+            QSpinBox, QDoubleSpinBox {
                 border: 2px solid #ddd;
                 border-radius: 4px;
                 padding: 5px;
@@ -509,6 +754,8 @@ class MainWindow(QMainWindow):
             "fixed_words": self.fixed_words_edit.text(),
             "system_prompt": self.system_prompt_edit.toPlainText(),
             "max_concurrent": self.max_concurrent_spin.value(),
+            "requests_per_second": self.rate_limit_spin.value(),
+            "max_retries": self.max_retries_spin.value(),
             "skip_existing": self.skip_existing_checkbox.isChecked()
         }
     
@@ -530,6 +777,8 @@ class MainWindow(QMainWindow):
         self.fixed_words_edit.setText(config.get("fixed_words", ""))
         self.system_prompt_edit.setPlainText(config.get("system_prompt", ""))
         self.max_concurrent_spin.setValue(config.get("max_concurrent", 20))
+        self.rate_limit_spin.setValue(config.get("requests_per_second", 5.0))
+        self.max_retries_spin.setValue(config.get("max_retries", 4))
         self.skip_existing_checkbox.setChecked(config.get("skip_existing", True))
     
     def load_config(self):
@@ -648,12 +897,15 @@ class MainWindow(QMainWindow):
             self.system_prompt_edit.toPlainText(),
             self.fixed_words_edit.text(),
             self.max_concurrent_spin.value(),
-            self.skip_existing_checkbox.isChecked()
+            self.skip_existing_checkbox.isChecked(),
+            self.rate_limit_spin.value(),
+            self.max_retries_spin.value()
         )
         
         self.worker.progress_updated.connect(self.update_progress)
         self.worker.file_processed.connect(self.on_file_processed)
         self.worker.file_skipped.connect(self.on_file_skipped)
+        self.worker.stats_updated.connect(lambda text: self.log_message(f"📊 {text}", "gray"))
         self.worker.finished.connect(self.on_processing_finished)
         
         self.worker.start()
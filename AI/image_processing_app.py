@@ -1,5 +1,7 @@
 import os
 import re
+import sys
+import subprocess
 import threading
 import time
 import json  # 用于保存和加载模型列表
@@ -9,9 +11,10 @@ from PIL import Image  # 用于加载图标和图片压缩
 import io  # 用于处理内存中的 PNG 数据
 import base64
 import requests
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue
 from threading import Lock  # 引入线程锁
+from term_counter import count_folder, read_term_counts
 
 # 初始化主窗口
 ctk.set_appearance_mode("light")  # 设置主题
@@ -62,6 +65,8 @@ REMOVED_INVALID_API_KEYS_FILE = os.path.join(CONFIG_DIR, "removed_invalid_api_ke
 
 # 添加全局变量，用于控制处理状态
 processing_paused = False  # 默认未暂停
+processing_resumed = threading.Event()  # 未暂停时置位，工作线程在此等待而不是轮询
+processing_resumed.set()
 
 # 添加一个列表来存储失效的 API Keys
 invalid_api_keys = []
@@ -372,11 +377,15 @@ def get_headers(api_key):
 # 修改：轮询使用 API_KEYS
 api_key_index = 0  # 全局变量，用于轮询 API_KEYS
 
+class NoKeysAvailable(ValueError):
+    """没有可用的 API Key（列表为空或全部失效），重试也无意义"""
+
+
 def get_next_api_key():
     """获取下一个可用的 API_KEY"""
     global api_key_index
     if not api_keys_list:
-        raise ValueError("没有可用的 API Keys!")
+        raise NoKeysAvailable("没有可用的 API Keys!")
     
     # 循环查找有效的 API Key
     for _ in range(len(api_keys_list)):
@@ -385,7 +394,132 @@ def get_next_api_key():
         if api_key not in invalid_api_keys:  # 跳过失效的 API Key
             return api_key
     
-    raise ValueError("所有 API Keys 都失效了!")
+    raise NoKeysAvailable("所有 API Keys 都失效了!")
+
+def parse_rate_limit_reset(value):
+    """解析限流重置时间，支持 Retry-After 秒数和 OpenAI 风格的 1m30s / 250ms"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds or None
+
+class KeyScheduler:
+    """
+    多 API Key 自适应调度器：
+    - 每个 Key 各自维护并发上限，成功时加性增大、遇到 429/5xx 时乘性减小（AIMD）
+    - 记录每个 Key 的平均延迟、错误率和剩余配额，任务总是派给当前最健康且有余量的 Key
+    - 被限流或配额用尽的 Key 按 Retry-After 冷却；等待用条件变量唤醒，不轮询
+    """
+
+    def __init__(self, api_keys, max_concurrency=40, initial_concurrency=4):
+        self.max_concurrency = max_concurrency
+        self.cond = threading.Condition()
+        self.stats = {
+            key: {
+                "limit": float(min(initial_concurrency, max_concurrency)),
+                "in_flight": 0,
+                "latency": 0.0,  # 成功请求延迟的指数滑动平均，0 表示还没有样本
+                "error_rate": 0.0,
+                "cooldown_until": 0.0,
+                "last_decrease": 0.0,
+                "consecutive_errors": 0,
+                "success": 0,
+                "throttled": 0,
+                "server_errors": 0,
+                "enabled": True,
+            }
+            for key in api_keys
+        }
+
+    def _pick(self, now):
+        best_key, best_score = None, None
+        for key, st in self.stats.items():
+            if not st["enabled"] or now < st["cooldown_until"] or st["in_flight"] >= int(st["limit"]):
+                continue
+            # 预计等待 ≈ 延迟 × 占用率，错误率高的 Key 加惩罚；没有样本的 Key 优先试探
+            score = st["latency"] * (1 + 4 * st["error_rate"]) * (1 + st["in_flight"] / st["limit"])
+            if best_score is None or score < best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def acquire(self):
+        """取得一个可用的 Key（会占用它的一个并发名额），暂停期间阻塞"""
+        while True:
+            processing_resumed.wait()
+            with self.cond:
+                now = time.monotonic()
+                key = self._pick(now)
+                if key is not None:
+                    self.stats[key]["in_flight"] += 1
+                    return key
+                enabled = [st for st in self.stats.values() if st["enabled"]]
+                if not enabled:
+                    raise NoKeysAvailable("所有 API Keys 都失效了!")
+                # 全部满载时等别的请求结束；全部冷却时等到最早的冷却结束
+                cooling = [st["cooldown_until"] - now for st in enabled if st["cooldown_until"] > now]
+                self.cond.wait(timeout=min(cooling) if len(cooling) == len(enabled) else None)
+
+    def release(self, key, status, latency, headers=None):
+        """
+        归还名额并根据结果调整该 Key 的并发上限。
+        :param status: HTTP 状态码，网络异常传 None
+        """
+        headers = headers or {}
+        with self.cond:
+            st = self.stats[key]
+            st["in_flight"] -= 1
+            now = time.monotonic()
+            if status == 200:
+                st["success"] += 1
+                st["consecutive_errors"] = 0
+                st["latency"] = latency if not st["latency"] else 0.8 * st["latency"] + 0.2 * latency
+                st["error_rate"] *= 0.8
+                st["limit"] = min(self.max_concurrency, st["limit"] + 1 / st["limit"])
+            elif status == 429 or status is None or status >= 500:
+                if status == 429:
+                    st["throttled"] += 1
+                else:
+                    st["server_errors"] += 1
+                st["consecutive_errors"] += 1
+                st["error_rate"] = 0.8 * st["error_rate"] + 0.2
+                # 同一批在途请求一起失败时只减一次，避免上限瞬间掉到 1
+                if now - st["last_decrease"] > max(st["latency"], 1.0):
+                    st["limit"] = max(1.0, st["limit"] / 2 if status == 429 else st["limit"] * 0.75)
+                    st["last_decrease"] = now
+                backoff = parse_rate_limit_reset(headers.get("Retry-After"))
+                if backoff is None:
+                    backoff = min(60.0, 0.5 * 2 ** st["consecutive_errors"])
+                st["cooldown_until"] = max(st["cooldown_until"], now + backoff)
+            # 服务端告知配额已用尽时，冷却到配额重置
+            if headers.get("x-ratelimit-remaining-requests") == "0":
+                reset = parse_rate_limit_reset(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    st["cooldown_until"] = max(st["cooldown_until"], now + reset)
+            self.cond.notify_all()
+
+    def disable(self, key):
+        """Key 被判定失效后不再派发任务"""
+        with self.cond:
+            if key in self.stats:
+                self.stats[key]["enabled"] = False
+            self.cond.notify_all()
+
+    def summary(self):
+        lines = []
+        with self.cond:
+            for key, st in self.stats.items():
+                lines.append(
+                    f"...{key[-6:]}: 成功 {st['success']}，429 {st['throttled']} 次，"
+                    f"5xx/网络错误 {st['server_errors']} 次，平均延迟 {st['latency']:.1f}s，"
+                    f"并发上限 {int(st['limit'])}{'' if st['enabled'] else '（已失效）'}"
+                )
+        return lines
 
 # 新增：保存被移除的失效 API Key 到文件
 def save_removed_invalid_api_keys():
@@ -404,44 +538,90 @@ def load_removed_invalid_api_keys():
 removed_invalid_api_keys = load_removed_invalid_api_keys()
 
 # 新增：压缩图片函数
-def compress_image_to_target_size(image_path, target_size_mb=1):
+def _encode_jpeg(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def compress_image_to_target_size(image_path, target_size_mb=1, max_encodes=6, min_quality=40, max_quality=85,
+                                  stats=None):
     """
     压缩图片到目标大小（MB），返回压缩后的图片字节数据。
+    先用缩小的样图估算体积：质量降到下限也放不下时先按比例缩小分辨率，
+    再对质量做二分查找，整图编码次数不超过 max_encodes（用完时返回已找到的最优结果）。
     :param image_path: 原始图片路径
     :param target_size_mb: 目标大小（以MB为单位）
+    :param max_encodes: 整图 JPEG 编码次数上限
+    :param stats: 传入字典时写回 原始/压缩后字节数、编码次数、质量、缩放比例、耗时
     :return: 压缩后的图片字节数据
     """
-    target_size_bytes = target_size_mb * 1024 * 1024  # 转换为字节
+    start = time.perf_counter()
+    target_size_bytes = int(target_size_mb * 1024 * 1024)  # 转换为字节
+    encodes = 0
     with Image.open(image_path) as img:
         # 确保图片是 RGB 模式
         if img.mode != "RGB":
             img = img.convert("RGB")
-        
-        # 初始化压缩参数
-        quality = 85  # 初始质量
-        step = 20  # 每次减少的质量步长
-        buffer = io.BytesIO()
-
-        # 循环压缩图片直到满足目标大小
+        original = img
+        width, height = img.size
+
+        # 用约 1/16 像素的样图估算整图体积（每像素字节数近似不变）
+        factor = 4 if min(width, height) >= 64 else 1
+        sample = img.reduce(factor) if factor > 1 else img
+        ratio = (width * height) / (sample.width * sample.height)
+        est_min = len(_encode_jpeg(sample, min_quality)) * ratio
+
+        scale = 1.0
+        if est_min > target_size_bytes:
+            # 体积大致与像素数成正比，多留 10% 余量
+            scale = min(1.0, (target_size_bytes / est_min) ** 0.5 * 0.9)
+            img = img.resize((max(1, int(width * scale)), max(1, int(height * scale))),
+                             Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        # 先确认最低质量能放下；放不下就按实测体积修正缩放比例（样图估算对噪点多的图会偏小）
         while True:
-            buffer.seek(0)  # 重置缓冲区
-            img.save(buffer, format="JPEG", quality=quality)
-            size = buffer.tell()  # 获取当前图片大小
-            if size <= target_size_bytes or quality <= step:
+            data = _encode_jpeg(img, min_quality)
+            encodes += 1
+            best = (min_quality, data)
+            if len(data) <= target_size_bytes or encodes >= max_encodes:
                 break
-            quality -= step  # 减少质量
-
-        buffer.seek(0)  # 重置缓冲区
-        return buffer.read()  # 返回压缩后的图片字节数据
+            scale *= min(0.9, (target_size_bytes / len(data)) ** 0.5 * 0.95)
+            img = original.resize((max(1, int(width * scale)), max(1, int(height * scale))),
+                                  Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        # 再二分查找能放进目标大小的最高质量
+        if len(best[1]) <= target_size_bytes:
+            lo, hi = min_quality + 1, max_quality
+            while lo <= hi and encodes < max_encodes:
+                quality = (lo + hi) // 2
+                data = _encode_jpeg(img, quality)
+                encodes += 1
+                if len(data) <= target_size_bytes:
+                    best = (quality, data)
+                    lo = quality + 1
+                else:
+                    hi = quality - 1
+                if hi - lo < 3:
+                    break
+
+    quality, data = best
+    if stats is not None:
+        stats.update({
+            "original_bytes": os.path.getsize(image_path),
+            "compressed_bytes": len(data),
+            "encodes": encodes,
+            "quality": quality,
+            "scale": scale,
+            "elapsed": time.perf_counter() - start,
+        })
+    return data
 
 # 修改 process_image 函数，增加图片大小检查和压缩逻辑
-def process_image(image_filename, api_url, model, prompt, image_directory, output_directory, quality="auto", api_key=None):
-    """处理单张图片并保存结果"""
-    global processing_paused
-
+def process_image(image_filename, api_url, model, prompt, image_directory, output_directory, quality="auto", api_key=None,
+                  scheduler=None):
+    """处理单张图片并保存结果；传入 scheduler 时每次请求都由调度器挑选 Key"""
     # 等待暂停状态解除
-    while processing_paused:
-        time.sleep(0.5)  # 每0.5秒检查一次暂停状态
+    processing_resumed.wait()
 
     image_path = os.path.join(image_directory, image_filename)
     
@@ -457,8 +637,17 @@ def process_image(image_filename, api_url, model, prompt, image_directory, outpu
     # 检查图片大小并压缩（如果大于2MB）
     if os.path.getsize(image_path) > 10 * 1024 * 1024:  # 大于10MB
         update_status(f"图片 {image_filename} 较大，正在压缩...")
-        time.sleep(0.1)
-        encoded_image = base64.b64encode(compress_image_to_target_size(image_path, target_size_mb=1)).decode('utf-8')
+        compress_stats = {}
+        encoded_image = base64.b64encode(
+            compress_image_to_target_size(image_path, target_size_mb=1, stats=compress_stats)
+        ).decode('utf-8')
+        saved = compress_stats["original_bytes"] - compress_stats["compressed_bytes"]
+        update_status(
+            f"图片 {image_filename} 压缩完成: {compress_stats['original_bytes'] / 1024 / 1024:.1f}MB → "
+            f"{compress_stats['compressed_bytes'] / 1024 / 1024:.2f}MB，节省 {saved / 1024 / 1024:.1f}MB，"
+            f"质量 {compress_stats['quality']}，缩放 {compress_stats['scale']:.2f}，"
+            f"编码 {compress_stats['encodes']} 次，耗时 {compress_stats['elapsed']:.2f}s"
+        )
     else:
         # 编码图片
         encoded_image = encode_image(image_path)
@@ -514,18 +703,27 @@ def process_image(image_filename, api_url, model, prompt, image_directory, outpu
         "max_tokens": 8000
     }
     
-    # 发送请求并处理响应，最多重试三次
+    # 发送请求并处理响应，最多重试三次；记下每次失败实际用的 Key，失败计数记到它们头上
+    failed_keys = []
     for attempt in range(3):
+        status = None
+        response_headers = None
+        acquired_key = None
+        started = time.monotonic()
         try:
             # 在每次请求前检查暂停状态
-            while processing_paused:
-                time.sleep(0.5)  # 每0.5秒检查一次暂停状态
+            processing_resumed.wait()
 
-            if api_key is None:
+            if scheduler is not None:
+                api_key = acquired_key = scheduler.acquire()  # 由调度器挑选当前最健康的 Key
+                started = time.monotonic()
+            elif api_key is None:
                 api_key = get_next_api_key()  # 获取下一个 API_KEY
             print("开始请求")
             response = requests.post(api_url, headers=get_headers(api_key), data=json.dumps(data),verify=False)
             print("请求成功")
+            status = response.status_code
+            response_headers = response.headers
             if response.status_code == 200:
                 result = response.json()
                 content = result['choices'][0]['message']['content']
@@ -547,34 +745,58 @@ def process_image(image_filename, api_url, model, prompt, image_directory, outpu
                     api_key_failures[api_key] = 0
                 
                 return True
-            elif response.status_code in [500, 502, 503, 504]:  # 服务器错误或不可用
-                # update_status(f"服务器错误 {response.status_code} 对于 {image_filename}. 重试中...")
-                time.sleep(2)  # 等待2秒后重试
+            elif response.status_code == 429 or response.status_code >= 500:  # 限流、服务器错误或不可用
+                failed_keys.append(api_key)
+                # 有调度器时由它冷却该 Key，重试会派给其他 Key
+                if scheduler is None:
+                    time.sleep(2)  # 等待2秒后重试
             else:
+                failed_keys.append(api_key)
                 update_status(f"第 {attempt + 1} 次尝试失败 对于 {image_filename}: {response.status_code}")
                 if attempt < 2:
                     time.sleep(2)  # 等待2秒后重试
+        except NoKeysAvailable as e:
+            # 没有可用的 Key 了，重试也无意义
+            update_status(f"对于 {image_filename} 发生异常: {e}")
+            return False
         except Exception as e:
+            # 包括 200 响应体不是合法 JSON 的情况：按失败归还 Key，并继续重试
+            status = None
+            if api_key is not None:
+                failed_keys.append(api_key)
             update_status(f"对于 {image_filename} 发生异常: {e}")
+        finally:
+            if acquired_key is not None:
+                scheduler.release(acquired_key, status, time.monotonic() - started, response_headers)
     
-    # 如果所有重试都失败，增加 API Key 的失败计数
-    if api_key in api_key_failures:
-        api_key_failures[api_key] += 1
-        if api_key_failures[api_key] >= 30:  # 连续失败3次，标记为失效
-            if api_key not in invalid_api_keys:
-                invalid_api_keys.append(api_key)
-                save_invalid_api_keys()  # 保存失效的 API Keys 到文件
-                update_status(f"API Key '{api_key}' 标记为失效 连续失败3次.")
-            
-            # 自动移除失效的 API Key
-            if api_key in api_keys_list:
-                api_keys_list.remove(api_key)  # 从 API Key 列表中移除
-                removed_invalid_api_keys.append(api_key)  # 添加到被移除的列表
-                save_removed_invalid_api_keys()  # 保存到文件
-                save_api_keys_list()  # 保存更新后的 API Key 列表到文件
+    # 如果所有重试都失败，增加实际出错的 API Key 的失败计数
+    for failed_key in dict.fromkeys(failed_keys):
+        record_api_key_failure(failed_key, scheduler)
 
     return False
 
+
+def record_api_key_failure(api_key, scheduler=None):
+    """累计 API Key 的失败次数，达到阈值后标记失效并从列表中移除"""
+    if api_key not in api_key_failures:
+        return
+    api_key_failures[api_key] += 1
+    if api_key_failures[api_key] >= 30:  # 连续失败3次，标记为失效
+        if api_key not in invalid_api_keys:
+            invalid_api_keys.append(api_key)
+            save_invalid_api_keys()  # 保存失效的 API Keys 到文件
+            update_status(f"API Key '{api_key}' 标记为失效 连续失败3次.")
+
+        if scheduler is not None:
+            scheduler.disable(api_key)
+
+        # 自动移除失效的 API Key
+        if api_key in api_keys_list:
+            api_keys_list.remove(api_key)  # 从 API Key 列表中移除
+            removed_invalid_api_keys.append(api_key)  # 添加到被移除的列表
+            save_removed_invalid_api_keys()  # 保存到文件
+            save_api_keys_list()  # 保存更新后的 API Key 列表到文件
+
 # 修改 start_processing 函数，增加进度显示逻辑
 def start_processing():
     """开始处理图片"""
@@ -583,6 +805,7 @@ def start_processing():
     # 如果当前是暂停状态，点击"开始打标"时需要重置暂停状态
     if processing_paused:
         processing_paused = False
+        processing_resumed.set()
         pause_button.configure(text="暂停打标")  # 确保按钮显示为"暂停打标"
 
     # 获取最新的图片目录和输出目录
@@ -644,13 +867,6 @@ def start_processing():
     # 并行处理图片
     def process():
         update_status("处理开始...")
-        task_queue = Queue()
-
-        # 清空任务队列并重新加载图片列表
-        while not task_queue.empty():
-            task_queue.get()  # 清空队列
-        for image_filename in image_filenames:
-            task_queue.put(image_filename)
 
         # 初始化成功和失败的计数器，以及开始时间
         nonlocal processed_count
@@ -658,53 +874,41 @@ def start_processing():
         failure_count = 0
         start_time = time.time()
 
-        # 为每个 API Key 创建一个线程池
-        api_key_pools = {}
+        # 由调度器按各 Key 的实时健康度分配并发，线程数只是上限
         max_concurrent_requests_per_key = 40  # 每个 API Key 的最大并发请求数
-        for api_key in api_keys_list:
-            if api_key not in invalid_api_keys:
-                api_key_pools[api_key] = ThreadPoolExecutor(max_workers=max_concurrent_requests_per_key)
-
-        # 分配任务到线程池
-        futures = []
-        while not task_queue.empty():
-            # 检查暂停状态
-            while processing_paused:
-                update_status("处理已暂停...")
-                time.sleep(0.5)  # 每0.5秒检查一次暂停状态
-
-            for api_key, pool in api_key_pools.items():
-                if not task_queue.empty():
-                    image_filename = task_queue.get()
-                    futures.append(pool.submit(process_image, image_filename, api_url, model, prompt, image_directory, output_directory, api_key=api_key))
-                    time.sleep(0.1)
-
-        # 等待所有任务完成
-        for future in as_completed(futures):
-            while processing_paused:
-                update_status("处理已暂停...")
-                time.sleep(0.5)  # 每0.5秒检查一次暂停状态
-            try:
-                success = future.result()
-                with lock:
-                    processed_count += 1  # 更新已处理数量
-                    if success:
-                        success_count += 1  # 成功计数 +1
-                    else:
-                        failure_count += 1  # 失败计数 +1
-
-                    # 更新进度显示
-                    progress = processed_count / total_images * 100 if total_images > 0 else 0
-                    progress_var.set(f"图片处理进度: {processed_count}/{total_images} ({progress:.2f}%)")
-            except Exception as e:
-                update_status(f"发生异常: {e}")
+        active_keys = [key for key in api_keys_list if key not in invalid_api_keys]
+        scheduler = KeyScheduler(active_keys, max_concurrency=max_concurrent_requests_per_key)
+        max_workers = max(1, min(total_images, max_concurrent_requests_per_key * len(active_keys)))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(process_image, image_filename, api_url, model, prompt, image_directory, output_directory,
+                            scheduler=scheduler)
+                for image_filename in image_filenames
+            ]
+
+            # 等待所有任务完成
+            for future in as_completed(futures):
+                try:
+                    success = future.result()
+                    with lock:
+                        processed_count += 1  # 更新已处理数量
+                        if success:
+                            success_count += 1  # 成功计数 +1
+                        else:
+                            failure_count += 1  # 失败计数 +1
 
-        # 关闭所有线程池
-        for pool in api_key_pools.values():
-            pool.shutdown()
+                        # 更新进度显示
+                        progress = processed_count / total_images * 100 if total_images > 0 else 0
+                        progress_var.set(f"图片处理进度: {processed_count}/{total_images} ({progress:.2f}%)")
+                except Exception as e:
+                    update_status(f"发生异常: {e}")
 
         total_time = time.time() - start_time  # 计算总耗时
-        update_status(f"处理完成! 成功处理 {success_count} 张图片，失败 {failure_count} 张图片，耗时 {total_time:.2f} 秒。")
+        # 各 Key 的成功数、限流/错误次数、延迟和并发上限一并显示在状态栏
+        key_summary = " | ".join(scheduler.summary())
+        update_status(f"处理完成! 成功处理 {success_count} 张图片，失败 {failure_count} 张图片，耗时 {total_time:.2f} 秒。"
+                      f" {key_summary}")
 
     threading.Thread(target=process).start()
 
@@ -1585,9 +1789,11 @@ def toggle_processing_pause():
     global processing_paused
     processing_paused = not processing_paused  # 切换暂停状态
     if processing_paused:
+        processing_resumed.clear()
         update_status("暂停打标.")
         pause_button.configure(text="恢复打标")  # 更新按钮文本
     else:
+        processing_resumed.set()
         update_status("恢复打标.")
         pause_button.configure(text="暂停打标")  # 更新按钮文本
 
@@ -1812,24 +2018,7 @@ txt_button = ctk.CTkButton(
 )
 txt_button.pack(pady=10, padx=5)
 
-# 新增：生图标签生成页面
-def extract_words_and_phrases(text):
-    """提取文本中的单个单词或多词组"""
-    # 定义正则表达式，提取所有的单词或词组（至少两个单词）
-    pattern = re.compile(r'\b[a-zA-Z0-9-]+(?:\s[a-zA-Z0-9-]+)*\b')
-    return re.findall(pattern, text)
-
-def process_files(folder_path):
-    """读取所有文件并提取唯一的单词和词组"""
-    unique_terms = set()
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".txt"):
-            with open(os.path.join(folder_path, filename), "r", encoding="utf-8") as file:
-                text = file.read()
-                terms = extract_words_and_phrases(text)
-                unique_terms.update(terms)
-    return sorted(unique_terms)
-
+# 新增：生图标签生成页面（词频统计见 term_counter.py）
 def select_table_directory():
     """选择文件夹"""
     directory = filedialog.askdirectory(title="选择 TXT 文件夹")
@@ -1874,25 +2063,50 @@ def previous_page():
     if txt_current_page > 0:
         update_result_textbox_paginated(txt_current_page - 1)
 
+# 词频统计结果文件（词\t次数，按频率降序）
+TERM_COUNTS_FILE = os.path.join(CONFIG_DIR, "term_counts.tsv")
+
 def process_files_in_thread(folder_path):
-    """后台线程中处理文件夹中的 TXT 文件"""
+    """后台线程中统计文件夹中 TXT 文件的词频（多进程 map-reduce，见 term_counter.py）"""
     global all_terms
     try:
-        unique_terms = set()
-        for filename in os.listdir(folder_path):
-            if filename.endswith(".txt"):
-                file_path = os.path.join(folder_path, filename)
-                with open(file_path, "r", encoding="utf-8") as file:
-                    text = file.read()
-                    terms = extract_words_and_phrases(text)
-                    unique_terms.update(terms)
-
-        # 将结果排序并存储到全局变量
-        all_terms = sorted(unique_terms)
+        def report(done, total):
+            update_status(f"正在统计词频: {done}/{total} 个文件")
+
+        if getattr(sys, "frozen", False):
+            # 打包成 exe 后无法再起 Python 子进程，退回当前进程串行统计
+            count_folder(folder_path, TERM_COUNTS_FILE, workers=0, progress=report)
+        else:
+            # 统计放在独立进程里跑：本脚本导入即建窗口，不能直接作为多进程的子进程入口
+            counter_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "term_counter.py")
+            # stderr 并入 stdout 一起读：分开的两个管道只读一个时，另一个写满缓冲区会让子进程卡死
+            proc = subprocess.Popen(
+                [sys.executable, counter_script, folder_path, TERM_COUNTS_FILE],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace"
+            )
+            other_lines = deque(maxlen=20)  # 非进度输出（警告、报错堆栈），失败时取最后一行提示
+            for line in proc.stdout:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    if line.strip():
+                        other_lines.append(line.strip())
+                    continue
+                if "done" in message:
+                    report(message["done"], message["total"])
+            if proc.wait() != 0:
+                raise RuntimeError(other_lines[-1] if other_lines else f"词频统计进程退出码 {proc.returncode}")
+
+        # 按频率从高到低存储到全局变量
+        term_counts = read_term_counts(TERM_COUNTS_FILE)
+        all_terms = [term for term, _ in term_counts]
 
         # 在主线程中更新 UI
         result_textbox.after(0, update_result_textbox_paginated, 0)  # 显示第一页
-        update_status(f"处理完成! 共提取 {len(all_terms)} 个唯一标签")
+        top_terms = "、".join(f"{term}({count})" for term, count in term_counts[:5])
+        update_status(f"处理完成! 共提取 {len(all_terms)} 个唯一标签（按出现次数排序）。最常见: {top_terms}")
     except Exception as e:
         # 在主线程中显示错误信息
         result_textbox.after(0, lambda: messagebox.showerror("Error", f"处理文件时发生错误: {e}"))
@@ -1949,7 +2163,7 @@ table_title.pack(pady=20, padx=20, anchor="w")
 
 table_description = ctk.CTkLabel(
     table_page,
-    text="📄  选择一个包含 TXT 文件的文件夹，提取所有TXT文件里唯一的单词和词组。",
+    text="📄  选择一个包含 TXT 文件的文件夹，提取所有TXT文件里唯一的单词和词组，按出现次数从高到低排列。",
     font=ctk.CTkFont(family="Microsoft YaHei", size=14),
     text_color="#005BB5", anchor="w", justify="left", padx=10, pady=10
 )
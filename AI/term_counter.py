@@ -0,0 +1,117 @@
+# term_counter.py
+"""
+TXT 标签词频统计（多进程 map-reduce）
+
+image_processing_app.py 的「生图标签生成」页调用本模块：把文件夹里的 .txt 分块交给
+进程池统计词频（map），主进程合并计数（reduce），最后按频率从高到低流式写出 TSV。
+进度以 JSON 行输出到 stdout，界面进程逐行读取。
+
+结果在全部统计完后一次写出，而不是边统计边落盘：TSV 按总次数排序，任何词的总次数都要等
+所有分块合并完才知道，中途写出的只能是不完整、顺序也不对的中间结果。内存里只保留合并后的
+计数（唯一词数量级，与文件数无关），各分块的计数合并后即释放；写出先写临时文件再替换。
+
+单独运行: python term_counter.py <TXT 文件夹> <输出.tsv> [--workers N] [--chunk 512]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from multiprocessing import Pool
+
+# 单词或以单个空格/制表符连接的词组。不用 \s：换行不能算进词组，
+# 否则词里带换行，写出的 TSV 一行被拆成两行，读回时 int(count) 失败
+TERM_PATTERN = re.compile(r'\b[a-zA-Z0-9-]+(?:[ \t][a-zA-Z0-9-]+)*\b')
+
+
+def iter_txt_files(folder_path):
+    """用 scandir 流式列出文件夹下的 .txt 文件（不递归，与原逻辑一致）"""
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".txt") and entry.is_file():
+                yield entry.path
+
+
+def count_chunk(paths):
+    """map：统计一批文件的词频，逐个文件读取，不在内存里攒全文"""
+    counts = Counter()
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            counts.update(TERM_PATTERN.findall(file.read()))
+    return len(paths), counts
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def count_folder(folder_path, output_path, workers=None, chunk_size=512, progress=None):
+    """
+    统计文件夹内所有 .txt 的词频并按频率降序写入 TSV（词\\t次数）。
+    :param workers: 进程数，None 为 CPU 核数，0 表示在当前进程串行处理
+    :param progress: 回调 progress(已处理文件数, 文件总数)
+    :return: (文件总数, 唯一词数)
+    """
+    paths = list(iter_txt_files(folder_path))
+    total = len(paths)
+    totals = Counter()
+    done = 0
+    if progress:
+        progress(done, total)
+
+    chunks = chunked(paths, chunk_size)
+    if workers == 0 or total <= chunk_size:
+        results = map(count_chunk, chunks)
+        pool = None
+    else:
+        pool = Pool(processes=workers)
+        results = pool.imap_unordered(count_chunk, chunks)
+    try:
+        for finished, counts in results:
+            totals.update(counts)  # reduce
+            done += finished
+            if progress:
+                progress(done, total)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # 先写临时文件再替换，界面读到的永远是完整结果
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as out:
+        for term, count in sorted(totals.items(), key=lambda item: (-item[1], item[0])):
+            out.write(f"{term}\t{count}\n")
+    os.replace(tmp_path, output_path)
+    return total, len(totals)
+
+
+def read_term_counts(output_path):
+    """读取 count_folder 写出的 TSV，返回 [(词, 次数)]，保持频率降序"""
+    results = []
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            term, _, count = line.rstrip("\n").rpartition("\t")
+            results.append((term, int(count)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TXT 标签词频统计")
+    parser.add_argument("folder")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=512)
+    args = parser.parse_args()
+
+    def report(done, total):
+        print(json.dumps({"done": done, "total": total}), flush=True)
+
+    total, unique = count_folder(args.folder, args.output, args.workers, args.chunk, report)
+    print(json.dumps({"finished": True, "files": total, "terms": unique, "output": args.output}), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,17 +6,23 @@ import json
 import glob
 import tempfile
 import hashlib
+import threading
 import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.insert(0, os.path.dirname(__file__))
 
 from flask import Flask, render_template, request, jsonify
 from models.project_data import ProjectData, ReportInfo
 from core.batch_manager import (
+    calc_data_hash,
     get_system_entry,
     import_manifest as load_manifest_data,
     load_project_state,
     mark_generated,
+    project_state_lock,
+    refresh_batch_root,
     save_project_state,
     scan_batch_root as scan_batch_root_dirs,
     scan_project,
@@ -31,6 +37,13 @@ DEV_MODE = os.environ.get("DENGBAO_DEV_MODE") == "1"
 # Word 模版目录
 DOC_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "doc_templates")
 
+# 批量生成：待生成系统数达到该值才启用进程池（子进程启动本身约 1s 开销）
+BATCH_PARALLEL_THRESHOLD = 4
+# 内存中保留的批量任务数（供前端轮询）
+BATCH_JOBS_KEEP = 8
+_BATCH_JOBS = {}
+_BATCH_JOBS_LOCK = threading.Lock()
+
 
 @app.route("/")
 def index():
@@ -85,15 +98,29 @@ def scan_dir():
 
 @app.route("/api/scan_batch_root", methods=["POST"])
 def scan_batch_root():
-    """扫描总目录下的多个项目。"""
+    """扫描总目录下的多个项目。
+
+    复用扫描缓存，只重新扫描有变化的项目；监视模式传入上次的 scan_seq / scan_epoch，
+    changed 返回此后重新扫描过的项目目录（服务重启过则 full 为 True，全部项目都算变化）。
+    """
     root_dir = request.json.get("root_dir", "")
+    try:
+        since = int(request.json.get("since") or 0)
+    except (TypeError, ValueError):
+        since = 0
+    epoch = request.json.get("epoch") or None
     if not root_dir or not os.path.isdir(root_dir):
         return jsonify({"success": False, "message": "总目录不存在"}), 400
 
+    refreshed = refresh_batch_root(root_dir, since, epoch)
     return jsonify({
         "success": True,
         "root_dir": root_dir,
-        "projects": scan_batch_root_dirs(root_dir),
+        "projects": refreshed["projects"],
+        "scan_seq": refreshed["scan_seq"],
+        "scan_epoch": refreshed["scan_epoch"],
+        "full": refreshed["full"],
+        "changed": refreshed["changed"],
     })
 
 
@@ -144,16 +171,18 @@ def load_system():
         form_data["target"]["name"] = system["system_name"]
     report_data["system_name"] = system["system_name"]
 
-    upsert_system_entry(
-        state,
-        project_dir,
-        system,
-        project_name=project["project_name"],
-        output_dir=system.get("output_dir") or project.get("output_dir") or project_dir,
-        form_data=form_data,
-        report_data=report_data,
-    )
-    save_project_state(project_dir, state)
+    with project_state_lock(project_dir):
+        state = load_project_state(project_dir)  # 解析旧文档期间状态可能已被其他请求改过
+        upsert_system_entry(
+            state,
+            project_dir,
+            system,
+            project_name=project["project_name"],
+            output_dir=system.get("output_dir") or project.get("output_dir") or project_dir,
+            form_data=form_data,
+            report_data=report_data,
+        )
+        save_project_state(project_dir, state)
 
     return jsonify({
         "success": True,
@@ -187,18 +216,19 @@ def save_system():
     system_meta["system_id"] = system_id
     system_meta.setdefault("system_name", form_data.get("target", {}).get("name", ""))
 
-    state = load_project_state(project_dir)
-    entry = upsert_system_entry(
-        state,
-        project_dir,
-        system_meta,
-        project_name=project_name,
-        output_dir=payload.get("output_dir") or system_meta.get("output_dir") or project_dir,
-        form_data=form_data,
-        report_data=report_data,
-        ui_state=ui_state,
-    )
-    save_project_state(project_dir, state)
+    with project_state_lock(project_dir):
+        state = load_project_state(project_dir)
+        entry = upsert_system_entry(
+            state,
+            project_dir,
+            system_meta,
+            project_name=project_name,
+            output_dir=payload.get("output_dir") or system_meta.get("output_dir") or project_dir,
+            form_data=form_data,
+            report_data=report_data,
+            ui_state=ui_state,
+        )
+        save_project_state(project_dir, state)
     return jsonify({
         "success": True,
         "draft_hash": entry.get("draft_hash", ""),
@@ -256,19 +286,20 @@ def generate():
                 "survey": paths.get("survey", ""),
                 "output_dir": paths.get("output_dir", project_dir),
             }
-            state = load_project_state(project_dir)
-            upsert_system_entry(
-                state,
-                project_dir,
-                system_meta,
-                project_name=paths.get("project_name", ""),
-                output_dir=paths.get("output_dir", project_dir),
-                form_data=form_data,
-                report_data=report_data,
-                ui_state=payload.get("ui_state") or {},
-            )
-            mark_generated(state, system_id, result["files"])
-            save_project_state(project_dir, state)
+            with project_state_lock(project_dir):
+                state = load_project_state(project_dir)
+                upsert_system_entry(
+                    state,
+                    project_dir,
+                    system_meta,
+                    project_name=paths.get("project_name", ""),
+                    output_dir=paths.get("output_dir", project_dir),
+                    form_data=form_data,
+                    report_data=report_data,
+                    ui_state=payload.get("ui_state") or {},
+                )
+                mark_generated(state, system_id, result["files"])
+                save_project_state(project_dir, state)
 
         return jsonify({"success": True, **result})
     except Exception as e:
@@ -302,11 +333,7 @@ def preview():
             out = os.path.join(temp_dir, f"预览_{prefix}-备案表_{preview_token}.docx")
             generate_beian(paths["beian_template"], out, data, highlighted_fields=highlighted)
         else:
-<<<<<<< HEAD
             out = os.path.join(temp_dir, f"预览_{prefix}-定级报告_{preview_token}.docx")
-            generate_report(paths["report_template"], out, report, name, highlighted_fields=highlighted)
-=======
-            out = os.path.join(temp_dir, f"预览_定级报告_{name}_{preview_token}.docx")
             generate_report(
                 paths["report_template"],
                 out,
@@ -315,7 +342,6 @@ def preview():
                 highlighted_fields=highlighted,
                 report_highlights=report_highlights,
             )
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
 
         os.startfile(out)
         return jsonify({"success": True, "path": out})
@@ -325,7 +351,10 @@ def preview():
 
 @app.route("/api/generate_batch", methods=["POST"])
 def generate_batch():
-    """批量生成多个项目下的系统文档。"""
+    """批量生成多个项目下的系统文档。
+
+    后台任务方式执行：立即返回 job_id，逐系统结果通过 /api/generate_batch/<job_id> 轮询获取。
+    """
     payload = request.json
     root_dir = payload.get("root_dir", "")
     paths = payload.get("paths", {})
@@ -335,15 +364,19 @@ def generate_batch():
         for item in payload.get("selected_systems", [])
     }
     skip_updated = bool(payload.get("skip_updated", True))
+    workers = payload.get("workers")
+    if workers is not None:
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "workers 必须是整数"}), 400
 
     if not root_dir or not os.path.isdir(root_dir):
         return jsonify({"success": False, "message": "总目录不存在"}), 400
 
     projects = scan_batch_root_dirs(root_dir)
-    generated_count = 0
-    skipped_count = 0
-    failed_count = 0
-    results = []
+    plan = []
+    skipped = []
 
     for project in projects:
         project_dir = project["project_dir"]
@@ -352,15 +385,14 @@ def generate_batch():
 
         allow_system_ids = selected_systems.get(project_dir, set())
         state = load_project_state(project_dir)
-        state_changed = False
+        tasks = []
 
         for system in project["systems"]:
             if allow_system_ids and system["system_id"] not in allow_system_ids:
                 continue
 
             if skip_updated and not system.get("needs_update"):
-                skipped_count += 1
-                results.append({
+                skipped.append({
                     "project_name": project["project_name"],
                     "system_name": system["system_name"],
                     "status": "skipped",
@@ -369,70 +401,59 @@ def generate_batch():
                 continue
 
             entry = state.get("systems", {}).get(system["system_id"], {})
-            form_data = entry.get("form_data")
-            report_data = entry.get("report_data")
-            if not form_data or not report_data:
-                loaded = _load_source_payload(system.get("old_beian", ""), system.get("old_report", ""))
-                form_data = loaded["beian_data"] or _new_project_data_dict()
-                report_data = loaded["report_data"] or _new_report_dict()
-                form_data["project_name"] = project["project_name"]
-                form_data.setdefault("target", {})
-                if not form_data["target"].get("name"):
-                    form_data["target"]["name"] = system["system_name"]
-                report_data["system_name"] = system["system_name"]
-
-            try:
-                result = _generate_documents(
-                    {
-                        "project_name": project["project_name"],
-                        "document_name": form_data.get("target", {}).get("name") or system["system_name"],
-                        "beian_template": paths.get("beian_template", ""),
-                        "report_template": paths.get("report_template", ""),
-                        "output_dir": system.get("output_dir") or project.get("output_dir") or project_dir,
-                    },
-                    form_data,
-                    report_data,
-                )
-                upsert_system_entry(
-                    state,
-                    project_dir,
-                    system,
-                    project_name=project["project_name"],
-                    output_dir=system.get("output_dir") or project.get("output_dir") or project_dir,
-                    form_data=form_data,
-                    report_data=report_data,
-                    ui_state=entry.get("ui_state", {}),
-                )
-                mark_generated(state, system["system_id"], result["files"])
-                state_changed = True
-                generated_count += 1
-                results.append({
-                    "project_name": project["project_name"],
-                    "system_name": system["system_name"],
-                    "status": "generated",
-                    "message": result["message"],
-                })
-            except Exception as e:
-                failed_count += 1
-                results.append({
-                    "project_name": project["project_name"],
-                    "system_name": system["system_name"],
-                    "status": "failed",
-                    "message": str(e),
-                })
-
-        if state_changed:
-            save_project_state(project_dir, state)
+            tasks.append({
+                "project_name": project["project_name"],
+                "project_dir": project_dir,
+                "output_dir": system.get("output_dir") or project.get("output_dir") or project_dir,
+                "system": system,
+                "form_data": entry.get("form_data"),
+                "report_data": entry.get("report_data"),
+                "ui_state": entry.get("ui_state", {}),
+                "draft_hash": entry.get("draft_hash"),
+                "beian_template": paths.get("beian_template", ""),
+                "report_template": paths.get("report_template", ""),
+            })
+
+        if tasks:
+            plan.append((project_dir, tasks))
+
+    job = _create_batch_job(sum(len(tasks) for _, tasks in plan) + len(skipped))
+    for item in skipped:
+        _append_batch_result(job, item)
+    threading.Thread(
+        target=_run_batch_job, args=(job, plan, workers), daemon=True,
+    ).start()
 
     return jsonify({
         "success": True,
-        "generated_count": generated_count,
-        "skipped_count": skipped_count,
-        "failed_count": failed_count,
-        "results": results,
+        "job_id": job["job_id"],
+        "total": job["total"],
+        "skipped_count": job["skipped_count"],
     })
 
 
+@app.route("/api/generate_batch/<job_id>", methods=["GET"])
+def generate_batch_status(job_id):
+    """批量生成进度：返回 since 之后新增的逐系统结果。"""
+    since = request.args.get("since", 0, type=int)
+    with _BATCH_JOBS_LOCK:
+        job = _BATCH_JOBS.get(job_id)
+        if job is None:
+            return jsonify({"success": False, "message": "批量任务不存在或已过期"}), 404
+        return jsonify({
+            "success": True,
+            "done": job["done"],
+            "total": job["total"],
+            "finished": len(job["results"]),
+            "generated_count": job["generated_count"],
+            "skipped_count": job["skipped_count"],
+            "failed_count": job["failed_count"],
+            "workers": job["workers"],
+            "elapsed": round((job["ended_at"] or time.perf_counter()) - job["started_at"], 2),
+            "results": job["results"][since:],
+        })
+
+
 @app.route("/api/open_dir", methods=["POST"])
 def open_dir():
     """打开目录"""
@@ -517,8 +538,8 @@ def _load_source_payload(old_beian, old_report):
                     old_beian = ""
 
             if old_beian:
-                from core.doc_reader import read_beian_docx
-                data = read_beian_docx(old_beian)
+                from core.parse_cache import read_beian_cached
+                data = read_beian_cached(old_beian)
                 result["beian_data"] = _dataclass_to_dict(data)
                 result["changes"].append("从备案表加载了单位信息、定级对象等数据")
         except Exception as e:
@@ -536,8 +557,8 @@ def _load_source_payload(old_beian, old_report):
                     old_report = ""
 
             if old_report:
-                from core.doc_reader import read_report_docx
-                report = read_report_docx(old_report)
+                from core.parse_cache import read_report_cached
+                report = read_report_cached(old_report)
                 result["report_data"] = _dataclass_to_dict(report)
                 result["changes"].append("从定级报告加载了责任主体、等级等数据")
         except Exception as e:
@@ -561,14 +582,17 @@ def _generate_documents(paths, form_data, report_data):
 
     prefix = _resolve_filename_prefix(paths, form_data, report_data)
 
+    beian_timings, report_timings = {}, {}
+    started = time.perf_counter()
     beian_out = os.path.join(out_dir, f"{prefix}-备案表.docx")
-    generate_beian(paths["beian_template"], beian_out, data, highlighted_fields=highlighted)
+    generate_beian(
+        paths["beian_template"], beian_out, data,
+        highlighted_fields=highlighted, timings=beian_timings,
+    )
+    beian_elapsed = time.perf_counter() - started
 
-<<<<<<< HEAD
+    started = time.perf_counter()
     report_out = os.path.join(out_dir, f"{prefix}-定级报告.docx")
-    generate_report(paths["report_template"], report_out, report, name, highlighted_fields=highlighted)
-=======
-    report_out = os.path.join(out_dir, f"定级报告_{name}.docx")
     generate_report(
         paths["report_template"],
         report_out,
@@ -576,12 +600,186 @@ def _generate_documents(paths, form_data, report_data):
         name,
         highlighted_fields=highlighted,
         report_highlights=report_highlights,
+        timings=report_timings,
     )
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
+    report_elapsed = time.perf_counter() - started
 
     return {
         "files": [beian_out, report_out],
         "message": f"生成完成！\n备案表: {beian_out}\n定级报告: {report_out}",
+        "timings": {
+            "beian": round(beian_elapsed, 3),
+            "report": round(report_elapsed, 3),
+            "fill": round(beian_timings.get("fill", 0) + report_timings.get("fill", 0), 3),
+        },
+    }
+
+
+def _create_batch_job(total):
+    """登记一个批量任务；只保留最近几次任务，避免常驻进程内存增长。"""
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "total": total,
+        "done": False,
+        "workers": 0,
+        "results": [],
+        "generated_count": 0,
+        "skipped_count": 0,
+        "failed_count": 0,
+        "started_at": time.perf_counter(),
+        "ended_at": None,
+    }
+    with _BATCH_JOBS_LOCK:
+        _BATCH_JOBS[job["job_id"]] = job
+        while len(_BATCH_JOBS) > BATCH_JOBS_KEEP:
+            _BATCH_JOBS.pop(next(iter(_BATCH_JOBS)))
+    return job
+
+
+def _append_batch_result(job, item):
+    with _BATCH_JOBS_LOCK:
+        job["results"].append(item)
+        job[f"{item['status']}_count"] += 1
+
+
+def _run_batch_job(job, plan, workers):
+    """后台线程：把各系统分发到进程池，按完成顺序回写状态文件与任务结果。"""
+    pending = {project_dir: len(tasks) for project_dir, tasks in plan}
+    queue = [(project_dir, task) for project_dir, tasks in plan for task in tasks]
+    generated = {}  # project_dir -> [(task, result)]，项目全部完成（或中断）时合并进最新状态
+
+    pool = None
+    try:
+        # 放在 try 内：任何异常都要走到 finally 把任务标记为结束，否则前端会一直轮询
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 61)  # Windows 进程池上限 61
+        workers = max(0, min(int(workers), len(queue), 61))
+        if len(queue) < BATCH_PARALLEL_THRESHOLD:
+            workers = 0
+        job["workers"] = workers
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        if pool is not None:
+            futures = {
+                pool.submit(_generate_system_task, task): (project_dir, task)
+                for project_dir, task in queue
+            }
+            outcomes = ((*futures[f], f) for f in as_completed(futures))
+        else:
+            outcomes = ((project_dir, task, None) for project_dir, task in queue)
+
+        for project_dir, task, future in outcomes:
+            try:
+                result = future.result() if future is not None else _generate_system_task(task)
+            except Exception as e:
+                result = {"status": "failed", "message": str(e)}
+
+            if result["status"] == "generated":
+                generated.setdefault(project_dir, []).append((task, result))
+
+            pending[project_dir] -= 1
+            if not pending[project_dir] and project_dir in generated:
+                _save_batch_results(project_dir, generated.pop(project_dir))
+
+            _append_batch_result(job, {
+                "project_name": task["project_name"],
+                "system_name": task["system"]["system_name"],
+                "status": result["status"],
+                "message": result["message"],
+                "timings": result.get("timings", {}),
+            })
+    except Exception as e:
+        _append_batch_result(job, {
+            "project_name": "",
+            "system_name": "",
+            "status": "failed",
+            "message": f"批量任务中断: {e}",
+            "timings": {},
+        })
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        # 中途异常时，已成功生成的系统仍要落盘状态
+        for project_dir, done in generated.items():
+            _save_batch_results(project_dir, done)
+        with _BATCH_JOBS_LOCK:
+            job["done"] = True
+            job["ended_at"] = time.perf_counter()
+
+
+def _save_batch_results(project_dir, done):
+    """把一个项目内已生成的系统合并进最新的状态文件。
+
+    不回写任务开始时读到的状态副本：生成期间页面可能保存过同一项目，或另一个批量任务已写过状态。
+    系统草稿在生成期间被改过（draft_hash 与开始时不同）时保留新草稿，生成哈希记实际生成所用的数据，
+    页面仍会显示该系统待更新。
+    """
+    with project_state_lock(project_dir):
+        state = load_project_state(project_dir)
+        for task, result in done:
+            system_id = task["system"]["system_id"]
+            entry = state.get("systems", {}).get(system_id)
+            edited = entry is not None and entry.get("draft_hash") != task["draft_hash"]
+            upsert_system_entry(
+                state,
+                project_dir,
+                task["system"],
+                project_name=task["project_name"],
+                output_dir=task["output_dir"],
+                form_data=None if edited else result["form_data"],
+                report_data=None if edited else result["report_data"],
+                ui_state=None if entry is not None else task["ui_state"],
+            )
+            generated_entry = mark_generated(state, system_id, result["files"])
+            if edited:
+                generated_entry["generated_hash"] = calc_data_hash(result["form_data"], result["report_data"])
+        save_project_state(project_dir, state)
+
+
+def _generate_system_task(task):
+    """进程池任务：读取旧文档（如需）并生成单个系统的两份文档。
+
+    只接收/返回可 pickle 的 dict；状态文件由主进程统一回写。
+    """
+    system = task["system"]
+    form_data = task["form_data"]
+    report_data = task["report_data"]
+    timings = {}
+    try:
+        if not form_data or not report_data:
+            started = time.perf_counter()
+            loaded = _load_source_payload(system.get("old_beian", ""), system.get("old_report", ""))
+            timings["load"] = round(time.perf_counter() - started, 3)
+            form_data = loaded["beian_data"] or _new_project_data_dict()
+            report_data = loaded["report_data"] or _new_report_dict()
+            form_data["project_name"] = task["project_name"]
+            form_data.setdefault("target", {})
+            if not form_data["target"].get("name"):
+                form_data["target"]["name"] = system["system_name"]
+            report_data["system_name"] = system["system_name"]
+
+        result = _generate_documents(
+            {
+                "project_name": task["project_name"],
+                "document_name": form_data.get("target", {}).get("name") or system["system_name"],
+                "beian_template": task["beian_template"],
+                "report_template": task["report_template"],
+                "output_dir": task["output_dir"],
+            },
+            form_data,
+            report_data,
+        )
+    except Exception as e:
+        return {"status": "failed", "message": str(e), "timings": timings}
+
+    timings.update(result["timings"])
+    return {
+        "status": "generated",
+        "message": result["message"],
+        "files": result["files"],
+        "timings": timings,
+        "form_data": form_data,
+        "report_data": report_data,
     }
 
 
@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
-import glob
+import fnmatch
 import hashlib
 import json
 import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Tuple
 
@@ -19,39 +22,178 @@ SCAN_EXCLUDE_DIRS = {
     "doc_templates",
     "output",
 }
+# 扫描以网络共享目录的 I/O 等待为主，线程数可以高于 CPU 核数
+SCAN_WORKERS = 16
+# 内存中保留扫描缓存的总目录数
+SCAN_CACHE_ROOTS = 4
 
+_scan_cache: Dict[str, Dict[str, dict]] = {}
+_scan_cache_lock = threading.Lock()
+_scan_seq = 0
+# 每个进程不同；服务重启（开发模式自动重载）后 scan_seq 从头计数，前端据此判断需要全量刷新
+SCAN_EPOCH = uuid.uuid4().hex
 
-def scan_batch_root(root_dir: str) -> List[dict]:
+
+def scan_batch_root(root_dir: str, *, workers: int = SCAN_WORKERS, use_cache: bool = True) -> List[dict]:
     """扫描总目录，返回项目列表。"""
+    return refresh_batch_root(root_dir, workers=workers, use_cache=use_cache)["projects"]
+
+
+def refresh_batch_root(
+    root_dir: str,
+    since: int = 0,
+    epoch: str | None = None,
+    *,
+    workers: int = SCAN_WORKERS,
+    use_cache: bool = True,
+) -> dict:
+    """并发扫描总目录；复用上次结果，只重新扫描有变化的项目目录。
+
+    项目指纹 = 候选目录 mtime + 状态文件/源文件/生成文件的 (mtime, size)；
+    指纹未变的项目直接返回缓存结果，不再遍历目录、读状态文件、算摘要。
+
+    返回 {"projects", "scan_seq", "scan_epoch", "full", "changed"}：changed 为 scan_seq 大于
+    since 的项目目录，前端监视模式据此只刷新变化的项目。epoch 与本进程的 SCAN_EPOCH 不同
+    （服务重启过）或 since 超过本进程已分配的序号时，since 视为 0，full 为 True，全部项目都算变化。
+    """
+    with _scan_cache_lock:
+        issued = _scan_seq
+    full = (epoch is not None and epoch != SCAN_EPOCH) or since > issued
+    if full:
+        since = 0
+    result = {"projects": [], "scan_seq": since, "scan_epoch": SCAN_EPOCH, "full": full, "changed": []}
     if not root_dir or not os.path.isdir(root_dir):
-        return []
+        return result
 
-    projects: List[dict] = []
-    child_dirs = [
+    root_names = _list_dir(root_dir)
+    child_dirs = sorted(
         os.path.join(root_dir, name)
-        for name in sorted(os.listdir(root_dir))
-        if os.path.isdir(os.path.join(root_dir, name))
-        and name not in SCAN_EXCLUDE_DIRS
+        for name in root_names
+        if name not in SCAN_EXCLUDE_DIRS
         and not name.startswith(".")
-    ]
-
-    for child_dir in child_dirs:
-        project = scan_project(child_dir)
-        if project["systems"]:
-            projects.append(project)
+        and os.path.isdir(os.path.join(root_dir, name))
+    )
+    listings = {root_dir: root_names}
+
+    cache_key = os.path.abspath(root_dir)
+    with _scan_cache_lock:
+        cache = _scan_cache.pop(cache_key, {}) if use_cache else {}
+        # 最近使用的总目录放到末尾，超出数量淘汰最久未用的
+        _scan_cache[cache_key] = cache
+        while len(_scan_cache) > SCAN_CACHE_ROOTS:
+            _scan_cache.pop(next(iter(_scan_cache)))
+
+    def task(project_dir):
+        return _scan_project_cached(cache, project_dir, listings)
+
+    scanned = _map_threads(task, child_dirs, workers)
+    if not any(entry["project"]["systems"] for entry in scanned):
+        # 总目录本身就是一个项目
+        scanned = [_scan_project_cached(cache, root_dir, {})]
+
+    with _scan_cache_lock:
+        alive = {entry["project"]["project_dir"] for entry in scanned}
+        for project_dir in list(cache):
+            if project_dir not in alive:
+                del cache[project_dir]
+
+    for entry in scanned:
+        if not entry["project"]["systems"]:
+            continue
+        result["projects"].append(entry["project"])
+        result["scan_seq"] = max(result["scan_seq"], entry["seq"])
+        if entry["seq"] > since:
+            result["changed"].append(entry["project"]["project_dir"])
+    return result
 
-    if not projects:
-        fallback = scan_project(root_dir)
-        if fallback["systems"]:
-            projects.append(fallback)
 
-    return projects
+def clear_scan_cache(root_dir: str = "") -> None:
+    """清除扫描缓存；root_dir 为空时全部清除。"""
+    with _scan_cache_lock:
+        if root_dir:
+            _scan_cache.pop(os.path.abspath(root_dir), None)
+        else:
+            _scan_cache.clear()
 
 
 def scan_project(project_dir: str) -> dict:
     """扫描单个项目目录。"""
-    state = load_project_state(project_dir)
-    systems = _discover_systems(project_dir, state)
+    return _scan_project_entry(project_dir, {})["project"]
+
+
+def _scan_project_cached(cache: dict, project_dir: str, listings: dict) -> dict:
+    cached = cache.get(project_dir)
+    if cached is not None and _fingerprint_unchanged(cached, listings):
+        return cached
+    entry = _scan_project_entry(project_dir, listings)
+    with _scan_cache_lock:
+        cache[project_dir] = entry
+    return entry
+
+
+def _scan_project_entry(project_dir: str, listings: dict) -> dict:
+    """扫描项目并记录指纹；listings 为已列出的目录（总目录），避免重复列目录。"""
+    state_path = os.path.join(project_dir, STATE_FILENAME)
+    # 先取指纹再读内容：读取期间发生的修改会在下次扫描时被发现
+    state_token = _stat_token(state_path)
+    parent_survey = _find_parent_survey(project_dir, listings)
+    candidates = _walk_candidate_dirs(project_dir)
+    local_listings = dict(listings)
+    local_listings.update((directory, names) for directory, _mtime, names in candidates)
+
+    project = _build_project(project_dir, load_project_state(project_dir), candidates, local_listings)
+
+    files = {state_path: state_token}
+    for system in project["systems"]:
+        paths = [system.get("old_beian"), system.get("old_report"), system.get("survey")]
+        for path in paths + list(system.get("generated_files") or []):
+            if path and path not in files:
+                files[path] = _stat_token(path)
+    return {
+        "project": project,
+        "dirs": {directory: mtime for directory, mtime, _names in candidates},
+        "files": files,
+        # 项目目录的调查表可回退到上级目录查找，上级目录只比对查找结果
+        "parent_survey": parent_survey,
+        "seq": _next_seq(),
+    }
+
+
+def _next_seq() -> int:
+    global _scan_seq
+    with _scan_cache_lock:
+        _scan_seq += 1
+        return _scan_seq
+
+
+def _fingerprint_unchanged(entry: dict, listings: dict) -> bool:
+    project_dir = entry["project"]["project_dir"]
+    if _find_parent_survey(project_dir, listings) != entry["parent_survey"]:
+        return False
+    for directory, mtime in entry["dirs"].items():
+        if _mtime_ns(directory) != mtime:
+            return False
+    for path, token in entry["files"].items():
+        if _stat_token(path) != token:
+            return False
+    return True
+
+
+def _find_parent_survey(project_dir: str, listings: dict) -> str | None:
+    parent_dir = os.path.dirname(project_dir)
+    key = ("survey", parent_dir)
+    if key not in listings:
+        # 同一轮扫描内所有项目共享上级目录（总目录）的查找结果
+        names = listings.get(parent_dir)
+        listings[key] = (
+            _find_file(parent_dir, "*调查表*.docx", names)
+            or _find_file(parent_dir, "*基本情况*.docx", names)
+        )
+    return listings[key]
+
+
+def _build_project(project_dir: str, state: dict, candidates, listings) -> dict:
+    systems = _discover_systems(project_dir, state, candidates, listings)
 
     pending_count = sum(1 for item in systems if item.get("needs_update"))
     updated_count = sum(1 for item in systems if not item.get("needs_update"))
@@ -69,6 +211,21 @@ def scan_project(project_dir: str) -> dict:
     }
 
 
+_state_locks: Dict[str, threading.Lock] = {}
+_state_locks_guard = threading.Lock()
+
+
+def project_state_lock(project_dir: str) -> threading.Lock:
+    """项目状态文件的读-改-写锁。
+
+    批量生成在后台线程里跑几分钟，期间页面仍可保存同一项目或再发起批量任务；
+    凡是"读取状态 → 修改 → 保存"都要在锁内重新读取，避免拿旧副本覆盖别人的改动。
+    """
+    key = os.path.normcase(os.path.abspath(project_dir))
+    with _state_locks_guard:
+        return _state_locks.setdefault(key, threading.Lock())
+
+
 def load_project_state(project_dir: str) -> dict:
     """读取项目状态文件。"""
     state_path = os.path.join(project_dir, STATE_FILENAME)
@@ -260,10 +417,10 @@ def import_manifest(manifest_path: str) -> dict:
     }
 
 
-def _discover_systems(project_dir: str, state: dict) -> List[dict]:
+def _discover_systems(project_dir: str, state: dict, candidates, listings) -> List[dict]:
     systems_by_id: Dict[str, dict] = {}
-    for source_dir in _iter_candidate_dirs(project_dir):
-        system_meta = _build_system_meta(project_dir, source_dir)
+    for source_dir, _mtime, _names in candidates:
+        system_meta = _build_system_meta(project_dir, source_dir, listings)
         if not system_meta:
             continue
         systems_by_id[system_meta["system_id"]] = _merge_system_meta(
@@ -334,17 +491,19 @@ def _merge_system_meta(system_meta: dict, entry: dict) -> dict:
     return merged
 
 
-def _build_system_meta(project_dir: str, source_dir: str) -> dict | None:
-    old_beian = _find_file(source_dir, "*备案表*.docx") or _find_file(source_dir, "*备案表*.doc")
-    old_report = _find_file(source_dir, "*定级报告*.docx") or _find_file(source_dir, "*定级报告*.doc")
-    survey = (
-        _find_file(source_dir, "*调查表*.docx")
-        or _find_file(source_dir, "*基本情况*.docx")
-        or _find_file(os.path.dirname(source_dir), "*调查表*.docx")
-        or _find_file(os.path.dirname(source_dir), "*基本情况*.docx")
-    )
+def _build_system_meta(project_dir: str, source_dir: str, listings: dict) -> dict | None:
+    names = listings.get(source_dir)
+    parent_dir = os.path.dirname(source_dir)
+    old_beian = _find_file(source_dir, "*备案表*.docx", names) or _find_file(source_dir, "*备案表*.doc", names)
+    old_report = _find_file(source_dir, "*定级报告*.docx", names) or _find_file(source_dir, "*定级报告*.doc", names)
     if not old_beian and not old_report:
         return None
+    survey = (
+        _find_file(source_dir, "*调查表*.docx", names)
+        or _find_file(source_dir, "*基本情况*.docx", names)
+        or _find_file(parent_dir, "*调查表*.docx", listings.get(parent_dir))
+        or _find_file(parent_dir, "*基本情况*.docx", listings.get(parent_dir))
+    )
 
     system_name = _guess_system_name(source_dir, old_beian, old_report)
     system_id = _build_system_id(project_dir, source_dir)
@@ -359,19 +518,72 @@ def _build_system_meta(project_dir: str, source_dir: str) -> dict | None:
     }
 
 
-def _iter_candidate_dirs(project_dir: str, max_depth: int = 2):
-    for root, dirs, _files in os.walk(project_dir):
-        rel_path = os.path.relpath(root, project_dir)
-        depth = 0 if rel_path == "." else rel_path.count(os.sep) + 1
-        dirs[:] = [
-            name
-            for name in dirs
-            if name not in SCAN_EXCLUDE_DIRS and not name.startswith(".")
-        ]
-        if depth > max_depth:
-            dirs[:] = []
+def _walk_candidate_dirs(project_dir: str, max_depth: int = 2) -> List[Tuple[str, int, List[str]]]:
+    """os.scandir 遍历项目目录（深度 ≤ max_depth），返回 [(目录, mtime_ns, 条目名)]。
+
+    目录 mtime 在列目录之前读取，列目录期间的新增/删除会在下次扫描时被发现。
+    """
+    result = []
+    stack = [(project_dir, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        mtime = _mtime_ns(directory)
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        result.append((directory, mtime, [entry.name for entry in entries]))
+        if depth >= max_depth:
             continue
-        yield root
+        subdirs = sorted(
+            entry.path
+            for entry in entries
+            if entry.name not in SCAN_EXCLUDE_DIRS
+            and not entry.name.startswith(".")
+            and _is_real_dir(entry)
+        )
+        stack.extend((path, depth + 1) for path in reversed(subdirs))
+    return result
+
+
+def _is_real_dir(entry) -> bool:
+    # 与 os.walk 默认行为一致：不进入目录符号链接
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+
+def _map_threads(fn, items: list, workers: int) -> list:
+    """线程池按输入顺序映射；workers<=1 或只有一项时串行。"""
+    workers = min(workers or 0, len(items))
+    if workers <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, items))
+
+
+def _list_dir(directory: str) -> List[str]:
+    try:
+        return os.listdir(directory)
+    except OSError:
+        return []
+
+
+def _mtime_ns(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _stat_token(path: str) -> Tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 
 def _guess_project_name(project_dir: str, systems: List[dict]) -> str:
@@ -403,11 +615,22 @@ def _build_system_id(project_dir: str, source_dir: str) -> str:
     return f"{safe}__{suffix}"
 
 
-def _find_file(directory: str, pattern: str) -> str | None:
-    if not directory or not os.path.isdir(directory):
+def _find_file(directory: str, pattern: str, names: List[str] | None = None) -> str | None:
+    """按 glob 语义在目录中查找（隐藏文件不参与匹配），多个命中取最短路径。
+
+    names 为已列出的目录条目，传入时不再访问文件系统。
+    """
+    if not directory:
         return None
-    matches = glob.glob(os.path.join(directory, pattern))
-    return min(matches, key=len) if matches else None
+    if names is None:
+        if not os.path.isdir(directory):
+            return None
+        names = _list_dir(directory)
+    matches = [
+        name for name in names
+        if not name.startswith(".") and fnmatch.fnmatch(name, pattern)
+    ]
+    return os.path.join(directory, min(matches, key=len)) if matches else None
 
 
 def _now_str() -> str:
@@ -1,14 +1,23 @@
 """新文档生成 — 精准 run 级填充，保留模版格式"""
 
 import os
-import shutil
 import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from copy import deepcopy
+from dataclasses import dataclass
 from docx import Document
+from lxml import etree
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.shared import Inches, RGBColor, Pt
-from docx.oxml.ns import qn
+from docx.oxml.ns import qn, nsmap
 from docx.oxml import OxmlElement
+from docx.oxml.text.run import _RunContentAppender
+from docx.document import Document as DocxDocument
+from docx.table import _Cell
 from docx.text.paragraph import Paragraph
 from models.project_data import ProjectData, ReportInfo
 from core.format_style import (
@@ -16,23 +25,134 @@ from core.format_style import (
 )
 
 
-<<<<<<< HEAD
-# 生成态：备案表强制五号(10.5pt)；定级报告保留模板字号
-_FILL_FORCE_SIZE = None
+# 生成态：备案表强制五号(10.5pt)；定级报告保留模板字号。
+# 用 ContextVar 而非模块全局变量，线程/协程各自独立，批量并发生成互不串扰。
+_FILL_FORCE_SIZE = ContextVar("dengbao_fill_force_size", default=None)
 
-
-def _set_fill_mode(mode):
-    """mode: 'beian' → 强制 10.5pt；'report' → 保留模板"""
-    global _FILL_FORCE_SIZE
-    if mode == 'beian':
-        _FILL_FORCE_SIZE = Pt(10.5)
-    else:
-        _FILL_FORCE_SIZE = None
-=======
 FONT_REPORT_TITLE = "方正小标宋简体"
 SIZE_REPORT_TITLE = Pt(22)
 SIZE_REPORT_BODY = Pt(14)
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
+
+
+# 编译态模板：解析一次常驻内存，每份文档深拷贝一份
+TEMPLATE_CACHE_SIZE = 4
+_TEMPLATE_CACHE = OrderedDict()
+_TEMPLATE_CACHE_LOCK = threading.Lock()
+# 当前文档各表格的 (行, 列) → w:tc 网格，供 _cell 直接索引
+_CELL_GRIDS = ContextVar("dengbao_cell_grids", default=None)
+_RUN_CONTENT_XPATH = etree.XPath("./*[not(self::w:rPr)]", namespaces={"w": nsmap["w"]})
+
+
+@dataclass
+class CompiledTemplate:
+    """预编译的 Word 模版。
+
+    cell_paths 记录每个正文表格 python-docx 语义下 rows[r].cells[c] 对应的
+    (w:tr 序号, w:tc 序号)，横向合并重复、纵向合并指向起始格，与 python-docx 完全一致。
+    """
+    path: str
+    document: object
+    cell_paths: list
+
+    def instantiate(self):
+        """深拷贝出一份独立文档，返回 (doc, {w:tbl: [[w:tc, ...], ...]})。"""
+        # 拷贝 DocumentPart（连带整个包），再用它的根元素重建 Document：
+        # lxml 元素的 deepcopy 不走 memo，直接拷 Document 会让 doc 与 part 各持一棵树
+        part = deepcopy(self.document.part)
+        doc = DocxDocument(part.element, part)
+        grids = {}
+        for table, paths in zip(doc.tables, self.cell_paths):
+            tcs = [tr.tc_lst for tr in table._tbl.tr_lst]
+            grids[table._tbl] = [[tcs[tr_idx][tc_idx] for tr_idx, tc_idx in row] for row in paths]
+        return doc, grids
+
+
+def compile_template(template_path: str) -> CompiledTemplate:
+    """解析并编译模版；按 路径+mtime+大小 缓存，模版文件被替换后自动重新编译。"""
+    stat = os.stat(template_path)
+    key = (os.path.abspath(template_path), stat.st_mtime_ns, stat.st_size)
+    with _TEMPLATE_CACHE_LOCK:
+        compiled = _TEMPLATE_CACHE.get(key)
+        if compiled is not None:
+            _TEMPLATE_CACHE.move_to_end(key)
+            return compiled
+
+    doc = Document(template_path)
+    compiled = CompiledTemplate(
+        path=template_path,
+        document=doc,
+        cell_paths=[_table_cell_paths(table) for table in doc.tables],
+    )
+    with _TEMPLATE_CACHE_LOCK:
+        _TEMPLATE_CACHE[key] = compiled
+        while len(_TEMPLATE_CACHE) > TEMPLATE_CACHE_SIZE:
+            _TEMPLATE_CACHE.popitem(last=False)
+    return compiled
+
+
+def _table_cell_paths(table):
+    tr_index = {}
+    tc_index = {}
+    for i, tr in enumerate(table._tbl.tr_lst):
+        tr_index[tr] = i
+        for j, tc in enumerate(tr.tc_lst):
+            tc_index[tc] = j
+    return [
+        [(tr_index[cell._tc.getparent()], tc_index[cell._tc]) for cell in row.cells]
+        for row in table.rows
+    ]
+
+
+@contextmanager
+def cell_grids(grids):
+    """在当前上下文绑定文档的单元格网格，退出时恢复。"""
+    token = _CELL_GRIDS.set(grids)
+    try:
+        yield
+    finally:
+        _CELL_GRIDS.reset(token)
+
+
+def _cell(table, row, col):
+    """等价于 table.rows[row].cells[col]。
+
+    已绑定编译网格时按索引直取，免去 python-docx 每次重建整行（含纵向合并回溯）；
+    该表被增删过行（网格失效）时回退到 python-docx。
+    """
+    grids = _CELL_GRIDS.get()
+    grid = grids.get(table._tbl) if grids else None
+    if grid is not None:
+        try:
+            tc = grid[row][col]
+        except IndexError:
+            tc = None
+        if tc is not None:
+            tr = tc.getparent()
+            if tr is not None and tr.getparent() is table._tbl:
+                return _Cell(tc, table)
+    return table.rows[row].cells[col]
+
+
+def _record_timings(timings, started, filled, saved, finished):
+    if timings is not None:
+        timings.update({
+            "prepare": round(filled - started, 4),
+            "fill": round(saved - filled, 4),
+            "save": round(finished - saved, 4),
+        })
+
+
+@contextmanager
+def fill_mode(mode):
+    """显式声明当前生成上下文的填写模式，退出时恢复外层模式（可重入）。
+
+    mode: 'beian' → 强制 10.5pt；'report' → 保留模板
+    """
+    token = _FILL_FORCE_SIZE.set(Pt(10.5) if mode == 'beian' else None)
+    try:
+        yield
+    finally:
+        _FILL_FORCE_SIZE.reset(token)
 
 
 # ══════════════════════════════════════════════════════
@@ -126,9 +246,20 @@ def _apply_report_body_format(paragraph):
         )
 
 
+def _assign_run_text(run, text):
+    """同 run.text = text，但用预编译的 XPath 清空 run 内容。
+
+    python-docx 的 CT_R.clear_content 每次调用都重新编译 XPath 表达式，填充热路径上开销明显。
+    """
+    r = run._r
+    for child in _RUN_CONTENT_XPATH(r):
+        r.remove(child)
+    _RunContentAppender.append_to_run_from_text(r, text)
+
+
 def _set_run_text(run, text):
     """\u586b\u5199\u503c\u7684\u5b57\u4f53\u7edf\u4e00\uff1a\u4e2d\u6587 \u4eff\u5b8b_GB2312\u3001\u897f\u6587 Times New Roman\uff0c\u5907\u6848\u8868 mode \u5f3a\u5236 10.5pt\u3002"""
-    run.text = text
+    _assign_run_text(run, text)
     raw_text = str(text or "")
     if raw_text:
         _set_run_font_slots(
@@ -136,8 +267,9 @@ def _set_run_text(run, text):
             east_asia_font=FONT_FANG_GB,
             western_font="Times New Roman",
         )
-    if _FILL_FORCE_SIZE is not None:
-        run.font.size = _FILL_FORCE_SIZE
+    force_size = _FILL_FORCE_SIZE.get()
+    if force_size is not None:
+        run.font.size = force_size
     elif run.font.size is None:
         run.font.size = Pt(10.5)
 
@@ -599,7 +731,7 @@ def _safe_set_value(table, row, col, text):
     """
     value = "" if text is None else str(text).strip()
     try:
-        cell = table.rows[row].cells[col]
+        cell = _cell(table, row, col)
         for p in cell.paragraphs:
             if p.runs:
                 style_run = p.runs[0]
@@ -607,7 +739,7 @@ def _safe_set_value(table, row, col, text):
                 _copy_run_style(style_run, p.runs[0])
                 _set_run_text(p.runs[0], value)
                 for run in p.runs[1:]:
-                    run.text = ''
+                    _assign_run_text(run, '')
                 return
         # 没有 run 则新建
         if cell.paragraphs and value:
@@ -623,22 +755,26 @@ def _safe_set_value(table, row, col, text):
 #  备案表生成
 # ══════════════════════════════════════════════════════
 
-def generate_beian(template_path: str, output_path: str, data: ProjectData, highlighted_fields=None):
-    """基于新备案表模版生成填充后的备案表（精准填充）"""
+def generate_beian(template_path: str, output_path: str, data: ProjectData, highlighted_fields=None,
+                   timings=None):
+    """基于新备案表模版生成填充后的备案表（精准填充）
+
+    timings 传入 dict 时写入本份文档各阶段耗时（秒）：prepare / fill / save。
+    """
     if highlighted_fields is None:
         highlighted_fields = []
-    shutil.copy2(template_path, output_path)
-    doc = Document(output_path)
+    started = time.perf_counter()
+    doc, grids = compile_template(template_path).instantiate()
 
     if len(doc.tables) < 7:
         raise ValueError(f"模版表格数不足: 期望>=7, 实际{len(doc.tables)}")
 
-    _set_fill_mode('beian')
-    try:
+    filled = time.perf_counter()
+    with fill_mode('beian'), cell_grids(grids):
         _fill_beian_internal(doc, data, highlighted_fields)
-        doc.save(output_path)
-    finally:
-        _set_fill_mode('report')
+    saved = time.perf_counter()
+    doc.save(output_path)
+    _record_timings(timings, started, filled, saved, time.perf_counter())
     return output_path
 
 
@@ -711,7 +847,7 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
     _safe_set_value(t2, 1, 1, u.credit_code)     # 信用代码
 
     # 地址：精准填空（只替换空格占位 run）
-    _fill_address(t2.rows[2].cells[1], u.province, u.city, u.county, u.address)
+    _fill_address(_cell(t2, 2, 1), u.province, u.city, u.county, u.address)
 
     _safe_set_value(t2, 3, 1, u.postal_code)     # 邮编
     _safe_set_value(t2, 3, 6, u.admin_code)       # 行政区划代码
@@ -743,17 +879,17 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
     # 隶属关系（勾选）
     if u.affiliation:
         code = u.affiliation.split('-')[0] if '-' in u.affiliation else u.affiliation
-        _find_and_check(t2.rows[14].cells[1], code)
+        _find_and_check(_cell(t2, 14, 1), code)
 
     # 单位类型（勾选）
     if u.unit_type:
         code = u.unit_type.split('-')[0] if '-' in u.unit_type else u.unit_type
-        _find_and_check(t2.rows[15].cells[1], code)
+        _find_and_check(_cell(t2, 15, 1), code)
 
     # 行业类别（勾选）- 行16的单元格结构比较特殊，数字编号在不同run中
     if u.industry:
         code = u.industry.split('-')[0] if '-' in u.industry else u.industry
-        _find_and_check(t2.rows[16].cells[1], code)
+        _find_and_check(_cell(t2, 16, 1), code)
 
     # 定级对象数量（自动补"个"后缀，未填值则置 "0个"，保持原模板视觉一致）
     def _cnt(v):
@@ -792,7 +928,7 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
                 code_idx += 1
 
     # 定级对象类型（勾选）
-    type_cell = t3.rows[1].cells[2]
+    type_cell = _cell(t3, 1, 2)
     if tgt.target_type:
         _find_and_check(type_cell, tgt.target_type)
     # 技术类型多选
@@ -805,11 +941,11 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
     # 业务类型（勾选）
     if tgt.biz_type:
         code = tgt.biz_type.split('-')[0] if '-' in tgt.biz_type else tgt.biz_type
-        _find_and_check(t3.rows[2].cells[2], code)
+        _find_and_check(_cell(t3, 2, 2), code)
         if code == '9' and tgt.biz_type_other:
-            _fill_other_option(t3.rows[2].cells[2], '其他', tgt.biz_type_other)
+            _fill_other_option(_cell(t3, 2, 2), '其他', tgt.biz_type_other)
         else:
-            _clear_other_residue(t3.rows[2].cells[2])
+            _clear_other_residue(_cell(t3, 2, 2))
 
     # 业务描述（纯值）
     _safe_set_value(t3, 3, 2, tgt.biz_desc)
@@ -817,59 +953,54 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
     # 服务范围（勾选）
     if tgt.service_scope:
         code = tgt.service_scope.split('-')[0] if '-' in tgt.service_scope else tgt.service_scope
-        _find_and_check(t3.rows[4].cells[2], code)
-<<<<<<< HEAD
-        if code == '99' and tgt.service_scope_other:
-            _fill_other_option(t3.rows[4].cells[2], '其它', tgt.service_scope_other)
-        else:
-            _clear_other_residue(t3.rows[4].cells[2])
-=======
+        _find_and_check(_cell(t3, 4, 2), code)
         service_scope_other = tgt.service_scope_other or ('本单位' if code == '99' else '')
         if code == '99' and service_scope_other:
-            _fill_other_option(t3.rows[4].cells[2], '其它', service_scope_other)
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
+            _fill_other_option(_cell(t3, 4, 2), '其它', service_scope_other)
+        else:
+            _clear_other_residue(_cell(t3, 4, 2))
 
     # 服务对象（勾选）
     if tgt.service_target:
         code = tgt.service_target.split('-')[0] if '-' in tgt.service_target else tgt.service_target
-        _find_and_check(t3.rows[5].cells[2], code)
+        _find_and_check(_cell(t3, 5, 2), code)
         if code == '9' and tgt.service_target_other:
-            _fill_other_option(t3.rows[5].cells[2], '其他', tgt.service_target_other)
+            _fill_other_option(_cell(t3, 5, 2), '其他', tgt.service_target_other)
         else:
-            _clear_other_residue(t3.rows[5].cells[2])
+            _clear_other_residue(_cell(t3, 5, 2))
 
     # 部署范围（勾选）
     if tgt.deploy_scope:
         code = tgt.deploy_scope.split('-')[0] if '-' in tgt.deploy_scope else tgt.deploy_scope
-        _find_and_check(t3.rows[6].cells[2], code)
+        _find_and_check(_cell(t3, 6, 2), code)
         if code == '9' and tgt.deploy_scope_other:
-            _fill_other_option(t3.rows[6].cells[2], '其他', tgt.deploy_scope_other)
+            _fill_other_option(_cell(t3, 6, 2), '其他', tgt.deploy_scope_other)
         else:
-            _clear_other_residue(t3.rows[6].cells[2])
+            _clear_other_residue(_cell(t3, 6, 2))
 
     # 网络性质（勾选）
     if tgt.network_type:
         code = tgt.network_type.split('-')[0] if '-' in tgt.network_type else tgt.network_type
-        _find_and_check(t3.rows[7].cells[2], code)
+        _find_and_check(_cell(t3, 7, 2), code)
         if code == '2':
-            _fill_numbered_lines(t3.rows[7].cells[2], [tgt.source_ip, tgt.domain, tgt.protocol_port])
+            _fill_numbered_lines(_cell(t3, 7, 2), [tgt.source_ip, tgt.domain, tgt.protocol_port])
         if code == '9' and tgt.network_type_other:
-            _fill_other_option(t3.rows[7].cells[2], '其他', tgt.network_type_other)
+            _fill_other_option(_cell(t3, 7, 2), '其他', tgt.network_type_other)
 
     # 网络互联（勾选）
     if tgt.interconnect:
         code = tgt.interconnect.split('-')[0] if '-' in tgt.interconnect else tgt.interconnect
-        _find_and_check(t3.rows[8].cells[2], code)
+        _find_and_check(_cell(t3, 8, 2), code)
         interconnect_other = tgt.interconnect_other or ('无连接' if code == '9' else '')
         if code == '9' and interconnect_other:
-            _fill_other_option(t3.rows[8].cells[2], '其它', interconnect_other)
+            _fill_other_option(_cell(t3, 8, 2), '其它', interconnect_other)
 
     # 运行时间（纯值）
-    _fill_date_cell(t3.rows[9].cells[2], tgt.run_date)
+    _fill_date_cell(_cell(t3, 9, 2), tgt.run_date)
 
     # 是否分系统（勾选）
     if tgt.is_subsystem:
-        _find_and_check(t3.rows[10].cells[2], tgt.is_subsystem)
+        _find_and_check(_cell(t3, 10, 2), tgt.is_subsystem)
 
     # 上级系统
     _safe_set_value(t3, 11, 2, tgt.parent_system or '/')
@@ -882,19 +1013,19 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
     svc_row_map = {"第一级": 6, "第二级": 7, "第三级": 8, "第四级": 9, "第五级": 10}
 
     if g.biz_level in biz_row_map:
-        _check_paragraph_items(t4.rows[biz_row_map[g.biz_level]].cells[1], g.biz_level_items)
-        _check_first_sym_in_paragraph(t4.rows[biz_row_map[g.biz_level]].cells[4].paragraphs[0], True)
+        _check_paragraph_items(_cell(t4, biz_row_map[g.biz_level], 1), g.biz_level_items)
+        _check_first_sym_in_paragraph(_cell(t4, biz_row_map[g.biz_level], 4).paragraphs[0], True)
     if g.service_level in svc_row_map:
-        _check_paragraph_items(t4.rows[svc_row_map[g.service_level]].cells[1], g.service_level_items)
-        _check_first_sym_in_paragraph(t4.rows[svc_row_map[g.service_level]].cells[4].paragraphs[0], True)
+        _check_paragraph_items(_cell(t4, svc_row_map[g.service_level], 1), g.service_level_items)
+        _check_first_sym_in_paragraph(_cell(t4, svc_row_map[g.service_level], 4).paragraphs[0], True)
     if g.final_level:
-        _find_and_check(t4.rows[11].cells[2], g.final_level, multi=True)
+        _find_and_check(_cell(t4, 11, 2), g.final_level, multi=True)
 
     # 定级时间
-    _fill_date_cell(t4.rows[12].cells[2], g.grading_date)
+    _fill_date_cell(_cell(t4, 12, 2), g.grading_date)
 
     # 定级报告（勾选有/无 + 填附件名）
-    report_cell = t4.rows[13].cells[2]
+    report_cell = _cell(t4, 13, 2)
     if g.has_report:
         _find_and_check(report_cell, '有')
     else:
@@ -903,7 +1034,7 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
         _fill_after_keyword(report_cell, '附件名称', g.report_name)
 
     # 专家评审（勾选 + 附件名）
-    review_cell = t4.rows[14].cells[2]
+    review_cell = _cell(t4, 14, 2)
     if g.has_review:
         _find_and_check(review_cell, '已评审')
     else:
@@ -912,14 +1043,14 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
         _fill_after_keyword(review_cell, '附件名称', g.review_name)
 
     # 上级主管部门
-    supervisor_cell = t4.rows[15].cells[2]
+    supervisor_cell = _cell(t4, 15, 2)
     if g.has_supervisor:
         _find_and_check(supervisor_cell, '有')
     else:
         _find_and_check(supervisor_cell, '无')
 
     _safe_set_value(t4, 16, 2, g.supervisor_name or '/')
-    audit_cell = t4.rows[17].cells[2]
+    audit_cell = _cell(t4, 17, 2)
     audit_status = g.supervisor_review_status or ('已审核' if g.supervisor_reviewed else '未审核')
     _find_and_check(audit_cell, audit_status)
     if audit_status == '已审核' and g.supervisor_doc:
@@ -927,35 +1058,35 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
 
     # 填表人 / 填表日期
     _safe_set_value(t4, 18, 0, f"填表人：{g.filler}")
-    _fill_date_cell(t4.rows[18].cells[3], g.fill_date)
+    _fill_date_cell(_cell(t4, 18, 3), g.fill_date)
 
     # ══════ 表5: 应用场景 (index 4) — 保持模版默认，仅填已有数据 ══════
     if len(doc.tables) > 4:
         t5 = doc.tables[4]
         sc = data.scenario
         if sc.cloud.enabled:
-            _find_and_check(t5.rows[0].cells[2], '是')
+            _find_and_check(_cell(t5, 0, 2), '是')
             if sc.cloud.role:
                 if sc.cloud.role == '二者均勾选':
-                    _find_and_check(t5.rows[1].cells[2], '云服务商', multi=True)
-                    _find_and_check(t5.rows[1].cells[2], '云服务客户', multi=True)
+                    _find_and_check(_cell(t5, 1, 2), '云服务商', multi=True)
+                    _find_and_check(_cell(t5, 1, 2), '云服务客户', multi=True)
                 else:
-                    _find_and_check(t5.rows[1].cells[2], sc.cloud.role, multi=True)
+                    _find_and_check(_cell(t5, 1, 2), sc.cloud.role, multi=True)
             if sc.cloud.service_model:
-                _find_and_check(t5.rows[2].cells[2], sc.cloud.service_model)
+                _find_and_check(_cell(t5, 2, 2), sc.cloud.service_model)
                 if sc.cloud.service_model == '其他' and sc.cloud.service_model_other:
-                    _fill_other_option(t5.rows[2].cells[2], '其他', sc.cloud.service_model_other)
+                    _fill_other_option(_cell(t5, 2, 2), '其他', sc.cloud.service_model_other)
             if sc.cloud.deploy_model:
-                _find_and_check(t5.rows[3].cells[2], sc.cloud.deploy_model)
+                _find_and_check(_cell(t5, 3, 2), sc.cloud.deploy_model)
                 if sc.cloud.deploy_model == '其他' and sc.cloud.deploy_model_other:
-                    _fill_other_option(t5.rows[3].cells[2], '其他', sc.cloud.deploy_model_other)
+                    _fill_other_option(_cell(t5, 3, 2), '其他', sc.cloud.deploy_model_other)
             if sc.cloud.role in ('云服务商', '二者均勾选'):
-                _fill_underline_field(t5.rows[5].cells[2], sc.cloud.provider_scale)
+                _fill_underline_field(_cell(t5, 5, 2), sc.cloud.provider_scale)
                 _safe_set_value(t5, 6, 2, sc.cloud.infra_location)
                 _safe_set_value(t5, 7, 2, sc.cloud.ops_location)
             if sc.cloud.role in ('云服务客户', '二者均勾选'):
                 _fill_cloud_provider_line(
-                    t5.rows[9].cells[2],
+                    _cell(t5, 9, 2),
                     sc.cloud.provider_name,
                     sc.cloud.platform_level or '三级',
                     sc.cloud.platform_name,
@@ -963,36 +1094,36 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
                 )
                 _safe_set_value(t5, 10, 2, sc.cloud.client_ops_location)
                 if sc.cloud.platform_cert:
-                    _fill_after_keyword(t5.rows[11].cells[2], '附件', sc.cloud.platform_cert)
+                    _fill_after_keyword(_cell(t5, 11, 2), '附件', sc.cloud.platform_cert)
         else:
-            _find_and_check(t5.rows[0].cells[2], '否')
-        _find_and_check(t5.rows[12].cells[2], '是' if sc.mobile.enabled else '否')
+            _find_and_check(_cell(t5, 0, 2), '否')
+        _find_and_check(_cell(t5, 12, 2), '是' if sc.mobile.enabled else '否')
         if sc.mobile.enabled:
             _safe_set_value(t5, 13, 2, sc.mobile.app_name)
             if sc.mobile.wireless:
-                _find_and_check(t5.rows[14].cells[2], sc.mobile.wireless, multi=True)
+                _find_and_check(_cell(t5, 14, 2), sc.mobile.wireless, multi=True)
             if sc.mobile.terminal:
-                _find_and_check(t5.rows[15].cells[2], sc.mobile.terminal, multi=True)
-        _find_and_check(t5.rows[16].cells[2], '是' if sc.iot.enabled else '否')
+                _find_and_check(_cell(t5, 15, 2), sc.mobile.terminal, multi=True)
+        _find_and_check(_cell(t5, 16, 2), '是' if sc.iot.enabled else '否')
         if sc.iot.enabled:
-            _fill_scenario_options(t5.rows[17].cells[2], sc.iot.perception)
-            _fill_scenario_options(t5.rows[18].cells[2], sc.iot.transport)
-        _find_and_check(t5.rows[19].cells[2], '是' if sc.ics.enabled else '否')
+            _fill_scenario_options(_cell(t5, 17, 2), sc.iot.perception)
+            _fill_scenario_options(_cell(t5, 18, 2), sc.iot.transport)
+        _find_and_check(_cell(t5, 19, 2), '是' if sc.ics.enabled else '否')
         if sc.ics.enabled:
-            _fill_scenario_options(t5.rows[20].cells[2], sc.ics.function_layer)
-            _fill_scenario_options(t5.rows[21].cells[2], sc.ics.composition)
-        _find_and_check(t5.rows[22].cells[2], '是' if sc.bigdata.enabled else '否')
+            _fill_scenario_options(_cell(t5, 20, 2), sc.ics.function_layer)
+            _fill_scenario_options(_cell(t5, 21, 2), sc.ics.composition)
+        _find_and_check(_cell(t5, 22, 2), '是' if sc.bigdata.enabled else '否')
         if sc.bigdata.enabled:
-            _fill_scenario_options(t5.rows[23].cells[2], sc.bigdata.composition)
+            _fill_scenario_options(_cell(t5, 23, 2), sc.bigdata.composition)
             if sc.bigdata.cross_border:
-                _find_and_check(t5.rows[24].cells[2], sc.bigdata.cross_border, multi=True)
+                _find_and_check(_cell(t5, 24, 2), sc.bigdata.cross_border, multi=True)
             comp_tokens = [t.strip() for t in (sc.bigdata.composition or '').replace('，', ',').replace('、', ',').split(',') if t.strip()]
             has_platform = any('大数据平台' in tok for tok in comp_tokens)
             has_client = any(('大数据应用' in tok) or ('大数据资源' in tok) for tok in comp_tokens)
             # r26-r28: 大数据平台填写
             if has_platform:
                 if sc.bigdata.platform_scale:
-                    _fill_underline_field(t5.rows[26].cells[2], sc.bigdata.platform_scale)
+                    _fill_underline_field(_cell(t5, 26, 2), sc.bigdata.platform_scale)
                 if sc.bigdata.platform_infra:
                     _safe_set_value(t5, 27, 2, sc.bigdata.platform_infra)
                 if sc.bigdata.platform_ops:
@@ -1000,14 +1131,14 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
             # r30-r31: 大数据应用、大数据资源填写
             if has_client:
                 _fill_cloud_provider_line(
-                    t5.rows[30].cells[2],
+                    _cell(t5, 30, 2),
                     sc.bigdata.platform_provider,
                     sc.bigdata.platform_level or '第三级',
                     sc.bigdata.platform_name,
                     _normalize_platform_code(sc.bigdata.platform_code),
                 )
                 if sc.bigdata.platform_cert:
-                    _fill_after_keyword(t5.rows[31].cells[2], '附件', sc.bigdata.platform_cert)
+                    _fill_after_keyword(_cell(t5, 31, 2), '附件', sc.bigdata.platform_cert)
 
     # ══════ 表6: 附件清单 (index 5) — 勾选有/无 ══════
     if len(doc.tables) > 5:
@@ -1018,7 +1149,7 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
             (3, att.product_list), (4, att.service_list), (5, att.supervisor_doc)
         ]
         for row_idx, item in items:
-            cell = t6.rows[row_idx].cells[1]
+            cell = _cell(t6, row_idx, 1)
             if item.has_file:
                 _find_and_check(cell, '有')
                 if item.file_name:
@@ -1033,25 +1164,25 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
         _safe_set_value(t7, 0, 1, d.data_name)
         if d.data_level:
             code = d.data_level.split('-')[0] if '-' in d.data_level else d.data_level
-            _find_and_check(t7.rows[0].cells[3], code)
+            _find_and_check(_cell(t7, 0, 3), code)
         _safe_set_value(t7, 1, 1, d.data_category)
         _safe_set_value(t7, 2, 1, d.data_dept)
         _safe_set_value(t7, 2, 3, d.data_person)
         # 个人信息（勾选）
         if d.personal_info:
             code = d.personal_info.split('-')[0] if '-' in d.personal_info else d.personal_info
-            _find_and_check(t7.rows[3].cells[1], code)
+            _find_and_check(_cell(t7, 3, 1), code)
         # 数据总量 / 月增长量 — 只填数字到下划线处
         if d.total_size or d.total_size_tb or d.total_size_records:
             _fill_total_size_cell(
-                t7.rows[4].cells[1],
+                _cell(t7, 4, 1),
                 d.total_size_tb if d.total_size_unit == 'TB' else d.total_size,
                 d.total_size_unit,
                 d.total_size_records,
             )
         if d.monthly_growth or d.monthly_growth_tb:
             _fill_month_growth_cell(
-                t7.rows[5].cells[1],
+                _cell(t7, 5, 1),
                 d.monthly_growth_tb if d.monthly_growth_unit == 'TB' else d.monthly_growth,
                 d.monthly_growth_unit,
             )
@@ -1059,32 +1190,32 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
             for source in d.data_source.split(','):
                 code = source.strip().split('-')[0]
                 if code:
-                    _find_and_check(t7.rows[6].cells[1], code, multi=True)
+                    _find_and_check(_cell(t7, 6, 1), code, multi=True)
             if '9-' in d.data_source and d.data_source_other:
-                _fill_other_option(t7.rows[6].cells[1], '其他', d.data_source_other)
-        _fill_numbered_lines(t7.rows[7].cells[1], [item.strip() for item in d.inflow_units.splitlines() if item.strip()])
-        _fill_numbered_lines(t7.rows[8].cells[1], [item.strip() for item in d.outflow_units.splitlines() if item.strip()])
+                _fill_other_option(_cell(t7, 6, 1), '其他', d.data_source_other)
+        _fill_numbered_lines(_cell(t7, 7, 1), [item.strip() for item in d.inflow_units.splitlines() if item.strip()])
+        _fill_numbered_lines(_cell(t7, 8, 1), [item.strip() for item in d.outflow_units.splitlines() if item.strip()])
         if d.interaction:
             code = d.interaction.split('-')[0]
-            _find_and_check(t7.rows[9].cells[1], code)
+            _find_and_check(_cell(t7, 9, 1), code)
             if code != '4' and d.interaction_other:
-                _fill_numbered_lines(t7.rows[9].cells[1], [d.interaction_other])
+                _fill_numbered_lines(_cell(t7, 9, 1), [d.interaction_other])
         if d.storage_type:
             code = d.storage_type.split('-')[0]
-            _find_and_check(t7.rows[10].cells[1], code)
+            _find_and_check(_cell(t7, 10, 1), code)
             # 取真正的位置名：过滤掉前端误传的 select 显示文本（"5-非云计算平台"等）
             raw_name = (d.storage_cloud_name or d.storage_cloud or '').strip()
             if raw_name and (raw_name == d.storage_type or raw_name.startswith(code + '-') or raw_name.startswith(code + ' ')):
                 raw_name = ''
-            _fill_option_line(t7.rows[10].cells[1], code, raw_name)
+            _fill_option_line(_cell(t7, 10, 1), code, raw_name)
         if d.storage_room:
             code = d.storage_room.split('-')[0]
-            _find_and_check(t7.rows[11].cells[1], code)
-            _fill_option_line(t7.rows[11].cells[1], code, d.storage_room_name)
+            _find_and_check(_cell(t7, 11, 1), code)
+            _fill_option_line(_cell(t7, 11, 1), code, d.storage_room_name)
         if d.storage_region:
             code = d.storage_region.split('-')[0]
-            _find_and_check(t7.rows[12].cells[1], code)
-            _fill_option_line(t7.rows[12].cells[1], code, d.storage_region_name)
+            _find_and_check(_cell(t7, 12, 1), code)
+            _fill_option_line(_cell(t7, 12, 1), code, d.storage_region_name)
 
     # ══════ 标黄处理 — 对用户标记的字段在文档中高亮 ══════
     if highlighted_fields:
@@ -1109,7 +1240,7 @@ def _fill_beian_internal(doc, data: ProjectData, highlighted_fields):
             if field_id in field_cell_map:
                 ti, ri, ci = field_cell_map[field_id]
                 try:
-                    cell = doc.tables[ti].rows[ri].cells[ci]
+                    cell = _cell(doc.tables[ti], ri, ci)
                     _highlight_cell(cell)
                 except (IndexError, AttributeError):
                     pass
@@ -1335,46 +1466,46 @@ def _check_paragraph_items(cell, items):
 
 def generate_report(template_path: str, output_path: str,
                     report: ReportInfo, project_name: str, highlighted_fields=None,
-                    report_highlights=None):
-    """基于新定级报告模版生成填充后的定级报告"""
+                    report_highlights=None, timings=None):
+    """基于新定级报告模版生成填充后的定级报告
+
+    timings 同 generate_beian。
+    """
     if highlighted_fields is None:
         highlighted_fields = []
-<<<<<<< HEAD
-    _set_fill_mode('report')
-=======
     if report_highlights is None:
         report_highlights = {}
     system_name = (report.system_name or project_name or "").strip()
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
-    shutil.copy2(template_path, output_path)
-    doc = Document(output_path)
+    started = time.perf_counter()
+    doc, grids = compile_template(template_path).instantiate()
+
+    filled = time.perf_counter()
+    with fill_mode('report'), cell_grids(grids):
+        _fill_report_internal(doc, report, system_name, report_highlights)
+    saved = time.perf_counter()
+    doc.save(output_path)
+    _record_timings(timings, started, filled, saved, time.perf_counter())
+    return output_path
+
 
+def _fill_report_internal(doc, report: ReportInfo, system_name, report_highlights):
+    """实际填充逻辑（拆出来以便 generate_report 控制 fill mode）。"""
     # ── 第一遍：替换文本、删除说明 ──
     paragraphs_to_remove = []
-<<<<<<< HEAD
 
-    # 章节标题 → 该章节正文应替换的字段值
+    # 章节标题 → (该章节正文应替换的字段值, 前端字段 id（局部标黄）, 是否按行分段)
     section_title_to_value = {
-        "（一）责任主体": report.responsibility,
-        "（二）定级对象构成": report.composition,
-        "（三）承载业务": report.business_desc,
-        "（四）承载数据": report.carried_data,
-        "（五）安全责任": report.security_resp,
-        "1、业务信息描述": report.biz_info_desc,
-        "2、业务信息受到破坏时所侵害客体的确定": report.biz_victim,
-        "3、业务信息受到破坏时对侵害客体的侵害程度的确定": report.biz_degree,
-        "1、系统服务描述": report.svc_desc,
-        "2、系统服务受到破坏时所侵害客体的确定": report.svc_victim,
-        "3、系统服务受到破坏时对侵害客体的侵害程度的确定": report.svc_degree,
-=======
-    section_body_map = {
+        "（一）责任主体": (report.responsibility, "rpt_responsibility", False),
+        "（二）定级对象构成": (report.composition, "rpt_composition", True),
+        "（三）承载业务": (report.business_desc, "rpt_business", False),
+        "（四）承载数据": (report.carried_data, "rpt_carried_data", False),
+        "（五）安全责任": (report.security_resp, "rpt_security", False),
         "1、业务信息描述": (report.biz_info_desc, "rpt_biz_info", False),
         "2、业务信息受到破坏时所侵害客体的确定": (report.biz_victim, "rpt_biz_victim", False),
         "3、业务信息受到破坏时对侵害客体的侵害程度的确定": (report.biz_degree, "rpt_biz_degree", False),
         "1、系统服务描述": (report.svc_desc, "rpt_svc_desc", False),
         "2、系统服务受到破坏时所侵害客体的确定": (report.svc_victim, "rpt_svc_victim", False),
         "3、系统服务受到破坏时对侵害客体的侵害程度的确定": (report.svc_degree, "rpt_svc_degree", False),
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
     }
 
     # 按段落顺序划分章节正文（标题段之后、下一个标题之前的所有非空段为该节正文）
@@ -1417,13 +1548,17 @@ def generate_report(template_path: str, output_path: str,
     if current_value is not None:
         sections_to_apply.append((current_value, current_body_paras))
 
-<<<<<<< HEAD
-    # 应用替换：每节首段替换为新值，其余段标记删除
-    for value, body_paras in sections_to_apply:
+    # 应用替换：每节首段替换为新值（正文格式 + 局部标黄），其余段标记删除
+    for (value, field_id, split_lines), body_paras in sections_to_apply:
         if not body_paras:
             continue
         if value:
-            _replace_paragraph_text(body_paras[0], value)
+            _replace_body_paragraphs(
+                body_paras[0],
+                value,
+                split_lines=split_lines,
+                highlight_snippets=report_highlights.get(field_id, []),
+            )
             for extra in body_paras[1:]:
                 paragraphs_to_remove.append(extra)
         else:
@@ -1434,20 +1569,6 @@ def generate_report(template_path: str, output_path: str,
     for p in paragraphs_all:
         text = p.text.strip()
         if not text:
-=======
-        if pending_section and text.startswith("【"):
-            replacement, field_id, split_lines = section_body_map.get(pending_section, ("", "", False))
-            if replacement:
-                _replace_body_paragraphs(
-                    p,
-                    replacement,
-                    split_lines=split_lines,
-                    highlight_snippets=report_highlights.get(field_id, []),
-                )
-            else:
-                paragraphs_to_remove.append(p)
-            pending_section = ""
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
             continue
 
         # 替换标题（XX → 项目名），保持格式一致
@@ -1469,43 +1590,6 @@ def generate_report(template_path: str, output_path: str,
             paragraphs_to_remove.append(p)
             continue
 
-<<<<<<< HEAD
-=======
-        # 替换参考示例内容
-        if "定级对象于XX年" in text and report.responsibility:
-            _replace_body_paragraphs(
-                p,
-                report.responsibility,
-                split_lines=False,
-                highlight_snippets=report_highlights.get("rpt_responsibility", []),
-            )
-            continue
-        elif "网络中部署了XXX防火墙" in text and report.composition:
-            _replace_body_paragraphs(
-                p,
-                report.composition,
-                split_lines=True,
-                highlight_snippets=report_highlights.get("rpt_composition", []),
-            )
-            continue
-        elif "该定级对象承载着综合办公业务" in text and report.business_desc:
-            _replace_body_paragraphs(
-                p,
-                report.business_desc,
-                split_lines=False,
-                highlight_snippets=report_highlights.get("rpt_business", []),
-            )
-            continue
-        elif "按照网络安全法" in text and report.security_resp:
-            _replace_body_paragraphs(
-                p,
-                report.security_resp,
-                split_lines=False,
-                highlight_snippets=report_highlights.get("rpt_security", []),
-            )
-            continue
-
->>>>>>> abbe1ee3b89a69f778cf4d76563b8d6501679cae
         # 替换子系统表描述
         if "该定级对象包括以下子系统" in text:
             if not report.subsystems:
@@ -1575,9 +1659,6 @@ def generate_report(template_path: str, output_path: str,
                 _safe_set_value(table, 1, 3, report.svc_level)
             break
 
-    doc.save(output_path)
-    return output_path
-
 
 def _remove_consecutive_blanks(doc):
     """压缩连续空段落，最多保留1个"""
@@ -1611,7 +1692,7 @@ def _shade_matrix_tables(doc, report):
         col_idx = _match_matrix_col(degree_text)
         if row_idx is None or col_idx is None:
             continue
-        _shade_cell_gray(table.rows[row_idx].cells[col_idx])
+        _shade_cell_gray(_cell(table, row_idx, col_idx))
 
 
 def _match_matrix_row(text):
@@ -1810,7 +1891,7 @@ def _replace_body_paragraphs(paragraph, text, split_lines=False, highlight_snipp
 
 def _cell_text_safe(table, row, col):
     try:
-        return table.rows[row].cells[col].text.strip()
+        return _cell(table, row, col).text.strip()
     except (IndexError, AttributeError):
         return ""
 
@@ -0,0 +1,135 @@
+"""旧文档解析结果缓存 — 以 build_source_signature 摘要为键，Web 与 Qt 界面共用。
+
+python-docx 解析一份旧备案表/定级报告要几十到几百毫秒，批量扫描时反复解析同一批文件
+是主要耗时。这里把解析出的 dataclass 以 pickle + zlib 存到工具目录下的 .cache/parsed，
+进程内再保留一层 LRU；源文件路径/大小/mtime 或解析代码任一变化，键随之变化自动失效。
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+
+from core.batch_manager import build_source_signature, signature_digest
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(TOOL_DIR, ".cache", "parsed")
+MEMORY_CACHE_SIZE = 512
+
+# 这些文件变化（解析逻辑或 dataclass 字段调整）后，旧缓存一律作废
+_READER_FILES = (
+    os.path.join(TOOL_DIR, "core", "doc_reader.py"),
+    os.path.join(TOOL_DIR, "core", "doc_reader_legacy.py"),
+    os.path.join(TOOL_DIR, "models", "project_data.py"),
+)
+
+_memory: "OrderedDict[str, bytes]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def read_beian_cached(path: str):
+    """read_beian_docx 的缓存版本，返回新的 ProjectData 实例。"""
+    from core.doc_reader import read_beian_docx
+    return _read_cached("old_beian", path, read_beian_docx)
+
+
+def read_report_cached(path: str):
+    """read_report_docx 的缓存版本，返回新的 ReportInfo 实例。"""
+    from core.doc_reader import read_report_docx
+    return _read_cached("old_report", path, read_report_docx)
+
+
+def cache_key(kind: str, path: str) -> str | None:
+    """源文件签名 + 解析代码签名的摘要；文件不存在时返回 None（不缓存）。"""
+    signature = build_source_signature({kind: path})
+    if not signature:
+        return None
+    return signature_digest({"source": signature, "reader": _reader_token()})
+
+
+def clear_parse_cache() -> int:
+    """清空内存与磁盘缓存，返回删除的磁盘条目数。"""
+    with _memory_lock:
+        _memory.clear()
+    removed = 0
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".pkz"):
+                try:
+                    os.remove(os.path.join(CACHE_DIR, name))
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+def _read_cached(kind, path, reader):
+    key = cache_key(kind, path)
+    if key is None:
+        return reader(path)
+
+    with _memory_lock:
+        blob = _memory.get(key)
+        if blob is not None:
+            _memory.move_to_end(key)
+    if blob is None:
+        blob = _load_blob(key)
+        if blob is None:
+            # 解析失败直接抛出，不写缓存
+            blob = pickle.dumps(reader(path), protocol=pickle.HIGHEST_PROTOCOL)
+            _save_blob(key, blob)
+        _remember(key, blob)
+    # 每次反序列化出新对象，调用方随意修改也不会污染缓存
+    return pickle.loads(blob)
+
+
+def _remember(key, blob):
+    with _memory_lock:
+        _memory[key] = blob
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def _blob_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pkz")
+
+
+def _load_blob(key):
+    try:
+        with open(_blob_path(key), "rb") as f:
+            return zlib.decompress(f.read())
+    except (OSError, zlib.error):
+        return None
+
+
+def _save_blob(key, blob):
+    """原子写入；缓存目录不可写时静默跳过，不影响解析结果。"""
+    path = _blob_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(blob, 6))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=1)
+def _reader_token():
+    token = []
+    for path in _READER_FILES:
+        try:
+            stat = os.stat(path)
+            token.append([os.path.basename(path), int(stat.st_mtime), stat.st_size])
+        except OSError:
+            token.append([os.path.basename(path), 0, 0])
+    return token
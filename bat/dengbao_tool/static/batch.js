@@ -5,6 +5,8 @@ const batchState = {
   manifest: null,
   currentProjectDir: '',
   currentSystemId: '',
+  scanSeq: 0,
+  scanEpoch: '',
   initialUiState: {},
   initialFormData: null,
   initialReportData: null,
@@ -188,8 +190,11 @@ window.scanBatchRoot = async function scanBatchRoot(preserveSelection = false) {
     batchState.mode = 'batch';
     batchState.rootDir = data.root_dir;
     batchState.projects = data.projects || [];
+    batchState.scanSeq = data.scan_seq || 0;
+    batchState.scanEpoch = data.scan_epoch || '';
     mergeManifestProjects();
     renderBatchProjectList();
+    startBatchWatch();
 
     const nextProject = findProject(previousProjectDir) || batchState.projects[0];
     const nextSystemId = previousProjectDir && previousProjectDir === (nextProject && nextProject.project_dir)
@@ -396,25 +401,129 @@ window.generateBatchDocs = async function generateBatchDocs() {
         skip_updated: true,
       }),
     });
-    const data = await res.json();
-    if (!data.success) {
-      showAlert('batch-result', data.message || '批量生成失败', 'error');
+    const started = await res.json();
+    if (!started.success) {
+      showAlert('batch-result', started.message || '批量生成失败', 'error');
       return;
     }
 
+    const data = await pollBatchJob(started.job_id);
     const summary = [
-      `批量生成完成`,
+      `批量生成完成（${data.elapsed}s${data.workers > 1 ? `，${data.workers} 进程` : ''}）`,
       `生成 ${data.generated_count} 项`,
       `跳过 ${data.skipped_count} 项`,
       `失败 ${data.failed_count} 项`,
     ].join('，');
-    showAlert('batch-result', summary, data.failed_count ? 'error' : 'success');
+    renderBatchResults(summary, data.failed_count ? 'error' : 'success');
     await scanBatchRoot(true);
   } catch (e) {
     showAlert('batch-result', '批量生成失败: ' + e, 'error');
   }
 };
 
+const batchResultLines = [];
+
+async function pollBatchJob(jobId) {
+  batchResultLines.length = 0;
+  let since = 0;
+  for (;;) {
+    const res = await fetch(`/api/generate_batch/${encodeURIComponent(jobId)}?since=${since}`, {cache: 'no-store'});
+    const data = await res.json();
+    if (!data.success) {
+      throw new Error(data.message || '批量任务状态获取失败');
+    }
+    data.results.forEach(item => batchResultLines.push(formatBatchResult(item)));
+    since += data.results.length;
+    if (data.done) {
+      return data;
+    }
+    renderBatchResults(`正在批量生成：${data.finished}/${data.total}（${data.elapsed}s）`, 'info');
+    await new Promise(resolve => setTimeout(resolve, 800));
+  }
+}
+
+function formatBatchResult(item) {
+  const label = {generated: '✓', skipped: '－', failed: '✗'}[item.status] || '?';
+  const name = [item.project_name, item.system_name].filter(Boolean).map(escapeHtml).join(' / ');
+  const t = item.timings || {};
+  const timing = item.status === 'generated'
+    ? `（${t.load != null ? `读取 ${t.load}s，` : ''}备案表 ${t.beian}s，定级报告 ${t.report}s${t.fill != null ? `，其中填充 ${t.fill}s` : ''}）`
+    : '';
+  const detail = item.status === 'generated' ? '' : `：${escapeHtml(item.message || '')}`;
+  return `${label} ${name}${timing}${detail}`;
+}
+
+function renderBatchResults(title, type) {
+  const lines = batchResultLines.slice(-200);
+  const more = batchResultLines.length > lines.length ? `（仅显示最近 ${lines.length} 条）\n` : '';
+  showAlert('batch-result', [title, more + lines.join('\n')].filter(Boolean).join('\n'), type);
+}
+
+// ── 总目录监视：定时增量扫描，只替换有变化的项目 ──
+const BATCH_WATCH_INTERVAL = 10000;
+let batchWatchTimer = null;
+let batchWatchBusy = false;
+
+function startBatchWatch() {
+  if (!batchWatchTimer) {
+    batchWatchTimer = setInterval(refreshBatchRoot, BATCH_WATCH_INTERVAL);
+  }
+}
+
+async function refreshBatchRoot() {
+  if (batchWatchBusy || document.hidden || batchState.mode !== 'batch' || !batchState.rootDir) {
+    return;
+  }
+  batchWatchBusy = true;
+  try {
+    const rootDir = batchState.rootDir;
+    const res = await fetch('/api/scan_batch_root', {
+      method: 'POST',
+      headers: {'Content-Type':'application/json'},
+      body: JSON.stringify({root_dir: rootDir, since: batchState.scanSeq, epoch: batchState.scanEpoch}),
+    });
+    const data = await res.json();
+    if (!data.success || rootDir !== batchState.rootDir) {
+      return;
+    }
+    // 服务重启后序号从头计数（epoch 变化或序号倒退）：以本次结果为准，全部项目视为变化
+    const full = data.full || data.scan_epoch !== batchState.scanEpoch || (data.scan_seq || 0) < batchState.scanSeq;
+    batchState.scanSeq = data.scan_seq || 0;
+    batchState.scanEpoch = data.scan_epoch || '';
+
+    const changed = full
+      ? new Set(data.projects.map(project => project.project_dir))
+      : new Set(data.changed || []);
+    const incoming = new Set(data.projects.map(project => project.project_dir));
+    const removed = batchState.projects.filter(project => !incoming.has(project.project_dir));
+    if (!changed.size && !removed.length) {
+      return;
+    }
+
+    // 当前项目可能有未保存的编辑，不自动替换，只提示
+    const currentDir = batchState.currentProjectDir;
+    const current = getCurrentProject();
+    const previous = new Map(batchState.projects.map(project => [project.project_dir, project]));
+    batchState.projects = data.projects.map(project => (
+      project.project_dir === currentDir || !changed.has(project.project_dir)
+        ? (previous.get(project.project_dir) || project)
+        : project
+    ));
+    if (current && !incoming.has(currentDir)) {
+      batchState.projects.push(current);
+    }
+    mergeManifestProjects();
+    renderBatchProjectList();
+    if (current && (changed.has(currentDir) || !incoming.has(currentDir))) {
+      showAlert('scan-result', '当前项目目录有变化，保存后点击“扫描总目录”刷新。', 'info');
+    }
+  } catch (e) {
+    // 监视失败不打扰用户，下个周期重试
+  } finally {
+    batchWatchBusy = false;
+  }
+}
+
 window.toggleTheme = function toggleTheme() {
   const current = document.documentElement.dataset.theme === 'light' ? 'light' : 'dark';
   const next = current === 'light' ? 'dark' : 'light';
@@ -235,8 +235,8 @@ class MainWindow(QMainWindow):
                             "请手动用 Word 打开该文件，另存为 .docx 格式后重新选择。")
                         return False
 
-                from core.doc_reader import read_beian_docx
-                data = read_beian_docx(old_beian)
+                from core.parse_cache import read_beian_cached
+                data = read_beian_cached(old_beian)
                 self.step2.load_data(data)
                 loaded_any = True
                 if not paths["project_name"] and data.project_name:
@@ -249,8 +249,8 @@ class MainWindow(QMainWindow):
         old_report = paths["old_report"]
         if old_report and os.path.exists(old_report):
             try:
-                from core.doc_reader import read_report_docx
-                report = read_report_docx(old_report)
+                from core.parse_cache import read_report_cached
+                report = read_report_cached(old_report)
                 self.step2.load_report(report)
                 loaded_any = True
             except Exception as e:
@@ -0,0 +1,78 @@
+"""Mod 索引缓存加载基准：旧版 JSON 与二进制缓存的体积、保存与启动加载耗时对比。
+
+合成一个整合版规模的索引（默认 6 万个 mod + 2000 张卡的依赖），分别写成两种格式，
+各加载若干次取中位数；另测加载后查 200 个 guid（模拟检查卡片）与全量遍历的耗时。
+
+用法: python bench_mod_index.py [--mods 60000] [--cards 2000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from core.mod_index import ModEntry, ModIndex
+
+
+def make_index(mods: int, cards: int, rng: random.Random) -> ModIndex:
+    idx = ModIndex()
+    base = r"D:\Games\Koikatsu\mods\Sideloader Modpack"
+    packs = ["", " - Exclusive KK", " - Studio", " - Maps", " - Fixes"]
+    guids = []
+    for i in range(mods):
+        guid = f"com.author{i % 3000}.mod{i}"
+        path = f"{base}{packs[i % len(packs)]}\\author{i % 3000}\\[author{i % 3000}] Mod {i} v1.{i % 10}.zipmod"
+        idx.entries[guid] = ModEntry(guid, f"Mod {i}", f"1.{i % 10}", f"author{i % 3000}", path)
+        idx.files[path] = (1_600_000_000 + i, 100_000 + i * 7, guid)
+        guids.append(guid)
+    for c in range(cards):
+        deps = {rng.choice(guids): rng.randint(1, 4) for _ in range(rng.randint(5, 60))}
+        idx.cards[f"D:\\Games\\Koikatsu\\UserData\\chara\\female\\card{c}.png"] = (1_700_000_000_000_000_000 + c, 200_000 + c, deps)
+    return idx
+
+
+def timed(fn, repeat: int) -> tuple[float, object]:
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mod 索引缓存加载基准")
+    parser.add_argument("--mods", type=int, default=60000)
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    idx = make_index(args.mods, args.cards, rng)
+    probe = rng.sample(list(idx.entries), min(200, len(idx.entries)))
+    print(f"合成索引：{len(idx.entries)} 个 mod，{len(idx.files)} 个文件指纹，{len(idx.cards)} 张卡")
+    print(f"{'格式':<8}{'体积':>10}{'保存':>10}{'加载':>10}{'查200个':>10}{'全量遍历':>10}")
+    with tempfile.TemporaryDirectory() as d:
+        for label, fmt, name in (("JSON", "json", "mod_index.json"), ("二进制", "binary", "mod_index.idx")):
+            path = Path(d) / name
+            save_s, _ = timed(lambda: idx.save(path, fmt=fmt), args.repeat)
+            load_s, loaded = timed(lambda: ModIndex.load(path), args.repeat)
+            assert loaded.count == idx.count
+            start = time.perf_counter()
+            for g in probe:
+                loaded.get(g)
+            probe_s = time.perf_counter() - start
+            start = time.perf_counter()
+            sum(len(e.path) for e in loaded.entries.values())
+            walk_s = time.perf_counter() - start
+            size_mb = path.stat().st_size / 1024 / 1024
+            print(f"{label:<8}{size_mb:>8.1f}MB{save_s * 1000:>8.0f}ms{load_s * 1000:>8.0f}ms"
+                  f"{probe_s * 1000:>8.1f}ms{walk_s * 1000:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""伪装 / 合并 / 打包基准：旧版做法与现行实现的吞吐与峰值内存对比。
+
+合成一个载体与一个 zip（默认各 256MB），每种做法在独立子进程里跑，
+用 resource.getrusage 取子进程峰值 RSS（仅 Linux / macOS）。
+打包对比旧版逐个 ZipFile.write 与 pack_folder（进程池分块压缩 + 已压缩格式直接存储），
+待打包目录为一半文本、一半 .png/.zipmod 的合成 mod 文件夹。
+
+用法: python bench_stego.py [--size-mb 256] [--parts-mb 64] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import resource
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from core import stego
+
+
+def old_disguise(carrier: Path, zip_path: Path, out: Path) -> None:
+    out.write_bytes(carrier.read_bytes() + zip_path.read_bytes())
+
+
+def old_join(first: Path, out: Path) -> None:
+    parts = sorted(first.parent.glob(first.name.rsplit(".", 1)[0] + ".*"))
+    out.write_bytes(b"".join(p.read_bytes() for p in parts))
+
+
+def old_pack(folder: Path, out: Path) -> None:
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for p in folder.rglob("*"):
+            if p.is_file():
+                zf.write(p, p.relative_to(folder).as_posix())
+
+
+def _run(case: str, d: str, workers: int | None, queue) -> None:
+    d = Path(d)
+    start = time.perf_counter()
+    if case == "disguise_old":
+        old_disguise(d / "carrier.mp4", d / "payload.zip", d / "out.mp4")
+    elif case == "disguise":
+        stego.disguise(d / "payload.zip", d / "carrier.mp4", d / "out.mp4")
+    elif case == "pack_old":
+        old_pack(d / "mods", d / "packed.zip")
+    elif case == "pack":
+        stego.pack_folder(d / "mods", d / "packed.zip", workers=workers)
+    elif case == "join_old":
+        old_join(d / "parts" / "payload.zip.001", d / "joined.zip")
+    else:
+        stego.join_parts(d / "parts" / "payload.zip.001", d / "joined.zip")
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb))
+
+
+def _write_random(path: Path, size: int) -> None:
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+
+
+def _write_text(path: Path, size: int, rng: random.Random) -> None:
+    words = [bytes(rng.choices(b"abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 10))) for _ in range(5000)]
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            line = b" ".join(rng.choices(words, k=2000)) + b"\n"
+            f.write(line)
+            written += len(line)
+
+
+def make_mod_folder(root: Path, size: int) -> None:
+    """半数体积是可压缩文本，半数是 .png / .zipmod（随机字节，模拟已压缩）。"""
+    rng = random.Random(5)
+    (root / "text").mkdir(parents=True)
+    (root / "mods").mkdir()
+    for i in range(4):
+        _write_text(root / "text" / f"list{i}.csv", size // 8, rng)
+    for i in range(32):
+        suffix = ".png" if i % 2 else ".zipmod"
+        _write_random(root / "mods" / f"mod{i}{suffix}", size // 64)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="伪装 / 合并流式复制基准")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--parts-mb", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="打包进程数，默认 CPU 核数")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")      # 新进程起步，峰值 RSS 不受父进程影响
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as d:
+        _write_random(Path(d) / "carrier.mp4", size)
+        _write_random(Path(d) / "payload.zip", size)
+        stego.split_file(Path(d) / "payload.zip", args.parts_mb, Path(d) / "parts")
+        make_mod_folder(Path(d) / "mods", size)
+        print(f"载体 {args.size_mb}MB + 数据 {args.size_mb}MB，分卷 {args.parts_mb}MB，"
+              f"打包目录 {args.size_mb}MB，{os.cpu_count()} 核")
+        print(f"{'做法':<14}{'耗时':>10}{'吞吐':>12}{'峰值内存':>12}")
+        for case, moved in (("disguise_old", 2 * size), ("disguise", 2 * size),
+                            ("join_old", size), ("join", size),
+                            ("pack_old", size), ("pack", size)):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(case, d, args.workers, queue))
+            proc.start()
+            elapsed, peak_kb = queue.get()
+            proc.join()
+            extra = ""
+            if case.startswith("pack"):
+                extra = f"  产物 {(Path(d) / 'packed.zip').stat().st_size / 1024 / 1024:.0f}MB"
+            print(f"{case:<14}{elapsed:>9.2f}s{moved / 1024 / 1024 / elapsed:>9.0f}MB/s"
+                  f"{peak_kb / 1024:>10.0f}MB{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
-"""目录卡片扫描：遍历目录下的 PNG，识别类型并提取缩略图与基本信息。"""
+"""目录卡片扫描：遍历目录下的 PNG，识别类型并提取缩略图与基本信息。
+
+识别结果持久化在卡片目录库（SQLite，见 CardCatalog）里，按 路径 + mtime + 大小 判断
+是否变化：再次扫描时未变化的卡直接取库，只有新增/改动的卡用线程池重新解析，
+已删除的卡从库中移除。
+"""
 
 from __future__ import annotations
 
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Iterator
 
 from core.kk_card import read_card_light
 
@@ -15,6 +23,9 @@ TYPE_LABELS = {
     "other": "其它",
 }
 
+# 卡片目录库（本机缓存，已被 .gitignore 忽略）
+CATALOG_PATH = Path(__file__).resolve().parent.parent / "card_catalog.db"
+
 
 @dataclass
 class CardItem:
@@ -22,7 +33,20 @@ class CardItem:
     type: str            # character / coordinate / scene / other
     game: str            # KK / KKS / ?
     name: str            # 角色名（仅角色卡）
-    thumbnail: bytes     # 缩略图字节（PNG）
+    thumbnail: bytes     # 缩略图字节（PNG）；取自目录库时为空，按 thumb_size 懒加载
+    marker: str = ""     # 卡片标识（如 【KoiKatuChara】）
+    thumb_size: int = 0  # 文件开头缩略图 PNG 的字节数
+
+
+def load_thumbnail(item: CardItem) -> bytes:
+    """取卡片缩略图：已有字节直接返回，否则按 thumb_size 只读文件开头那一段。"""
+    if item.thumbnail or not item.thumb_size:
+        return item.thumbnail
+    try:
+        with open(item.path, "rb") as f:
+            return f.read(item.thumb_size)
+    except OSError:
+        return b""
 
 
 def scan_item(path: Path) -> CardItem | None:
@@ -34,29 +58,138 @@ def scan_item(path: Path) -> CardItem | None:
     return CardItem(
         path=str(path), type=info.type, game=info.game,
         name=info.name, thumbnail=info.thumbnail,
+        marker=info.marker, thumb_size=len(info.thumbnail),
     )
 
 
+class CardCatalog:
+    """卡片目录库：{绝对路径: (mtime_ns, 大小, 识别结果, 解析状态)}。
+
+    status 为 ok / error；读不了的文件也记一笔，未变化时不再反复重试。
+    连接只能在创建它的线程里用，scan_dir 每次扫描各开各的。
+    """
+
+    def __init__(self, db_path: str | Path = CATALOG_PATH):
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "type TEXT NOT NULL, game TEXT NOT NULL, marker TEXT NOT NULL, name TEXT NOT NULL, "
+            "thumb_size INTEGER NOT NULL, status TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def __enter__(self) -> "CardCatalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def rows_under(self, directory: str) -> dict[str, tuple]:
+        """目录（含子目录）下已入库的记录：{路径: (mtime_ns, size, type, game, marker, name, thumb_size, status)}。"""
+        prefix = directory.rstrip("\\/") + os.sep
+        # 路径前缀的范围查询：os.sep 的下一个字符作上界，走主键索引
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        cur = self.conn.execute(
+            "SELECT path, mtime_ns, size, type, game, marker, name, thumb_size, status "
+            "FROM cards WHERE path >= ? AND path < ?", (prefix, upper))
+        return {row[0]: row[1:] for row in cur}
+
+    def upsert(self, rows: Iterable[tuple]) -> None:
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO cards "
+            "(path, mtime_ns, size, type, game, marker, name, thumb_size, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def remove(self, paths: Iterable[str]) -> None:
+        self.conn.executemany("DELETE FROM cards WHERE path = ?", ((p,) for p in paths))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _iter_pngs(directory: str, recursive: bool) -> Iterator[tuple[str, int, int]]:
+    """用 scandir 列出 PNG 及其 (mtime_ns, size)；Windows 上 DirEntry.stat 不额外访问磁盘。"""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            # 与原先的 rglob 一致：不进入目录符号链接/联接点，指回上级的链接会无限循环、重复列出
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from _iter_pngs(entry.path, recursive)
+            elif entry.is_file() and entry.name.lower().endswith(".png"):
+                st = entry.stat()
+                yield entry.path, st.st_mtime_ns, st.st_size
+        except OSError:
+            continue
+
+
 def scan_dir(
     directory: str | Path,
     *,
     recursive: bool = False,
     progress: Callable[[int, int, str], None] | None = None,
+    partial: Callable[[list[CardItem]], None] | None = None,
+    catalog_path: str | Path | None = CATALOG_PATH,
+    workers: int = 8,
 ) -> list[CardItem]:
-    """扫描目录下的 PNG（默认不递归）。"""
+    """扫描目录下的 PNG（默认不递归）。
+
+    先从目录库取出未变化的卡，通过 partial 回调立即交给调用方展示；
+    再用线程池解析新增/改动的卡并写回库，最后返回完整列表。
+    catalog_path=None 时不读写目录库，全部重新解析。
+    """
     directory = Path(directory)
     if not directory.is_dir():
         return []
-    if recursive:
-        files = [p for p in directory.rglob("*.png") if p.is_file()]
-    else:
-        files = [p for p in directory.glob("*.png") if p.is_file()]
-    total = len(files)
-    items: list[CardItem] = []
-    for i, p in enumerate(files, 1):
-        item = scan_item(p)
-        if item is not None:
-            items.append(item)
-        if progress and (i % 10 == 0 or i == total):
-            progress(i, total, p.name)
-    return items
+    root = os.path.abspath(directory)
+    files = list(_iter_pngs(root, recursive))
+
+    catalog = CardCatalog(catalog_path) if catalog_path is not None else None
+    try:
+        cached = catalog.rows_under(root) if catalog else {}
+        if not recursive:
+            cached = {p: row for p, row in cached.items() if os.path.dirname(p) == root}
+
+        items: dict[str, CardItem] = {}
+        todo: list[tuple[str, int, int]] = []
+        for path, mtime_ns, size in files:
+            row = cached.pop(path, None)
+            if row is not None and row[0] == mtime_ns and row[1] == size:
+                _, _, typ, game, marker, name, thumb_size, status = row
+                if status == "ok":
+                    items[path] = CardItem(path=path, type=typ, game=game, name=name, thumbnail=b"",
+                                           marker=marker, thumb_size=thumb_size)
+            else:
+                todo.append((path, mtime_ns, size))
+        if partial and items:
+            partial(list(items.values()))
+
+        total = len(todo)
+        rows = []
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                results = ex.map(lambda t: scan_item(Path(t[0])), todo)
+                for i, ((path, mtime_ns, size), item) in enumerate(zip(todo, results), 1):
+                    if item is not None:
+                        items[path] = item
+                        rows.append((path, mtime_ns, size, item.type, item.game, item.marker,
+                                     item.name, item.thumb_size, "ok"))
+                    else:
+                        rows.append((path, mtime_ns, size, "other", "?", "", "", 0, "error"))
+                    if progress and (i % 10 == 0 or i == total):
+                        progress(i, total, os.path.basename(path))
+        if catalog:
+            catalog.upsert(rows)
+            catalog.remove(cached.keys())   # 库里有、磁盘上已没有的卡
+    finally:
+        if catalog:
+            catalog.close()
+
+    # 保持目录列举顺序
+    return [items[path] for path, _, _ in files if path in items]
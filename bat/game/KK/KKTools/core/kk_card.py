@@ -28,9 +28,13 @@
 from __future__ import annotations
 
 import io
+import os
 import struct
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
+from typing import Callable
 
 import msgpack
 
@@ -134,68 +138,77 @@ def _contains_float(o) -> bool:
     return False
 
 
+# ---- msgpack 字节跨度扫描（字段级写回用） ----------------------------------
+#
+# 每个类型字节查一次表就知道怎么跳过这个对象：
+#   _SCALAR  后面固定跟 arg 字节（含 fixstr / fixext 的载荷）
+#   _BYTES   后面是 arg 字节的大端长度，再跟 extra + 长度 字节（str/bin/ext）
+#   _FIXCONT 自身不占额外字节，但后面还有 arg 个子对象（fixarray/fixmap）
+#   _CONT    后面是 arg 字节的大端个数，再跟 个数×extra 个子对象（array/map）
+# 容器不递归：只维护"还剩几个对象要跳"的计数，嵌套再深也不会爆栈。
+
+_SCALAR, _BYTES, _FIXCONT, _CONT, _BAD = range(5)
+
+
+def _build_msgpack_table() -> tuple[tuple[int, int, int], ...]:
+    table = [(_BAD, 0, 0)] * 256
+    for c in range(0x00, 0x80):                      # positive fixint
+        table[c] = (_SCALAR, 0, 0)
+    for c in range(0xE0, 0x100):                     # negative fixint
+        table[c] = (_SCALAR, 0, 0)
+    for c in range(0x80, 0x90):                      # fixmap
+        table[c] = (_FIXCONT, (c & 0x0F) * 2, 0)
+    for c in range(0x90, 0xA0):                      # fixarray
+        table[c] = (_FIXCONT, c & 0x0F, 0)
+    for c in range(0xA0, 0xC0):                      # fixstr
+        table[c] = (_SCALAR, c & 0x1F, 0)
+    for c in (0xC0, 0xC2, 0xC3):                     # nil / false / true
+        table[c] = (_SCALAR, 0, 0)
+    for c, n in ((0xCA, 4), (0xCB, 8), (0xCC, 1), (0xCD, 2), (0xCE, 4), (0xCF, 8),
+                 (0xD0, 1), (0xD1, 2), (0xD2, 4), (0xD3, 8)):
+        table[c] = (_SCALAR, n, 0)
+    for c, n in ((0xD4, 1), (0xD5, 2), (0xD6, 4), (0xD7, 8), (0xD8, 16)):   # fixext：类型 1 字节 + 载荷
+        table[c] = (_SCALAR, 1 + n, 0)
+    for c, n in ((0xC4, 1), (0xC5, 2), (0xC6, 4), (0xD9, 1), (0xDA, 2), (0xDB, 4)):  # bin / str
+        table[c] = (_BYTES, n, 0)
+    for c, n in ((0xC7, 1), (0xC8, 2), (0xC9, 4)):                           # ext：长度后还有类型 1 字节
+        table[c] = (_BYTES, n, 1)
+    table[0xDC] = (_CONT, 2, 1)
+    table[0xDD] = (_CONT, 4, 1)
+    table[0xDE] = (_CONT, 2, 2)
+    table[0xDF] = (_CONT, 4, 2)
+    return tuple(table)
+
+
+_MSGPACK_TABLE = _build_msgpack_table()
+
+
 def _skip_msgpack(buf: bytes, pos: int) -> int:
-    """返回 buf 中从 pos 起一个完整 msgpack 对象之后的结束位置。"""
-    c = buf[pos]
-    pos += 1
-    if c <= 0x7F or c >= 0xE0 or c in (0xC0, 0xC2, 0xC3):
-        return pos
-    if 0x80 <= c <= 0x8F:
-        for _ in range((c & 0x0F) * 2):
-            pos = _skip_msgpack(buf, pos)
-        return pos
-    if 0x90 <= c <= 0x9F:
-        for _ in range(c & 0x0F):
-            pos = _skip_msgpack(buf, pos)
-        return pos
-    if 0xA0 <= c <= 0xBF:
-        return pos + (c & 0x1F)
-    if c == 0xC4:
-        return pos + 1 + buf[pos]
-    if c == 0xC5:
-        return pos + 2 + int.from_bytes(buf[pos:pos + 2], "big")
-    if c == 0xC6:
-        return pos + 4 + int.from_bytes(buf[pos:pos + 4], "big")
-    if c == 0xC7:
-        return pos + 1 + 1 + buf[pos]
-    if c == 0xC8:
-        return pos + 2 + 1 + int.from_bytes(buf[pos:pos + 2], "big")
-    if c == 0xC9:
-        return pos + 4 + 1 + int.from_bytes(buf[pos:pos + 4], "big")
-    _FIXED = {0xCA: 4, 0xCB: 8, 0xCC: 1, 0xCD: 2, 0xCE: 4, 0xCF: 8,
-              0xD0: 1, 0xD1: 2, 0xD2: 4, 0xD3: 8}
-    if c in _FIXED:
-        return pos + _FIXED[c]
-    _FIXEXT = {0xD4: 1, 0xD5: 2, 0xD6: 4, 0xD7: 8, 0xD8: 16}
-    if c in _FIXEXT:
-        return pos + 1 + _FIXEXT[c]
-    if c == 0xD9:
-        return pos + 1 + buf[pos]
-    if c == 0xDA:
-        return pos + 2 + int.from_bytes(buf[pos:pos + 2], "big")
-    if c == 0xDB:
-        return pos + 4 + int.from_bytes(buf[pos:pos + 4], "big")
-    if c == 0xDC:
-        n = int.from_bytes(buf[pos:pos + 2], "big"); pos += 2
-        for _ in range(n):
-            pos = _skip_msgpack(buf, pos)
-        return pos
-    if c == 0xDD:
-        n = int.from_bytes(buf[pos:pos + 4], "big"); pos += 4
-        for _ in range(n):
-            pos = _skip_msgpack(buf, pos)
-        return pos
-    if c == 0xDE:
-        n = int.from_bytes(buf[pos:pos + 2], "big"); pos += 2
-        for _ in range(n * 2):
-            pos = _skip_msgpack(buf, pos)
-        return pos
-    if c == 0xDF:
-        n = int.from_bytes(buf[pos:pos + 4], "big"); pos += 4
-        for _ in range(n * 2):
-            pos = _skip_msgpack(buf, pos)
-        return pos
-    raise KKCardError(f"未知的 msgpack 类型字节 0x{c:02x}，无法做字节级写回")
+    """返回 buf 中从 pos 起一个完整 msgpack 对象之后的结束位置（查表 + 迭代，不递归）。"""
+    table = _MSGPACK_TABLE
+    remaining = 1
+    try:
+        while remaining:
+            c = buf[pos]
+            kind, arg, extra = table[c]
+            pos += 1
+            remaining -= 1
+            if kind == _SCALAR:
+                pos += arg
+            elif kind == _FIXCONT:
+                remaining += arg
+            elif kind == _BYTES:
+                pos += arg + extra + int.from_bytes(buf[pos:pos + arg], "big")
+            elif kind == _CONT:
+                remaining += int.from_bytes(buf[pos:pos + arg], "big") * extra
+                pos += arg
+            else:
+                raise KKCardError(f"未知的 msgpack 类型字节 0x{c:02x}，无法做字节级写回")
+    except IndexError:
+        raise KKCardError("msgpack 数据被截断，无法做字节级写回") from None
+    if pos > len(buf):
+        raise KKCardError("msgpack 数据被截断，无法做字节级写回")
+    return pos
 
 
 def _read_map_header(buf: bytes, pos: int) -> tuple[int, int]:
@@ -209,6 +222,40 @@ def _read_map_header(buf: bytes, pos: int) -> tuple[int, int]:
     raise KKCardError("目标块顶层不是 msgpack map，无法做字段级写回")
 
 
+@dataclass(frozen=True)
+class MapSpans:
+    """顶层 msgpack map 各字段的字节范围：entries 依次为 (键, 键起点, 值起点, 值终点)。"""
+
+    header_end: int
+    entries: tuple[tuple[object, int, int, int], ...]
+
+    def keys(self) -> set:
+        return {e[0] for e in self.entries}
+
+
+@lru_cache(maxsize=256)
+def msgpack_map_spans(raw: bytes) -> MapSpans:
+    """一遍扫出顶层 map 每个键值的偏移。按块字节缓存：同一块反复修补/查询只扫一次。"""
+    n, p = _read_map_header(raw, 0)
+    header_end = p
+    entries = []
+    for _ in range(n):
+        k_start = p
+        c = raw[p]
+        if 0xA0 <= c <= 0xBF:                          # 绝大多数键是 fixstr，直接切片解码
+            p += 1 + (c & 0x1F)
+            key = raw[k_start + 1:p].decode("utf-8")
+        else:
+            p = _skip_msgpack(raw, p)
+            key = msgpack.unpackb(raw[k_start:p], raw=False, strict_map_key=False)
+        v_start = p
+        p = _skip_msgpack(raw, p)
+        entries.append((key, k_start, v_start, p))
+    if p > len(raw):
+        raise KKCardError("msgpack 数据被截断，无法做字节级写回")
+    return MapSpans(header_end, tuple(entries))
+
+
 def _encode_value_like(value, orig_first_byte: int) -> bytes:
     # 浮点必须按 C# float 单精度(0xCA)写回，msgpack.packb 默认升 float64 会让游戏读不出
     if isinstance(value, float):
@@ -219,29 +266,27 @@ def _encode_value_like(value, orig_first_byte: int) -> bytes:
 
 
 def patch_msgpack_map(raw: bytes, updates: dict) -> bytes:
-    """字段级修补顶层为 map 的 msgpack 块：仅改动字段重新编码，其余字节原样保留。"""
-    n, p = _read_map_header(raw, 0)
-    out = bytearray(raw[:p])
-    for _ in range(n):
-        k_start = p
-        p = _skip_msgpack(raw, p)
-        key_bytes = raw[k_start:p]
-        key = msgpack.unpackb(key_bytes, raw=False, strict_map_key=False)
+    """字段级修补顶层为 map 的 msgpack 块：仅改动字段重新编码，其余字节原样保留。
 
-        v_start = p
-        p = _skip_msgpack(raw, p)
-        val_bytes = raw[v_start:p]
-
-        out += key_bytes
-        if key in updates:
-            new_val = updates[key]
-            old_val = msgpack.unpackb(val_bytes, raw=False, strict_map_key=False)
-            if new_val == old_val and type(new_val) is type(old_val):
-                out += val_bytes
-            else:
-                out += _encode_value_like(new_val, val_bytes[0])
-        else:
-            out += val_bytes
+    借助 msgpack_map_spans 的偏移，只解码被更新的字段，未改动的区间整段拷贝。
+    """
+    spans = msgpack_map_spans(raw)
+    out = bytearray()
+    last = 0
+    for key, _, v_start, v_end in spans.entries:
+        if key not in updates:
+            continue
+        new_val = updates[key]
+        val_bytes = raw[v_start:v_end]
+        old_val = msgpack.unpackb(val_bytes, raw=False, strict_map_key=False)
+        if new_val == old_val and type(new_val) is type(old_val):
+            continue
+        out += raw[last:v_start]
+        out += _encode_value_like(new_val, val_bytes[0])
+        last = v_end
+    if not last:
+        return raw
+    out += raw[last:]
     return bytes(out)
 
 
@@ -449,8 +494,8 @@ class KoikatuCard:
         raw = self.blocks.get("Parameter")
         if raw is None:
             raise KKCardError("该卡片没有 Parameter 块，无法编辑基本信息")
-        param = self.get_block_dict("Parameter") or {}
-        filtered = {k: v for k, v in updates.items() if k in param}
+        known = msgpack_map_spans(raw).keys()
+        filtered = {k: v for k, v in updates.items() if k in known}
         if not filtered:
             return
         new_raw = patch_msgpack_map(raw, filtered)
@@ -714,3 +759,65 @@ def is_character_card(data: bytes) -> bool:
     except KKCardError:
         return False
     return marker in KNOWN_MARKERS
+
+
+# ---- 批量字段写回 ------------------------------------------------------------
+
+# 待改卡数达到此值时 batch_update_parameter 才开进程池（少量卡时进程启动开销不划算）
+BATCH_PROCESS_THRESHOLD = 64
+
+
+def _update_card_file(task: tuple[str, dict, str | None, bool]) -> tuple[str, str, str]:
+    """进程池任务：对一张卡做 update_parameter 并保存，返回 (路径, ok/unchanged/error, 说明)。"""
+    path, updates, out_dir, backup = task
+    try:
+        card = KoikatuCard.load(path)
+        card.update_parameter(updates)
+        if not card._dirty:
+            return path, "unchanged", "字段无变化，未写回"
+        target = Path(out_dir) / Path(path).name if out_dir else Path(path)
+        return path, "ok", card.save(target, backup=backup)
+    except (KKCardError, OSError) as exc:
+        return path, "error", str(exc)
+    except Exception as exc:
+        # 损坏卡片里的 msgpack 解码错误（如非法 UTF-8 字符串）等：只记这一张失败，
+        # 否则异常会从 executor.map 抛出，中断整批
+        return path, "error", f"{type(exc).__name__}: {exc}"
+
+
+def batch_update_parameter(
+    paths: list[str | Path],
+    updates: dict,
+    *,
+    out_dir: str | Path | None = None,
+    backup: bool = True,
+    workers: int | None = None,
+    progress: Callable[[int, int, str], None] | None = None,
+) -> list[tuple[str, str, str]]:
+    """把同一组 Parameter 字段改动批量写回多张卡（各卡仍是字段级写回）。
+
+    out_dir 为空时原地覆盖（backup=True 先留 .bak），否则另存到 out_dir 下同名文件。
+    workers 为进程数，None 为 CPU 核数，0 表示在当前进程串行处理。
+    progress(已处理数, 总数, 文件名) 可选。返回每张卡的 (路径, ok/unchanged/error, 说明)，顺序同 paths。
+    """
+    if out_dir:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+    tasks = [(str(p), updates, str(out_dir) if out_dir else None, backup) for p in paths]
+    total = len(tasks)
+    results: list[tuple[str, str, str]] = []
+    if workers == 0 or total < BATCH_PROCESS_THRESHOLD:
+        executor = None
+        it = map(_update_card_file, tasks)
+    else:
+        # Windows 进程池上限 61
+        executor = ProcessPoolExecutor(max_workers=max(1, min(61, workers or os.cpu_count() or 1)))
+        it = executor.map(_update_card_file, tasks, chunksize=16)
+    try:
+        for i, result in enumerate(it, 1):
+            results.append(result)
+            if progress:
+                progress(i, total, Path(result[0]).name)
+    finally:
+        if executor:
+            executor.shutdown()
+    return results
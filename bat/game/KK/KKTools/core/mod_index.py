@@ -3,33 +3,117 @@
 - 扫描目录下的 .zipmod / .zip，读取内部 manifest.xml，建立 {guid: 信息} 索引。
 - 从角色卡提取依赖 ModID（见 kk_card.extract_mod_ids）。
 - 比对卡片依赖与本地索引，给出缺失清单。
+- 记录卡片 -> 依赖 guid 及其反向映射（哪些卡用了某个 mod），按卡片文件指纹增量更新。
 
-索引可缓存为 JSON，避免每次重扫海量 mod 目录。
+索引缓存为紧凑二进制文件（见 ModIndex.save），避免每次重扫海量 mod 目录、重复解析卡片；
+旧版 JSON 缓存仍可读取。
 """
 
 from __future__ import annotations
 
 import json
+import os
 import shutil
+import struct
+import sys
+import time
 import xml.etree.ElementTree as ET
 import zipfile
-from concurrent.futures import ThreadPoolExecutor
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Iterator
 
 from core.kk_card import KoikatuCard, extract_mod_ids
 
 MOD_SUFFIXES = (".zipmod", ".zip")
 
+# 待读文件数达到此值时 build 自动改用进程池冷建（小批量时进程启动开销不划算）
+PROCESS_BUILD_THRESHOLD = 1000
+
 
-@dataclass
 class ModEntry:
-    guid: str
-    name: str = ""
-    version: str = ""
-    author: str = ""
-    path: str = ""
+    """单个 mod 的索引条目。用 __slots__ 而非 dataclass：6 万条时每条省下一个 __dict__。"""
+
+    __slots__ = ("guid", "name", "version", "author", "path")
+
+    def __init__(self, guid: str, name: str = "", version: str = "", author: str = "", path: str = ""):
+        self.guid = guid
+        self.name = name
+        self.version = version
+        self.author = author
+        self.path = path
+
+    def _astuple(self) -> tuple:
+        return (self.guid, self.name, self.version, self.author, self.path)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ModEntry):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __repr__(self) -> str:
+        return (f"ModEntry(guid={self.guid!r}, name={self.name!r}, version={self.version!r}, "
+                f"author={self.author!r}, path={self.path!r})")
+
+
+def _split_path(path: str) -> tuple[str, str]:
+    """拆成 (目录含末尾分隔符, 文件名)，拼回去与原串逐字符一致（os.path.split 会吞掉多余分隔符）。"""
+    cut = max(path.rfind("/"), path.rfind("\\")) + 1
+    return path[:cut], path[cut:]
+
+
+class _LazyEntries(MutableMapping):
+    """从二进制缓存载入的 guid -> ModEntry 映射：按列存字符串，访问到哪条才生成哪条 ModEntry。
+
+    启动时只需建 guid -> 行号 的字典；检查卡片只会碰到少数 guid。
+    """
+
+    __slots__ = ("_rows", "_cols", "_dirs", "_made")
+
+    def __init__(self, guids: list[str], cols: tuple, dirs: list[str]):
+        self._rows = dict(zip(guids, range(len(guids))))
+        self._cols = cols          # (name, version, author, 路径目录号, 路径文件名) 各一列
+        self._dirs = dirs
+        self._made: dict[str, ModEntry] = {}
+
+    def _row(self, guid: str, i: int) -> tuple:
+        name, version, author, dir_idx, base = self._cols
+        d = dir_idx[i]
+        return (guid, name[i], version[i], author[i], (self._dirs[d] + base[i]) if d >= 0 else "")
+
+    def __getitem__(self, guid: str) -> ModEntry:
+        entry = self._made.get(guid)
+        if entry is None:
+            entry = ModEntry(*self._row(guid, self._rows[guid]))
+            self._made[guid] = entry
+        return entry
+
+    def __setitem__(self, guid: str, entry: ModEntry) -> None:
+        self._rows.setdefault(guid, -1)
+        self._made[guid] = entry
+
+    def __delitem__(self, guid: str) -> None:
+        del self._rows[guid]
+        self._made.pop(guid, None)
+
+    def __contains__(self, guid) -> bool:
+        return guid in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rows(self) -> Iterator[tuple]:
+        """逐条给出 (guid, name, version, author, path)，未访问过的条目不生成 ModEntry。"""
+        for guid, i in self._rows.items():
+            entry = self._made.get(guid)
+            yield entry._astuple() if entry is not None else self._row(guid, i)
 
 
 def read_manifest(zip_path: Path) -> ModEntry | None:
@@ -41,6 +125,11 @@ def read_manifest(zip_path: Path) -> ModEntry | None:
             raw = zf.read("manifest.xml")
     except (zipfile.BadZipFile, OSError):
         return None
+    return parse_manifest(raw, zip_path)
+
+
+def parse_manifest(raw: bytes, zip_path: str | Path) -> ModEntry | None:
+    """解析 manifest.xml 字节为 ModEntry；XML 损坏或无 guid 返回 None。"""
     try:
         root = ET.fromstring(raw)
     except ET.ParseError:
@@ -62,6 +151,130 @@ def read_manifest(zip_path: Path) -> ModEntry | None:
     )
 
 
+class _NeedFallback(Exception):
+    """快速路径处理不了的 zip（zip64、加密、非常规压缩等），交回 zipfile。"""
+
+
+_EOCD = struct.Struct("<4s4H2LH")          # 结束记录（end of central directory）
+_CDIR = struct.Struct("<4s6H3L5H2L")       # 中央目录项（不含变长的文件名/扩展/注释）
+_LOCAL = struct.Struct("<4s5H3L2H")        # 本地文件头
+_MANIFEST_NAME = b"manifest.xml"
+
+
+def _read_manifest_bytes(zip_path: str | Path) -> bytes | None:
+    """只读 zip 尾部的结束记录 + 中央目录，定位并取出根目录 manifest.xml 的原始字节。
+
+    不像 zipfile.ZipFile 那样为每个条目建 ZipInfo（大 mod 动辄上千个条目），
+    中央目录里直接按文件名查找。没有 manifest.xml 返回 None；
+    遇到快速路径不支持的格式抛 _NeedFallback。
+    """
+    with open(zip_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        # 结束记录 22 字节 + 最长 65535 字节注释
+        tail_len = min(size, _EOCD.size + 0xFFFF)
+        f.seek(size - tail_len)
+        tail = f.read(tail_len)
+        # 从后往前找结束记录；注释里也可能出现签名，要求注释长度恰好到文件末尾
+        pos = len(tail)
+        while True:
+            pos = tail.rfind(b"PK\x05\x06", 0, pos)
+            if pos < 0:
+                raise _NeedFallback
+            if pos + _EOCD.size <= len(tail):
+                _, disk, _, _, count, cd_size, cd_offset, comment_len = _EOCD.unpack_from(tail, pos)
+                if pos + _EOCD.size + comment_len == len(tail):
+                    break
+        if disk != 0 or count == 0xFFFF or cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+            raise _NeedFallback                   # 分卷 / zip64
+        eocd_at = size - tail_len + pos
+        # 前面拼了载体（伪装包）时，中央目录里的偏移都要加上前缀长度
+        concat = eocd_at - cd_size - cd_offset
+        if concat < 0:
+            raise _NeedFallback
+        if eocd_at - cd_size >= size - tail_len:
+            cd = tail[pos - cd_size:pos]
+        else:
+            f.seek(eocd_at - cd_size)
+            cd = f.read(cd_size)
+
+        start = 0
+        while True:
+            i = cd.find(_MANIFEST_NAME, start)
+            if i < 0:
+                return None
+            start = i + 1
+            h = i - _CDIR.size
+            if h < 0 or cd[h:h + 4] != b"PK\x01\x02":
+                continue
+            (_, _, _, flags, method, _, _, _, comp_size, _, name_len, _, _, _, _, _,
+             local_offset) = _CDIR.unpack_from(cd, h)
+            if name_len == len(_MANIFEST_NAME):
+                break
+        if flags & 0x1 or comp_size == 0xFFFFFFFF or local_offset == 0xFFFFFFFF:
+            raise _NeedFallback                   # 加密 / zip64
+
+        f.seek(concat + local_offset)
+        local = f.read(_LOCAL.size)
+        if len(local) < _LOCAL.size or local[:4] != b"PK\x03\x04":
+            raise _NeedFallback
+        _, _, _, _, _, _, _, _, _, l_name, l_extra = _LOCAL.unpack(local)
+        f.seek(l_name + l_extra, os.SEEK_CUR)
+        data = f.read(comp_size)
+    if method == zipfile.ZIP_STORED:
+        return data
+    if method == zipfile.ZIP_DEFLATED:
+        try:
+            return zlib.decompress(data, -15)
+        except zlib.error:
+            raise _NeedFallback from None
+    raise _NeedFallback
+
+
+def read_manifest_fast(zip_path: Path) -> ModEntry | None:
+    """read_manifest 的快速版：直接读结束记录与 manifest.xml 本地条目，格式不支持时退回 zipfile。"""
+    try:
+        raw = _read_manifest_bytes(zip_path)
+    except _NeedFallback:
+        return read_manifest(zip_path)
+    except (OSError, struct.error):
+        return None
+    if raw is None:
+        return None
+    return parse_manifest(raw, zip_path)
+
+
+def _read_manifest_batch(paths: list[str]) -> tuple[list[tuple], float, float]:
+    """进程池任务：读一批 zipmod 的 manifest。
+
+    返回 ([(path, guid, name, version, author) | (path, None, …)], 磁盘耗时, 解析耗时)，
+    用元组而非 ModEntry 回传，减少跨进程序列化开销。
+    """
+    rows: list[tuple] = []
+    disk = cpu = 0.0
+    for sp in paths:
+        t0 = time.perf_counter()
+        try:
+            raw = _read_manifest_bytes(sp)
+            fallback = False
+        except _NeedFallback:
+            raw, fallback = None, True
+        except (OSError, struct.error):
+            raw, fallback = None, False
+        t1 = time.perf_counter()
+        disk += t1 - t0
+        if fallback:
+            entry = read_manifest(Path(sp))
+        else:
+            entry = parse_manifest(raw, sp) if raw is not None else None
+        cpu += time.perf_counter() - t1
+        if entry:
+            rows.append((sp, entry.guid, entry.name, entry.version, entry.author))
+        else:
+            rows.append((sp, None, "", "", ""))
+    return rows, disk, cpu
+
+
 def iter_mod_files(dirs: Iterable[str]) -> Iterable[Path]:
     for d in dirs:
         base = Path(d)
@@ -72,6 +285,27 @@ def iter_mod_files(dirs: Iterable[str]) -> Iterable[Path]:
                 yield p
 
 
+def read_card_requirements(card_path: str | Path) -> dict[str, int]:
+    """解析一张卡的 mod 依赖 {guid: 次数}。
+
+    角色卡：直接读 Sideloader UAR。场景卡：聚合内嵌角色依赖 + 场景级 studio 道具依赖。
+    """
+    from core.kk_card import KoikatuCard as _KC, is_character_card
+    from core import scene_card
+
+    # mmap 读取：场景卡只切出内嵌角色的 KKEx 块，不整文件读进内存
+    with scene_card.open_scene_bytes(card_path) as data:
+        if is_character_card(data):
+            return extract_mod_ids(_KC.from_bytes(data))
+        # 场景卡（或其它带内嵌角色的卡）
+        return scene_card.scene_mod_ids(data)
+
+
+def _card_fingerprint(card_path: str) -> tuple[int, int]:
+    st = os.stat(card_path)
+    return st.st_mtime_ns, st.st_size
+
+
 @dataclass
 class ModIndex:
     """guid -> ModEntry 的全局索引，附带文件指纹用于增量重建。"""
@@ -80,6 +314,15 @@ class ModIndex:
     # 文件指纹：abspath -> (mtime_int, size, guid|None)。guid=None 表示该文件无有效
     # manifest（负缓存，避免重复打开坏包）。用于增量重建时跳过未变动文件。
     files: dict[str, tuple] = field(default_factory=dict)
+    # 卡片依赖：abspath -> (mtime_ns, size, {guid: 次数})。卡片未变动就不再读盘解析，
+    # 与 mod 目录无关，重建 mod 索引时原样沿用。
+    cards: dict[str, tuple] = field(default_factory=dict)
+    # 卡片依赖有新增/变动、尚未写回缓存文件
+    cards_dirty: bool = field(default=False, init=False, repr=False, compare=False)
+    # guid -> {卡片路径} 反向映射，按需从 cards 生成，cards 变动即作废
+    _users: dict | None = field(default=None, init=False, repr=False, compare=False)
+    # 最近一次 build 读取 manifest 的统计（模式/文件数/耗时/吞吐/磁盘与解析耗时）
+    build_stats: dict = field(default_factory=dict, init=False, repr=False, compare=False)
 
     def __contains__(self, guid: str) -> bool:
         return guid in self.entries
@@ -97,6 +340,8 @@ class ModIndex:
         progress: Callable[[int, str], None] | None = None,
         workers: int = 16,
         previous: "ModIndex | None" = None,
+        mode: str = "auto",
+        processes: int | None = None,
     ) -> "ModIndex":
         """扫描目录建立索引。
 
@@ -104,8 +349,10 @@ class ModIndex:
         一致）直接复用，不再打开文件——整合版加几个 mod 后重建可从数分钟降到秒级。
         首次构建（previous 为空）则全量扫描。
 
-        读取 manifest 用线程池并行（机械硬盘上首次冷扫描受寻道限制提升有限，
-        但 SSD 与缓存命中时显著加速；增量重建才是常态优化）。
+        manifest 走快速路径读取（只读 zip 结束记录、中央目录与 manifest.xml 本地条目，
+        见 _read_manifest_bytes）。mode="thread" 用线程池；mode="process" 用进程池
+        （冷建时 XML 解析不再挤在一个 GIL 上）；"auto" 在待读文件不少于
+        PROCESS_BUILD_THRESHOLD 时选进程池。读取统计写入 self.build_stats。
         progress(已处理数, 当前文件) 可选回调。
         """
         old_files = previous.files if previous else {}
@@ -116,7 +363,7 @@ class ModIndex:
         files = list(iter_mod_files(dirs))
         total = len(files)
         done = 0
-        to_read: list[Path] = []
+        to_read: dict[str, tuple] = {}     # 待读文件 -> 第一遍取得的指纹
 
         # 第一遍：复用未变动文件
         for p in files:
@@ -134,54 +381,318 @@ class ModIndex:
                     new_entries[old_entries[guid].guid] = old_entries[guid]
                 done += 1
             else:
-                to_read.append(p)
+                to_read[sp] = fp
 
-        # 第二遍：并行读取新增/变动文件的 manifest
+        # 第二遍：并行读取新增/变动文件的 manifest（按批分发，进程池下减少往返）
+        use_processes = mode == "process" or (mode == "auto" and len(to_read) >= PROCESS_BUILD_THRESHOLD)
+        stats = {"mode": "process" if use_processes else "thread", "files": len(to_read),
+                 "seconds": 0.0, "files_per_sec": 0.0, "disk_s": 0.0, "cpu_s": 0.0}
         if to_read:
-            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
-                for p, entry in zip(to_read, ex.map(read_manifest, to_read)):
-                    sp = str(p)
-                    try:
-                        st = p.stat()
-                        fp = (int(st.st_mtime), st.st_size)
-                    except OSError:
-                        fp = (0, 0)
-                    guid = entry.guid if entry else None
-                    new_files[sp] = (fp[0], fp[1], guid)
-                    if entry:
-                        new_entries[entry.guid] = entry
-                    done += 1
-                    if progress and (done % 100 == 0 or done == total):
-                        progress(done, str(p))
+            paths = list(to_read)
+            chunk = 128 if use_processes else 16
+            batches = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+            if use_processes:
+                # Windows 进程池上限 61
+                executor = ProcessPoolExecutor(max_workers=max(1, min(61, processes or os.cpu_count() or 1)))
+            else:
+                executor = ThreadPoolExecutor(max_workers=max(1, workers))
+            started = time.perf_counter()
+            with executor as ex:
+                for rows, disk, cpu in ex.map(_read_manifest_batch, batches):
+                    stats["disk_s"] += disk
+                    stats["cpu_s"] += cpu
+                    for sp, guid, name, version, author in rows:
+                        fp = to_read[sp]
+                        new_files[sp] = (fp[0], fp[1], guid)
+                        if guid:
+                            new_entries[guid] = ModEntry(
+                                guid=guid, name=name, version=version, author=author, path=sp)
+                        done += 1
+                        if progress and (done % 100 == 0 or done == total):
+                            progress(done, sp)
+            stats["seconds"] = time.perf_counter() - started
+            stats["files_per_sec"] = len(to_read) / max(stats["seconds"], 1e-9)
         if progress:
             progress(total, "")
+        self.build_stats = stats
 
         self.entries = new_entries
         self.files = new_files
+        if previous is not None and previous is not self:
+            self.cards = dict(previous.cards)
+            self._users = None
         return self
 
-    def save(self, path: str | Path) -> None:
-        data = {
+    # ---- 卡片依赖（正向 + 反向索引） ----
+
+    def card_requirements(
+        self,
+        card_path: str | Path,
+        parse: Callable[[Path], dict[str, int]] = read_card_requirements,
+    ) -> dict[str, int]:
+        """一张卡的依赖 {guid: 次数}：文件指纹（mtime+大小）未变直接取缓存，否则解析并记录。
+
+        解析失败照常抛出，不写入缓存。
+        """
+        key = os.path.abspath(str(card_path))
+        fp = _card_fingerprint(key)
+        cached = self.cards.get(key)
+        if cached is not None and (cached[0], cached[1]) == fp:
+            return dict(cached[2])
+        required = parse(Path(key))
+        self._set_card(key, fp, required)
+        return dict(required)
+
+    def refresh_cards(
+        self,
+        card_paths: Iterable[str | Path],
+        *,
+        workers: int = 8,
+        progress: Callable[[int, int, str], None] | None = None,
+    ) -> dict[str, dict[str, int]]:
+        """批量更新卡片依赖：未变动的卡直接取缓存，其余用线程池解析。
+
+        返回 {卡片路径(按传入原样): 依赖}；读不了/解析失败的卡不在结果里。
+        """
+        paths = [str(p) for p in card_paths]
+        total = len(paths)
+        result: dict[str, dict[str, int]] = {}
+        stale: list[tuple[str, str, tuple]] = []
+        done = 0
+        for p in paths:
+            key = os.path.abspath(p)
+            try:
+                fp = _card_fingerprint(key)
+            except OSError:
+                done += 1
+                continue
+            cached = self.cards.get(key)
+            if cached is not None and (cached[0], cached[1]) == fp:
+                result[p] = dict(cached[2])
+                done += 1
+            else:
+                stale.append((p, key, fp))
+        if progress:
+            progress(done, total, "")
+
+        def parse(item):
+            try:
+                return read_card_requirements(item[1])
+            except Exception:  # noqa: BLE001 - 坏卡跳过，不影响其它卡
+                return None
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                for (p, key, fp), required in zip(stale, ex.map(parse, stale)):
+                    done += 1
+                    if required is not None:
+                        self._set_card(key, fp, required)
+                        result[p] = dict(required)
+                    if progress and (done % 20 == 0 or done == total):
+                        progress(done, total, Path(p).name)
+        return result
+
+    def _set_card(self, key: str, fp: tuple, required: dict[str, int]) -> None:
+        self.cards[key] = (fp[0], fp[1], dict(required))
+        self.cards_dirty = True
+        self._users = None
+
+    def forget_missing_cards(self) -> int:
+        """清掉磁盘上已不存在的卡片记录，返回清理条数。"""
+        gone = [k for k in self.cards if not os.path.exists(k)]
+        for k in gone:
+            del self.cards[k]
+        if gone:
+            self.cards_dirty = True
+            self._users = None
+        return len(gone)
+
+    def cards_using(self, guid: str) -> list[str]:
+        """已记录的卡片中依赖该 guid 的卡（绝对路径，已排序）。"""
+        if self._users is None:
+            users: dict[str, set[str]] = {}
+            for key, (_, _, required) in self.cards.items():
+                for g in required:
+                    users.setdefault(g, set()).add(key)
+            self._users = users
+        return sorted(self._users.get(guid, ()))
+
+    def used_guids(self, card_paths: Iterable[str | Path] | None = None) -> set[str]:
+        """给定卡片（None=全部已记录的卡）依赖的 guid 并集；给定卡片会先增量更新。"""
+        if card_paths is None:
+            reqs = (r for _, _, r in self.cards.values())
+        else:
+            reqs = self.refresh_cards(card_paths).values()
+        used: set[str] = set()
+        for required in reqs:
+            used.update(required)
+        return used
+
+    def unused_guids(self, card_paths: Iterable[str | Path] | None = None) -> list[str]:
+        """索引里没被给定卡片（None=全部已记录的卡）引用的 mod guid。"""
+        used = self.used_guids(card_paths)
+        return sorted(g for g in self.entries if g not in used)
+
+    # ---- 缓存文件 ----
+    #
+    # 二进制格式（版本 1）：
+    #   头部 <8s H I I I>：魔数、版本、文件数、条目数、body 解压后长度；之后是 zlib 压缩的 body。
+    #   body 由若干段组成，每段 <I 长度> + 内容；字符串列表用 \0 连接成一段 UTF-8，
+    #   整数列用小端 array。路径拆成 目录表 + 文件名，目录表在文件与条目间共用。
+    #   段顺序见 _SECTIONS。读取时字符串列一次 split、整数列一次 frombytes，都在 C 层完成。
+
+    _MAGIC = b"KKMODIDX"
+    _VERSION = 1
+    _HEADER = struct.Struct("<8sHIII")
+    _SECTIONS = (
+        "dirs", "file_dir", "file_name", "file_mtime", "file_size", "file_guid",
+        "entry_guid", "entry_name", "entry_version", "entry_author", "entry_dir", "entry_base",
+        "cards",
+    )
+
+    def save(self, path: str | Path, *, fmt: str = "binary") -> None:
+        """写缓存：先写临时文件再原子替换，写到一半崩溃也不会留下损坏的缓存。
+
+        fmt="json" 写旧版 JSON（便于排查或对比）。
+        """
+        path = Path(path)
+        if fmt == "json":
+            data = json.dumps(self._to_json_dict(), ensure_ascii=False).encode("utf-8")
+        else:
+            data = self._to_binary()
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self.cards_dirty = False
+
+    def _entry_rows(self) -> Iterable[tuple]:
+        if isinstance(self.entries, _LazyEntries):
+            return self.entries.rows()
+        return (e._astuple() for e in self.entries.values())
+
+    def _to_json_dict(self) -> dict:
+        return {
             "entries": {
-                g: {"name": e.name, "version": e.version, "author": e.author, "path": e.path}
-                for g, e in self.entries.items()
+                g: {"name": name, "version": version, "author": author, "path": p}
+                for g, name, version, author, p in self._entry_rows()
             },
             "files": {sp: list(fp) for sp, fp in self.files.items()},
+            "cards": {cp: list(fp) for cp, fp in self.cards.items()},
+        }
+
+    def _to_binary(self) -> bytes:
+        dir_ids: dict[str, int] = {}
+
+        def dir_of(p: str) -> tuple[int, str]:
+            d, base = _split_path(p)
+            return dir_ids.setdefault(d, len(dir_ids)), base
+
+        file_dir, file_name = array("i"), []
+        file_mtime, file_size, file_guid = array("q"), array("q"), []
+        for sp, (mtime, size, guid) in self.files.items():
+            d, base = dir_of(sp)
+            file_dir.append(d); file_name.append(base)
+            file_mtime.append(int(mtime)); file_size.append(int(size)); file_guid.append(guid or "")
+
+        cols: tuple[list, ...] = ([], [], [], [], [])
+        entry_dir = array("i")
+        n_entries = 0
+        for guid, name, version, author, p in self._entry_rows():
+            d, base = dir_of(p) if p else (-1, "")
+            for col, value in zip(cols, (guid, name, version, author, base)):
+                col.append(value)
+            entry_dir.append(d)
+            n_entries += 1
+
+        def text(items) -> bytes:
+            return "\0".join(items).encode("utf-8")
+
+        def ints(arr: array) -> bytes:
+            if sys.byteorder == "big":
+                arr = array(arr.typecode, arr); arr.byteswap()
+            return arr.tobytes()
+
+        sections = {
+            "dirs": text(dir_ids), "file_dir": ints(file_dir), "file_name": text(file_name),
+            "file_mtime": ints(file_mtime), "file_size": ints(file_size), "file_guid": text(file_guid),
+            "entry_guid": text(cols[0]), "entry_name": text(cols[1]), "entry_version": text(cols[2]),
+            "entry_author": text(cols[3]), "entry_dir": ints(entry_dir), "entry_base": text(cols[4]),
+            "cards": json.dumps({cp: list(fp) for cp, fp in self.cards.items()},
+                                ensure_ascii=False).encode("utf-8"),
         }
-        Path(path).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        body = b"".join(struct.pack("<I", len(sections[k])) + sections[k] for k in self._SECTIONS)
+        header = self._HEADER.pack(self._MAGIC, self._VERSION, len(self.files), n_entries, len(body))
+        return header + zlib.compress(body, 6)
 
     @classmethod
     def load(cls, path: str | Path) -> "ModIndex":
+        """读缓存：自动识别二进制与旧版 JSON；路径不存在时尝试同名 .json（旧缓存迁移）。
+
+        缓存损坏或版本不认识时返回空索引（相当于需要重建），不抛异常。
+        """
         idx = cls()
         p = Path(path)
-        if not p.exists():
-            return idx
+        if not p.exists() and p.with_suffix(".json").exists():
+            p = p.with_suffix(".json")
         try:
-            data = json.loads(p.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
+            raw = p.read_bytes()
+        except OSError:
             return idx
+        try:
+            if raw.startswith(cls._MAGIC):
+                idx._from_binary(raw)
+            else:
+                idx._from_json_dict(json.loads(raw.decode("utf-8")))
+        except (ValueError, struct.error, zlib.error, UnicodeDecodeError, IndexError):
+            return cls()
+        return idx
+
+    def _from_binary(self, raw: bytes) -> None:
+        magic, version, n_files, n_entries, body_len = self._HEADER.unpack_from(raw)
+        if version != self._VERSION:
+            raise ValueError(f"不支持的索引缓存版本 {version}")
+        body = zlib.decompress(raw[self._HEADER.size:])
+        if len(body) != body_len:
+            raise ValueError("索引缓存长度不符")
+        sections: dict[str, bytes] = {}
+        pos = 0
+        for key in self._SECTIONS:
+            (n,) = struct.unpack_from("<I", body, pos)
+            sections[key] = body[pos + 4:pos + 4 + n]
+            pos += 4 + n
+
+        def text(key: str, count: int) -> list[str]:
+            return sections[key].decode("utf-8").split("\0") if count else []
+
+        def ints(key: str, typecode: str) -> array:
+            arr = array(typecode)
+            arr.frombytes(sections[key])
+            if sys.byteorder == "big":
+                arr.byteswap()
+            return arr
+
+        blob = sections["dirs"].decode("utf-8")
+        dirs = blob.split("\0") if blob or n_files or n_entries else []
+        file_dir, file_mtime, file_size = ints("file_dir", "i"), ints("file_mtime", "q"), ints("file_size", "q")
+        names = text("file_name", n_files)
+        guids = [g or None for g in text("file_guid", n_files)]
+        if not (len(file_dir) == len(file_mtime) == len(file_size) == len(names) == len(guids) == n_files):
+            raise ValueError("索引缓存文件段不完整")
+        # 全程 map/zip，不进 Python 层循环：6 万条时比字典推导快一倍多
+        self.files = dict(zip(map(str.__add__, map(dirs.__getitem__, file_dir), names),
+                              zip(file_mtime, file_size, guids)))
+
+        entry_guid = text("entry_guid", n_entries)
+        cols = (text("entry_name", n_entries), text("entry_version", n_entries),
+                text("entry_author", n_entries), ints("entry_dir", "i"), text("entry_base", n_entries))
+        if any(len(c) != n_entries for c in cols) or len(entry_guid) != n_entries:
+            raise ValueError("索引缓存条目段不完整")
+        self.entries = _LazyEntries(entry_guid, cols, dirs)
+        self._load_cards(json.loads(sections["cards"].decode("utf-8")))
+
+    def _from_json_dict(self, data: dict) -> None:
         for guid, info in data.get("entries", {}).items():
-            idx.entries[guid] = ModEntry(
+            self.entries[guid] = ModEntry(
                 guid=guid,
                 name=info.get("name", ""),
                 version=info.get("version", ""),
@@ -190,8 +701,13 @@ class ModIndex:
             )
         for sp, fp in data.get("files", {}).items():
             if isinstance(fp, list) and len(fp) == 3:
-                idx.files[sp] = (fp[0], fp[1], fp[2])
-        return idx
+                self.files[sp] = (fp[0], fp[1], fp[2])
+        self._load_cards(data.get("cards", {}))
+
+    def _load_cards(self, cards: dict) -> None:
+        for cp, fp in cards.items():
+            if isinstance(fp, list) and len(fp) == 3 and isinstance(fp[2], dict):
+                self.cards[cp] = (fp[0], fp[1], fp[2])
 
 
 @dataclass
@@ -213,23 +729,9 @@ class MissingReport:
 def check_card(card_path: str | Path, index: ModIndex) -> MissingReport:
     """检查一张卡的 mod 依赖在索引中的缺失情况。
 
-    角色卡：直接读 Sideloader UAR。场景卡：聚合内嵌角色依赖 + 场景级 studio 道具依赖。
+    依赖取自索引里的卡片依赖缓存（卡片未变动时不再解析，见 ModIndex.card_requirements）。
     """
-    from core.kk_card import KoikatuCard as _KC, is_character_card
-
-    data = Path(card_path).read_bytes()
-    if is_character_card(data):
-        required = extract_mod_ids(_KC.from_bytes(data))
-    else:
-        # 场景卡（或其它带内嵌角色的卡）
-        from core import scene_card
-        required = {}
-        for c in scene_card.find_embedded_characters(data):
-            for g, n in extract_mod_ids(c).items():
-                required[g] = required.get(g, 0) + n
-        for g, n in scene_card.extract_scene_mod_ids(data).items():
-            required[g] = required.get(g, 0) + n
-
+    required = index.card_requirements(card_path)
     present = [g for g in required if g in index]
     missing = [g for g in required if g not in index]
     return MissingReport(
@@ -377,15 +879,11 @@ def archive_unreferenced(
 ) -> dict:
     """把"没有被任一给定卡片引用"的 mod 归档到 archive_dir。
 
-    先求所有卡片依赖 guid 的并集，索引中不在并集里的即未引用。
+    先求所有卡片依赖 guid 的并集（走卡片依赖缓存，只解析新增/变动的卡），
+    索引中不在并集里的即未引用。
     注意：未引用是相对于**所选卡片**而言，请谨慎选卡。move=False 默认复制。
     """
-    used: set[str] = set()
-    for cp in card_paths:
-        try:
-            used |= set(check_card(cp, index).required)
-        except Exception:  # noqa: BLE001
-            continue
+    used = index.used_guids(card_paths)
     archive = Path(archive_dir)
     entries = list(index.entries.items())
     total = len(entries)
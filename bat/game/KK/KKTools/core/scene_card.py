@@ -2,20 +2,33 @@
 
 场景卡里的角色以 `productNo + marker + version + 脸图PNG + lstInfo + data` 的形式
 内嵌（**没有前导缩略图**）。提取时以脸图作为封面，重建为可独立读取的标准角色卡。
+
+场景卡动辄几十 MB：按文件 mmap 读取，一遍正则扫出所有角色 marker，内嵌角色只先解析
+头部与块索引（EmbeddedChara），取名 / 取 ModID 时才切出需要的那一个块。
 """
 
 from __future__ import annotations
 
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable, Iterator, Sequence
 
 import msgpack
 
 from core.kk_card import (
+    COORDINATE_MARKERS,
+    KNOWN_MARKERS,
     PNG_SIGNATURE,
     BlockInfo,
     KoikatuCard,
     _Reader,
     extract_mod_ids,
+    peek_header,
     png_data_length,
 )
 
@@ -28,8 +41,91 @@ CHARA_MARKER_PATTERNS = [
 ]
 
 
-def _parse_embedded(data: bytes, marker_full_start: int) -> KoikatuCard | None:
-    """从内嵌角色的 marker 起点解析出一张可独立保存的角色卡（脸图作封面）。"""
+# 所有 marker 变体合成一个正则（长的在前），一遍扫完整个文件
+_CHARA_MARKER_RE = re.compile(b"|".join(
+    re.escape(pat) for pat in sorted(CHARA_MARKER_PATTERNS, key=len, reverse=True)))
+
+# 待分析场景卡数达到此值时 analyze_folder 才开进程池
+SCENE_PROCESS_THRESHOLD = 8
+
+
+@contextmanager
+def open_scene_bytes(path: str | Path) -> Iterator:
+    """以只读 mmap 打开场景卡（空文件退回 b""），退出时释放映射。
+
+    切片得到的 bytes 会复制出来，映射关闭后仍可用；EmbeddedChara 本身须在 with 内使用。
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+@dataclass
+class EmbeddedChara:
+    """场景内嵌角色的懒解析视图：只解析了头部与块索引，块内容按需从场景数据里切出。"""
+
+    data: object = field(repr=False)     # 场景数据（bytes 或 mmap）
+    start: int                           # productNo 在场景数据中的位置
+    product_no: int
+    marker: str
+    version: str
+    face_pos: int
+    face_len: int
+    lstinfo_raw: bytes = field(repr=False)
+    block_order: list[BlockInfo]
+    data_pos: int                        # 数据区起点
+    data_len: int
+
+    @property
+    def game(self) -> str:
+        return KNOWN_MARKERS.get(self.marker, ("?", "未知"))[0]
+
+    def block(self, name: str) -> bytes | None:
+        for bi in self.block_order:
+            if bi.name == name:
+                return self.data[self.data_pos + bi.pos : self.data_pos + bi.pos + bi.size]
+        return None
+
+    def _partial_card(self, *names: str) -> KoikatuCard:
+        """只带指定块的 KoikatuCard，供复用 parameter / extract_mod_ids。"""
+        blocks = {}
+        for name in names:
+            raw = self.block(name)
+            if raw is not None:
+                blocks[name] = raw
+        return KoikatuCard(marker=self.marker, blocks=blocks)
+
+    @property
+    def name(self) -> str:
+        return _chara_name(self._partial_card("Parameter"))
+
+    def mod_ids(self) -> dict[str, int]:
+        return extract_mod_ids(self._partial_card("KKEx"))
+
+    def to_card(self) -> KoikatuCard:
+        """完整切出脸图与全部块，重建为可独立保存的角色卡（脸图作封面）。"""
+        face = self.data[self.face_pos : self.face_pos + self.face_len]
+        blob = self.data[self.data_pos : self.data_pos + self.data_len]
+        blocks = {bi.name: blob[bi.pos : bi.pos + bi.size] for bi in self.block_order}
+        return KoikatuCard(
+            thumbnail=face,          # 用脸图当封面缩略图
+            face=face,
+            product_no=self.product_no,
+            marker=self.marker,
+            version=self.version,
+            blocks=blocks,
+            block_order=list(self.block_order),
+            _lstinfo_raw=self.lstinfo_raw,
+            _data_blob=blob,
+            _dirty=False,
+        )
+
+
+def _parse_embedded_header(data, marker_full_start: int) -> EmbeddedChara | None:
+    """从内嵌角色的 marker 起点解析头部与块索引；脸图与数据区只校验边界，不读出。"""
     # 布局：[productNo:int32][marker长度前缀:1B][marker...]
     chara_start = marker_full_start - 5
     if chara_start < 0:
@@ -43,9 +139,10 @@ def _parse_embedded(data: bytes, marker_full_start: int) -> KoikatuCard | None:
         face_len = r.read_int32()
         if face_len <= 0 or r.pos + face_len > len(data):
             return None
-        face = r.read(face_len)
-        if face[:8] != PNG_SIGNATURE:
+        face_pos = r.pos
+        if data[face_pos : face_pos + 8] != PNG_SIGNATURE:
             return None
+        r.pos += face_len
         lst_len = r.read_int32()
         if lst_len <= 0 or r.pos + lst_len > len(data):
             return None
@@ -54,13 +151,12 @@ def _parse_embedded(data: bytes, marker_full_start: int) -> KoikatuCard | None:
         data_len = r.read_int64()
         if data_len < 0 or r.pos + data_len > len(data):
             return None
-        blob = r.read(data_len)
+        data_pos = r.pos
     except Exception:  # noqa: BLE001 - 解析失败即视为不是有效内嵌角色
         return None
 
     block_order: list[BlockInfo] = []
-    blocks: dict[str, bytes] = {}
-    info_list = lstinfo.get("lstInfo")
+    info_list = lstinfo.get("lstInfo") if isinstance(lstinfo, dict) else None
     if not isinstance(info_list, list):
         return None
     for info in info_list:
@@ -70,39 +166,31 @@ def _parse_embedded(data: bytes, marker_full_start: int) -> KoikatuCard | None:
         except (KeyError, TypeError, ValueError):
             return None
         block_order.append(bi)
-        blocks[bi.name] = blob[bi.pos : bi.pos + bi.size]
-
-    return KoikatuCard(
-        thumbnail=face,          # 用脸图当封面缩略图
-        face=face,
-        product_no=product_no,
-        marker=marker,
-        version=version,
-        blocks=blocks,
-        block_order=block_order,
-        _lstinfo_raw=lst_raw,
-        _data_blob=blob,
-        _dirty=False,
+
+    return EmbeddedChara(
+        data=data, start=chara_start, product_no=product_no, marker=marker, version=version,
+        face_pos=face_pos, face_len=face_len, lstinfo_raw=lst_raw, block_order=block_order,
+        data_pos=data_pos, data_len=data_len,
     )
 
 
+def _parse_embedded(data: bytes, marker_full_start: int) -> KoikatuCard | None:
+    """从内嵌角色的 marker 起点解析出一张可独立保存的角色卡（脸图作封面）。"""
+    head = _parse_embedded_header(data, marker_full_start)
+    return head.to_card() if head is not None else None
+
+
+def iter_embedded_characters(data) -> Iterator[EmbeddedChara]:
+    """一遍扫描场景数据（bytes 或 mmap），按出现顺序产出可解析的内嵌角色（懒解析）。"""
+    for m in _CHARA_MARKER_RE.finditer(data):
+        head = _parse_embedded_header(data, m.start())
+        if head is not None:
+            yield head
+
+
 def find_embedded_characters(data: bytes) -> list[KoikatuCard]:
-    """扫描场景卡字节，返回所有成功解析的内嵌角色卡。"""
-    seen_starts: set[int] = set()
-    cards: list[KoikatuCard] = []
-    for pat in CHARA_MARKER_PATTERNS:
-        start = -1
-        while True:
-            start = data.find(pat, start + 1)
-            if start < 0:
-                break
-            if start in seen_starts:
-                continue
-            seen_starts.add(start)
-            card = _parse_embedded(data, start)
-            if card is not None:
-                cards.append(card)
-    return cards
+    """扫描场景卡字节，返回所有成功解析的内嵌角色卡（完整切出，可直接保存）。"""
+    return [c.to_card() for c in iter_embedded_characters(data)]
 
 
 def get_scene_preview(data: bytes) -> bytes | None:
@@ -130,35 +218,52 @@ def extract_characters_to(scene_path: str | Path, out_dir: str | Path) -> list[s
     scene_path = Path(scene_path)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-    data = scene_path.read_bytes()
-    cards = find_embedded_characters(data)
     saved: list[str] = []
-    for i, card in enumerate(cards, 1):
-        name = _chara_name(card)
-        safe = "".join(c for c in name if c not in r'\/:*?"<>|').strip() or f"chara{i}"
-        out = out_dir / f"{scene_path.stem}_{i:02d}_{safe}.png"
-        card.save(out, backup=False)
-        saved.append(str(out))
+    with open_scene_bytes(scene_path) as data:
+        for i, chara in enumerate(iter_embedded_characters(data), 1):
+            card = chara.to_card()
+            name = _chara_name(card)
+            safe = "".join(c for c in name if c not in r'\/:*?"<>|').strip() or f"chara{i}"
+            out = out_dir / f"{scene_path.stem}_{i:02d}_{safe}.png"
+            card.save(out, backup=False)
+            saved.append(str(out))
     return saved
 
 
 _UAR_SIG = b"com.bepis.sideloader.universalautoresolver"
 
 
-def extract_scene_mod_ids(data: bytes) -> dict[str, int]:
+def extract_scene_mod_ids(data: bytes, exclude: Sequence[tuple[int, int]] = ()) -> dict[str, int]:
     """提取场景级 Sideloader 依赖（studio 道具/姿势/地图等的 ModID）。
 
     场景里也存了 UAR：紧跟签名的是 [版本, {"info": [blob...]}]，每个 blob 再 msgpack
     解出 ModID（与角色卡同构）。无 studio mod 依赖的场景该 info 为空，返回空字典。
+    exclude 为内嵌角色数据区 [(起, 止)]：角色 KKEx 里也有同样的签名，落在其中的不算场景级。
     """
     out: dict[str, int] = {}
     pos = data.find(_UAR_SIG)
+    while pos >= 0:
+        inside = next((end for start, end in exclude if start <= pos < end), None)
+        if inside is None:
+            break
+        pos = data.find(_UAR_SIG, inside)
     if pos < 0:
         return out
-    up = msgpack.Unpacker(raw=False, strict_map_key=False)
-    up.feed(data[pos + len(_UAR_SIG):])
+    # 分段喂给 Unpacker，解出第一个对象即停，不把签名之后的整段数据复制出来
+    up = msgpack.Unpacker(raw=False, strict_map_key=False, max_buffer_size=len(data))
+    pos += len(_UAR_SIG)
+    step = 64 * 1024
+    val = None
     try:
-        val = next(iter(up))
+        while pos < len(data):
+            up.feed(data[pos:pos + step])
+            pos += step
+            step *= 2
+            try:
+                val = up.unpack()
+                break
+            except msgpack.OutOfData:
+                continue
     except Exception:  # noqa: BLE001
         return out
     if isinstance(val, (list, tuple)) and len(val) >= 2 and isinstance(val[1], dict):
@@ -175,26 +280,88 @@ def extract_scene_mod_ids(data: bytes) -> dict[str, int]:
     return out
 
 
-def analyze_scene(scene_path: str | Path) -> dict:
-    """分析场景卡：内嵌角色名单 + 聚合的 mod 依赖（内嵌角色 + 场景级 studio 道具）。"""
-    data = Path(scene_path).read_bytes()
-    cards = find_embedded_characters(data)
+def _collect_scene(data) -> tuple[list[dict], dict[str, int], dict[str, int]]:
+    """懒解析内嵌角色 + 场景级依赖，返回 (角色摘要, 聚合依赖, 场景级依赖)。"""
     characters = []
+    spans = []
     all_mods: dict[str, int] = {}
-    for card in cards:
-        mods = extract_mod_ids(card)
+    for chara in iter_embedded_characters(data):
+        spans.append((chara.data_pos, chara.data_pos + chara.data_len))
+        mods = chara.mod_ids()
         for g, n in mods.items():
             all_mods[g] = all_mods.get(g, 0) + n
-        characters.append({"name": _chara_name(card), "game": card.game, "mods": len(mods)})
+        characters.append({"name": chara.name, "game": chara.game, "mods": len(mods)})
     # 场景级 studio 道具依赖
-    scene_mods = extract_scene_mod_ids(data)
+    scene_mods = extract_scene_mod_ids(data, spans)
     for g, n in scene_mods.items():
         all_mods[g] = all_mods.get(g, 0) + n
+    return characters, all_mods, scene_mods
+
+
+def scene_mod_ids(data) -> dict[str, int]:
+    """场景数据的聚合 mod 依赖（内嵌角色 + 场景级 studio 道具）。"""
+    return _collect_scene(data)[1]
+
+
+def analyze_scene(scene_path: str | Path) -> dict:
+    """分析场景卡：内嵌角色名单 + 聚合的 mod 依赖（内嵌角色 + 场景级 studio 道具）。"""
+    with open_scene_bytes(scene_path) as data:
+        characters, all_mods, scene_mods = _collect_scene(data)
+        size = len(data)
     return {
         "path": str(scene_path),
-        "size": len(data),
-        "character_count": len(cards),
+        "size": size,
+        "character_count": len(characters),
         "characters": characters,
         "mod_ids": all_mods,
         "scene_mod_count": len(scene_mods),
     }
+
+
+def _analyze_scene_task(path: str) -> dict | None:
+    """进程池任务：角色卡 / 服装卡返回 None（不是场景），读不了的记 error。"""
+    try:
+        with open_scene_bytes(path) as data:
+            marker, _ = peek_header(data)
+            if marker is None or marker in KNOWN_MARKERS or marker in COORDINATE_MARKERS:
+                return None
+        return analyze_scene(path)
+    except Exception as exc:  # noqa: BLE001 - 单张坏卡不影响整批
+        return {"path": path, "error": str(exc)}
+
+
+def analyze_folder(
+    folder: str | Path,
+    *,
+    recursive: bool = True,
+    workers: int | None = None,
+    progress: Callable[[int, int, str], None] | None = None,
+) -> list[dict]:
+    """批量分析文件夹里的场景卡，返回各场景的 analyze_scene 结果（坏卡为 {path, error}）。
+
+    角色卡 / 服装卡 / 纯图片自动跳过。workers 为进程数，None 为 CPU 核数，
+    0 表示在当前进程串行处理。
+    """
+    folder = Path(folder)
+    pattern = "**/*" if recursive else "*"
+    paths = sorted(str(p) for p in folder.glob(pattern)
+                   if p.suffix.lower() == ".png" and p.is_file())
+    total = len(paths)
+    results: list[dict] = []
+    if workers == 0 or total < SCENE_PROCESS_THRESHOLD:
+        executor = None
+        it = map(_analyze_scene_task, paths)
+    else:
+        # Windows 进程池上限 61
+        executor = ProcessPoolExecutor(max_workers=max(1, min(61, workers or os.cpu_count() or 1)))
+        it = executor.map(_analyze_scene_task, paths)
+    try:
+        for i, (path, info) in enumerate(zip(paths, it), 1):
+            if info is not None:
+                results.append(info)
+            if progress:
+                progress(i, total, Path(path).name)
+    finally:
+        if executor:
+            executor.shutdown()
+    return results
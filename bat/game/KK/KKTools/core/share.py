@@ -1,14 +1,27 @@
-"""分享包生成：把角色卡与其依赖的 mod 一起整理输出，方便分享给别人。"""
+"""分享包生成：把角色卡与其依赖的 mod 一起整理输出，方便分享给别人。
+
+分享包按内容寻址去重：包根目录的 .kkshare.json 记录 {内容 sha256: 包内首个实体文件}，
+同一个 mod 在包里只写一份实体，其余位置优先硬链接、其次 reflink（写时复制），
+都不支持才真复制。再次生成到同一目录时是增量的：卡片和 mod 源文件未变动就跳过。
+不单独建 .store 目录——那样拷走或压缩分享包时 store 本身会多出一整份。
+"""
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable
 
 from core.kk_card import KoikatuCard, extract_mod_ids
 from core.mod_index import ModIndex
 
+SHARE_MANIFEST = ".kkshare.json"
+_FICLONE = 0x40049409          # Linux ioctl：btrfs / xfs 等的 reflink
+
 
 def _card_name(path: Path) -> str:
     try:
@@ -20,6 +33,82 @@ def _card_name(path: Path) -> str:
         return path.stem
 
 
+def _required_mods(path: Path) -> dict[str, int]:
+    return extract_mod_ids(KoikatuCard.load(path))
+
+
+def _stamp(path: str | Path) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src: str | Path, dst: str | Path) -> bool:
+    """尝试写时复制克隆（Linux FICLONE）；不支持的平台/文件系统返回 False。"""
+    try:
+        import fcntl
+    except ImportError:     # Windows
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _clone_file(src: str | Path, dst: str | Path) -> str:
+    """从包外源文件写入一份实体：能 reflink 就不占额外空间，否则真复制。返回方式。"""
+    if _reflink(src, dst):
+        return "reflink"
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def _link_file(src: str | Path, dst: str | Path) -> str:
+    """包内已有同内容实体时的再次放置：硬链接 > reflink > 复制。返回方式。"""
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        return _clone_file(src, dst)
+
+
+def _load_share_manifest(out_dir: Path) -> dict:
+    try:
+        data = json.loads((out_dir / SHARE_MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) and data.get("version") == 1 else {}
+
+
+def _save_share_manifest(out_dir: Path, manifest: dict) -> None:
+    path = out_dir / SHARE_MANIFEST
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _format_size(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
 def build_share_package(
     card_paths: list[str],
     index: ModIndex,
@@ -28,6 +117,7 @@ def build_share_package(
     group_by_char: bool = True,
     exclude_guids: set[str] | None = None,
     progress: Callable[[int, int, str], None] | None = None,
+    workers: int = 8,
 ) -> dict:
     """为若干角色卡生成分享包。
 
@@ -35,34 +125,52 @@ def build_share_package(
     group_by_char=True 时每张卡一个子目录，否则集中放到 cards/ 与 mods/。
     exclude_guids 给定时，这些 GUID（如某个大整合包里已有的 mod）不打进分享包，
     避免分享包塞入对方大概率已经有的 mod、徒增体积。
+    卡片依赖走索引里的卡片依赖缓存，卡片未变动时不再解析。
+
+    同内容的 mod 在包内只写一份实体，其余硬链接 / reflink；包内已是最新的文件跳过；
+    哈希与复制用 workers 个线程并行。报告里的 bytes_* 给出 mod 总量、实际写入量与节省量。
     返回汇总报告 dict。
     """
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     exclude = exclude_guids or set()
 
+    manifest = _load_share_manifest(out_dir)
+    hashes: dict[str, list] = manifest.get("hashes", {})   # 源路径 -> [戳, sha256]
+    names: dict[str, list] = manifest.get("names", {})     # 卡片源路径 -> [戳, 角色名]
+    files: dict[str, str] = manifest.get("files", {})      # 包内相对路径 -> 卡片源戳 / mod sha256
+    blobs: dict[str, str] = manifest.get("blobs", {})      # sha256 -> 包内首个实体的相对路径
+
     report = {"cards": [], "total_missing": set(), "copied_mods": set(), "excluded_mods": set()}
+    card_jobs: list[tuple[Path, str, str]] = []     # (源, 包内相对路径, 源戳)
+    card_keys: set[str] = set()
+    mod_dsts: dict[str, str] = {}                   # 包内相对路径 -> 源路径
     total = len(card_paths)
     for i, cp in enumerate(card_paths, 1):
         cp = Path(cp)
-        name = _card_name(cp)
+        key = os.path.abspath(cp)
+        card_keys.add(key)
+        stamp = _stamp(cp)
+        cached = names.get(key)
+        if cached and cached[0] == stamp:
+            name = cached[1]
+        else:
+            name = _card_name(cp)
+            names[key] = [stamp, name]
         safe = "".join(c for c in name if c not in r'\/:*?"<>|').strip() or cp.stem
 
         if group_by_char:
-            base = out_dir / safe
-            card_dst_dir = base
-            mods_dst_dir = base / "mods"
+            card_dst_dir = Path(safe)
+            mods_dst_dir = Path(safe) / "mods"
         else:
-            card_dst_dir = out_dir / "cards"
-            mods_dst_dir = out_dir / "mods"
-        card_dst_dir.mkdir(parents=True, exist_ok=True)
-        mods_dst_dir.mkdir(parents=True, exist_ok=True)
-
-        shutil.copy2(cp, card_dst_dir / cp.name)
+            card_dst_dir = Path("cards")
+            mods_dst_dir = Path("mods")
+        card_rel = (card_dst_dir / cp.name).as_posix()
+        if files.get(card_rel) != stamp or not (out_dir / card_rel).exists():
+            card_jobs.append((cp, card_rel, stamp))
 
         try:
-            card = KoikatuCard.load(cp)
-            required = extract_mod_ids(card)
+            required = index.card_requirements(cp, parse=_required_mods)
         except Exception:  # noqa: BLE001
             required = {}
 
@@ -74,9 +182,7 @@ def build_share_package(
                 continue
             entry = index.get(guid)
             if entry and entry.path and Path(entry.path).exists():
-                dst = mods_dst_dir / Path(entry.path).name
-                if not dst.exists():
-                    shutil.copy2(entry.path, dst)
+                mod_dsts.setdefault((mods_dst_dir / Path(entry.path).name).as_posix(), entry.path)
                 present.append(guid)
                 report["copied_mods"].add(guid)
             else:
@@ -90,11 +196,100 @@ def build_share_package(
         if progress:
             progress(i, total, name)
 
+    # 源 mod 内容哈希：源文件未变动就用清单里记下的
+    sources = sorted(set(mod_dsts.values()))
+    stamps = {src: _stamp(src) for src in sources}
+
+    def digest(src: str) -> str:
+        cached = hashes.get(src)
+        if cached and cached[0] == stamps[src]:
+            return cached[1]
+        return _file_sha256(src)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for src, sha in zip(sources, ex.map(digest, sources)):
+            hashes[src] = [stamps[src], sha]
+
+    stats = {"bytes_total": 0, "bytes_copied": 0, "bytes_linked": 0, "bytes_reused": 0}
+    modes = {"copy": 0, "reflink": 0, "hardlink": 0}
+    first: dict[str, str] = {}      # 本次需要新放置实体的 sha -> 相对路径
+    links: list[tuple[str, str, int]] = []
+    for rel, src in sorted(mod_dsts.items()):
+        sha = hashes[src][1]
+        size = int(stamps[src].rsplit(":", 1)[1])
+        stats["bytes_total"] += size
+        dst = out_dir / rel
+        if dst.exists():
+            if files.get(rel) == sha:
+                stats["bytes_reused"] += size
+                blobs.setdefault(sha, rel)
+                continue
+            if rel not in files:
+                stats["bytes_reused"] += size
+                continue        # 不是本程序放的文件，不覆盖
+            dst.unlink()        # 上次放的是旧版本，换新
+        home = blobs.get(sha)
+        if home and home != rel and files.get(home) == sha and (out_dir / home).exists():
+            links.append((home, rel, size))
+        elif sha in first:
+            links.append((first[sha], rel, size))
+        else:
+            first[sha] = rel
+            links.append(("", rel, size))       # 空源 = 从包外源文件写实体
+
+    def place_card(job: tuple[Path, str, str]) -> None:
+        src, rel, stamp = job
+        dst = out_dir / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dst)
+        files[rel] = stamp
+
+    def place_mod(job: tuple[str, str, int]) -> str:
+        home, rel, _ = job
+        dst = out_dir / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        src = mod_dsts[rel]
+        mode = _link_file(out_dir / home, dst) if home else _clone_file(src, dst)
+        files[rel] = hashes[src][1]
+        return mode
+
+    entity_jobs = [j for j in links if not j[0]]
+    link_jobs = [j for j in links if j[0]]
+    done, todo = 0, len(card_jobs) + len(links)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for _ in ex.map(place_card, card_jobs):
+            done += 1
+        # 先写实体，再做链接（链接的源必须已存在）
+        for batch in (entity_jobs, link_jobs):
+            for job, mode in zip(batch, ex.map(place_mod, batch)):
+                modes[mode] += 1
+                stats["bytes_copied" if mode == "copy" else "bytes_linked"] += job[2]
+                done += 1
+                if progress and (done % 20 == 0 or done == todo):
+                    progress(done, todo, Path(job[1]).name)
+    blobs.update({sha: rel for sha, rel in first.items()})
+
+    # 只留仍在包里的文件与本次用到的源，清单不随历次生成无限增长
+    files = {rel: v for rel, v in files.items() if (out_dir / rel).exists()}
+    _save_share_manifest(out_dir, {
+        "version": 1,
+        "hashes": {src: hashes[src] for src in sources},
+        "names": {k: v for k, v in names.items() if k in card_keys},
+        "files": files,
+        "blobs": {sha: rel for sha, rel in blobs.items() if files.get(rel) == sha},
+    })
+
+    stats["bytes_saved"] = stats["bytes_linked"] + stats["bytes_reused"]
+    report.update(stats)
+    report["link_modes"] = modes
+
     # 写一份说明
     readme = out_dir / "README.txt"
     lines = ["KKTools 分享包", f"共 {len(card_paths)} 张角色卡"]
     if exclude:
         lines.append(f"（已排除参考清单中已有的 mod {len(report['excluded_mods'])} 种，未打入分享包）")
+    lines.append(f"mod 文件共 {_format_size(stats['bytes_total'])}，本次实际写入 {_format_size(stats['bytes_copied'])}，"
+                 f"去重/增量节省 {_format_size(stats['bytes_saved'])}")
     lines.append("")
     for c in report["cards"]:
         extra = f" | 已排除 {c['excluded']}" if c.get("excluded") else ""
@@ -6,18 +6,26 @@ zip 的目录信息在文件末尾，解压器从尾部定位，能容忍前面
 
 Python 的 zipfile 本身就支持带前缀的 zip（自解压 exe 同理），故解包时直接用
 zipfile 打开伪装文件即可，无需手动剥离载体。
+
+载体、分卷动辄数 GB，所有拼接/分卷/合并都走流式复制（copy_stream），
+不把整个文件读进内存。
 """
 
 from __future__ import annotations
 
 import hashlib
+import io
 import json
+import os
 import random
 import tempfile
 import zlib
 import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Iterator
 
 try:
     import pyzipper
@@ -27,39 +35,284 @@ except ImportError:  # 未装则仅支持不加密打包/解包
 
 ProgressCb = Callable[[int, int, str], None]  # (当前, 总数, 描述)
 
+COPY_CHUNK = 8 * 1024 * 1024   # 流式复制每块 8MB：够大以摊薄系统调用，又不占多少内存
+
+
+def copy_stream(
+    src,
+    dst,
+    length: int | None = None,
+    *,
+    progress: ProgressCb | None = None,
+    desc: str = "",
+) -> int:
+    """把 src 当前位置起的 length 字节（None=到末尾）流式写到 dst 当前位置，返回复制字节数。
+
+    两端都是真实文件时优先用 os.copy_file_range 在内核里直接搬数据（Linux），
+    否则用一块复用的缓冲区 readinto + memoryview 写出，不产生中间 bytes 对象。
+    progress 以 KB 为单位回报（Qt 信号是 32 位 int，按字节回报超过 2GB 会溢出）。
+    """
+    total_kb = (length // 1024) if length is not None else 0
+    copied = 0
+
+    def report() -> None:
+        if progress:
+            progress(copied // 1024, total_kb, desc)
+
+    dst.flush()
+    copy_range = getattr(os, "copy_file_range", None)
+    if copy_range is not None:
+        try:
+            in_fd, out_fd = src.fileno(), dst.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            in_fd = out_fd = None
+        if in_fd is not None:
+            src_pos, dst_pos = src.tell(), dst.tell()
+            try:
+                while length is None or copied < length:
+                    n = COPY_CHUNK if length is None else min(COPY_CHUNK, length - copied)
+                    sent = copy_range(in_fd, out_fd, n, src_pos + copied, dst_pos + copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+                    report()
+                finished = True
+            except OSError:
+                finished = False   # 跨文件系统 / 不支持等，剩下的走缓冲区复制
+            # 内核复制不经过 Python 的文件缓冲，手动同步两端位置
+            src.seek(src_pos + copied)
+            dst.seek(dst_pos + copied)
+            if finished:
+                return copied
+
+    buf = bytearray(min(COPY_CHUNK, length - copied) if length is not None else COPY_CHUNK)
+    view = memoryview(buf)
+    while length is None or copied < length:
+        want = len(buf) if length is None else min(len(buf), length - copied)
+        n = src.readinto(view[:want])
+        if not n:
+            break
+        dst.write(view[:n])
+        copied += n
+        report()
+    return copied
+
+
+def copy_file_into(
+    src_path: str | Path,
+    dst,
+    *,
+    progress: ProgressCb | None = None,
+    desc: str = "",
+) -> int:
+    """把整个文件流式追加到已打开的 dst 当前位置。"""
+    with open(src_path, "rb") as src:
+        return copy_stream(src, dst, os.fstat(src.fileno()).st_size, progress=progress, desc=desc)
+
+
+# 本身已压缩的格式：再 deflate 几乎不减体积，只白耗 CPU，打包时直接存储
+STORED_SUFFIXES = (
+    ".zipmod", ".zip", ".7z", ".rar",
+    ".png", ".jpg", ".jpeg", ".webp", ".gif",
+    ".mp4", ".mkv", ".mov", ".avi", ".webm",
+)
+
+DEFLATE_BLOCK = 4 * 1024 * 1024       # 大文件按 4MB 切块并行压缩
+_DEFLATE_DICT = 32 * 1024             # deflate 回溯窗口：每块以前一块末尾 32KB 作预设字典
+PARALLEL_PACK_THRESHOLD = 8 * 1024 * 1024  # 待压缩数据不足 8MB 时不开进程池（启动开销不划算）
+
+
+def _deflate_block(task: tuple[str, int, int, bool, int]) -> tuple[int, int, bytes]:
+    """进程池任务：把文件 [offset, offset+length) 压成一段裸 deflate 流，返回 (crc32, 原始字节数, 压缩数据)。
+
+    同 pigz：非末块以 Z_SYNC_FLUSH 收尾（字节对齐、不置结束位），末块以 Z_FINISH 收尾，
+    各段按顺序首尾相接就是一条合法的 deflate 流。每块以前 32KB 作预设字典，压缩率与整条流几乎一致。
+    """
+    path, offset, length, last, level = task
+    with open(path, "rb") as f:
+        zdict = b""
+        if offset:
+            start = max(0, offset - _DEFLATE_DICT)
+            f.seek(start)
+            zdict = f.read(offset - start)
+        data = f.read(length)
+    if zdict:
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    out = comp.compress(data) + comp.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return zlib.crc32(data), len(data), out
+
+
+def _gf2_times(mat: list[int], vec: int) -> int:
+    total, i = 0, 0
+    while vec:
+        if vec & 1:
+            total ^= mat[i]
+        vec >>= 1
+        i += 1
+    return total
+
+
+def _gf2_square(mat: list[int]) -> list[int]:
+    return [_gf2_times(mat, mat[n]) for n in range(32)]
+
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    """由 crc(A)、crc(B) 和 len(B) 算出 crc(A+B)（移植自 zlib 的 crc32_combine）。"""
+    if len2 <= 0:
+        return crc1
+    odd = [0xEDB88320] + [1 << n for n in range(31)]   # 移 1 个零比特的算子
+    even = _gf2_square(odd)                            # 2 个零比特
+    odd = _gf2_square(even)                            # 4 个零比特
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+    return crc1 ^ crc2
+
+
+def _ordered_results(executor, fn, tasks: Iterable, window: int) -> Iterator:
+    """按提交顺序逐个产出结果；同时在途的任务不超过 window 个，已压好的块不会在内存里越堆越多。"""
+    pending: deque = deque()
+    tasks = iter(tasks)
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= window:
+            break
+    while pending:
+        result = pending.popleft().result()
+        for task in tasks:
+            pending.append(executor.submit(fn, task))
+            break
+        yield result
+
+
+class _SerialExecutor:
+    """与 Executor.submit 同形的当前进程执行器：数据量小或 workers=0 时不开进程池。"""
+
+    def submit(self, fn, *args):
+        future: Future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class _PassThrough:
+    """压缩器替身：数据已在进程池里压好，原样交给 zip 写入句柄。"""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+# 透传写入要改动的 zip 写入句柄内部属性（zipfile._ZipWriteFile，pyzipper 沿用同名属性）
+_WRITER_INTERNALS = ("_compressor", "_crc", "_file_size")
+
+
+def _write_predeflated(zf, zinfo, blocks: Iterable[tuple[int, int, bytes]]) -> None:
+    """把进程池压好的 deflate 段按顺序写成一个 zip 成员（zipfile / pyzipper 通用，加密照常生效）。
+
+    借用 ZipFile.open(zinfo, "w") 写本地头、加密与中央目录，只把它的压缩器换成原样透传；
+    写入句柄会把收到的压缩数据当原文算 CRC 与大小，关闭前用各段结果合并出的真实值回填。
+    这些都是私有属性：句柄上缺任何一个（库实现变了）就退回普通写入——各段解压后交给句柄自己压缩，
+    并行压缩的结果作废但打包结果正确。
+    """
+    with zf.open(zinfo, "w") as w:
+        if not all(hasattr(w, name) for name in _WRITER_INTERNALS):
+            inflater = zlib.decompressobj(-15)
+            for _, _, data in blocks:
+                w.write(inflater.decompress(data))
+            w.write(inflater.flush())
+            return
+        w._compressor = _PassThrough()
+        crc = size = 0
+        for block_crc, n, data in blocks:
+            w.write(data)
+            crc = crc32_combine(crc, block_crc, n) if size else block_crc
+            size += n
+        w._crc, w._file_size = crc, size
+
 
 def pack_folder(
     folder: str | Path,
-    out_zip: str | Path,
+    out_zip,
     *,
     compress: bool = True,
     password: str | None = None,
     progress: ProgressCb | None = None,
+    workers: int | None = None,
 ) -> str:
-    """把文件夹打包成 zip。给 password 则用 AES-256 加密（需 pyzipper）。返回输出路径。"""
+    """把文件夹打包成 zip。给 password 则用 AES-256 加密（需 pyzipper）。返回输出路径。
+
+    需要压缩的文件切块交给进程池并行 deflate，主进程按原顺序拼装写出；
+    STORED_SUFFIXES 里的已压缩格式直接存储。workers 为进程数，None 为 CPU 核数，
+    0 表示在当前进程串行压缩。
+
+    out_zip 也可以是已打开的可写文件对象：zip 从它的当前位置开始写
+    （pack_and_disguise 借此把 zip 直接写在载体之后；也可以是不可 seek 的流，
+    如多重封缄外层 zip 的成员写入句柄）。
+    """
     folder = Path(folder)
-    out_zip = Path(out_zip)
+    if not hasattr(out_zip, "write"):
+        out_zip = Path(out_zip)
     files = [p for p in folder.rglob("*") if p.is_file()]
     total = len(files)
-    if password:
-        if not HAVE_PYZIPPER:
-            raise RuntimeError("加密打包需要 pyzipper，请先安装：pip install pyzipper")
-        with pyzipper.AESZipFile(
-            out_zip, "w", compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES
-        ) as zf:
+    level = zlib.Z_DEFAULT_COMPRESSION
+
+    with ExitStack() as stack:
+        if password:
+            if not HAVE_PYZIPPER:
+                raise RuntimeError("加密打包需要 pyzipper，请先安装：pip install pyzipper")
+            zf = stack.enter_context(pyzipper.AESZipFile(out_zip, "w", encryption=pyzipper.WZ_AES))
             zf.setpassword(password.encode("utf-8"))
-            for i, p in enumerate(files, 1):
-                zf.write(p, p.relative_to(folder).as_posix())
-                if progress:
-                    progress(i, total, p.name)
-    else:
-        mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
-        with zipfile.ZipFile(out_zip, "w", mode) as zf:
-            for i, p in enumerate(files, 1):
-                zf.write(p, p.relative_to(folder).as_posix())
-                if progress:
-                    progress(i, total, p.name)
-    return str(out_zip)
+        else:
+            zf = stack.enter_context(zipfile.ZipFile(out_zip, "w"))
+        zinfo_cls = getattr(zf, "zipinfo_cls", zipfile.ZipInfo)   # pyzipper 要用它自己的 ZipInfo
+
+        members = []   # (路径, ZipInfo, 块数；0 表示直接存储)
+        tasks: list[tuple[str, int, int, bool, int]] = []
+        deflate_bytes = 0
+        for p in files:
+            zinfo = zinfo_cls.from_file(p, p.relative_to(folder).as_posix())
+            if compress and p.suffix.lower() not in STORED_SUFFIXES:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                size = zinfo.file_size
+                offsets = range(0, size, DEFLATE_BLOCK) if size else (0,)
+                for off in offsets:
+                    n = min(DEFLATE_BLOCK, size - off)
+                    tasks.append((str(p), off, n, off + n >= size, level))
+                members.append((p, zinfo, len(offsets)))
+                deflate_bytes += size
+            else:
+                zinfo.compress_type = zipfile.ZIP_STORED
+                members.append((p, zinfo, 0))
+
+        if workers == 0 or deflate_bytes < PARALLEL_PACK_THRESHOLD:
+            ex, window = _SerialExecutor(), 1
+        else:
+            workers = max(1, min(61, workers or os.cpu_count() or 1))   # Windows 进程池上限 61
+            ex, window = stack.enter_context(ProcessPoolExecutor(max_workers=workers)), workers * 4
+        blocks = _ordered_results(ex, _deflate_block, tasks, window)
+        for i, (p, zinfo, n_blocks) in enumerate(members, 1):
+            if n_blocks:
+                _write_predeflated(zf, zinfo, (next(blocks) for _ in range(n_blocks)))
+            else:
+                with open(p, "rb") as src, zf.open(zinfo, "w") as w:
+                    copy_stream(src, w)
+            if progress:
+                progress(i, total, p.name)
+    return str(getattr(out_zip, "name", out_zip))
 
 
 _CARRIER_SUFFIXES = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".jpg", ".jpeg", ".png", ".webp", ".gif")
@@ -82,14 +335,18 @@ def pick_carrier_from_pool(pool_dir: str | Path) -> str:
     return str(random.choice(files))
 
 
-def disguise(carrier: str | Path, payload_zip: str | Path, out_path: str | Path) -> str:
-    """把 payload_zip 追加到 carrier 之后，生成伪装文件。"""
-    carrier = Path(carrier)
-    payload_zip = Path(payload_zip)
+def disguise(
+    carrier: str | Path,
+    payload_zip: str | Path,
+    out_path: str | Path,
+    *,
+    progress: ProgressCb | None = None,
+) -> str:
+    """把 payload_zip 追加到 carrier 之后，生成伪装文件（流式，不整读进内存）。"""
     out_path = Path(out_path)
     with open(out_path, "wb") as out:
-        out.write(carrier.read_bytes())
-        out.write(payload_zip.read_bytes())
+        copy_file_into(carrier, out, progress=progress, desc="写入载体")
+        copy_file_into(payload_zip, out, progress=progress, desc="追加压缩包")
     return str(out_path)
 
 
@@ -101,15 +358,24 @@ def pack_and_disguise(
     password: str | None = None,
     progress: ProgressCb | None = None,
 ) -> str:
-    """打包文件夹并伪装成载体文件，一步到位。给 password 则 AES 加密。"""
+    """打包文件夹并伪装成载体文件，一步到位。给 password 则 AES 加密。
+
+    先把载体流式写入输出文件，再在同一个文件句柄上接着写 zip——不生成临时 zip，
+    磁盘只写一遍。zipfile 在已定位的句柄上按文件绝对位置记录偏移（含载体长度），
+    因此输出与"载体 + zip 直接拼接"的字节并不相同，解包不受影响。
+    失败时删除写了一半的输出文件。
+    """
     out_path = Path(out_path)
-    tmp_zip = out_path.with_suffix(out_path.suffix + ".tmp.zip")
     try:
-        pack_folder(folder, tmp_zip, password=password, progress=progress)
-        disguise(carrier, tmp_zip, out_path)
-    finally:
-        if tmp_zip.exists():
-            tmp_zip.unlink()
+        with open(out_path, "wb") as out:
+            copy_file_into(carrier, out, progress=progress, desc="写入载体")
+            pack_folder(folder, out, password=password, progress=progress)
+    except BaseException:
+        try:
+            out_path.unlink()
+        except OSError:
+            pass
+        raise
     return str(out_path)
 
 
@@ -172,8 +438,10 @@ def split_file(
     path: str | Path,
     chunk_size_mb: float,
     out_dir: str | Path | None = None,
+    *,
+    progress: ProgressCb | None = None,
 ) -> list[str]:
-    """把文件分卷为 name.001 / name.002 ...，返回分卷路径列表。"""
+    """把文件分卷为 name.001 / name.002 ...（流式，每卷不整块进内存），返回分卷路径列表。"""
     path = Path(path)
     out_dir = Path(out_dir) if out_dir else path.parent
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -182,20 +450,28 @@ def split_file(
         raise ValueError("分卷大小必须大于 0")
     parts: list[str] = []
     with open(path, "rb") as f:
+        remaining = os.fstat(f.fileno()).st_size
         idx = 1
-        while True:
-            data = f.read(chunk)
-            if not data:
-                break
+        while remaining > 0:
             part = out_dir / f"{path.name}.{idx:03d}"
-            part.write_bytes(data)
+            with open(part, "wb") as out:
+                n = copy_stream(f, out, min(chunk, remaining), progress=progress, desc=part.name)
+            if n == 0:
+                part.unlink()
+                break
+            remaining -= n
             parts.append(str(part))
             idx += 1
     return parts
 
 
-def join_parts(first_part: str | Path, out_path: str | Path) -> str:
-    """把 name.001 / name.002 ... 合并回原文件。传入 .001 分卷路径。"""
+def join_parts(
+    first_part: str | Path,
+    out_path: str | Path,
+    *,
+    progress: ProgressCb | None = None,
+) -> str:
+    """把 name.001 / name.002 ... 合并回原文件（流式）。传入 .001 分卷路径。"""
     first_part = Path(first_part)
     stem = first_part.with_suffix("")  # 去掉 .001
     out_path = Path(out_path)
@@ -204,7 +480,7 @@ def join_parts(first_part: str | Path, out_path: str | Path) -> str:
         raise FileNotFoundError("未找到分卷文件")
     with open(out_path, "wb") as out:
         for p in parts:
-            out.write(p.read_bytes())
+            copy_file_into(p, out, progress=progress, desc=p.name)
     return str(out_path)
 
 
@@ -225,17 +501,6 @@ def seal_sidecar_path(out_path: str | Path) -> Path:
     return Path(str(out_path) + _SEAL_SIDECAR_SUFFIX)
 
 
-def _aes_zip_single(src_file: Path, out_zip: Path, password: str, arcname: str) -> None:
-    """把单个文件以 AES-256 加密写入一个新 zip（一层封缄）。"""
-    if not HAVE_PYZIPPER:
-        raise RuntimeError("多重封缄需要 pyzipper，请先安装：pip install pyzipper")
-    with pyzipper.AESZipFile(
-        out_zip, "w", compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES
-    ) as zf:
-        zf.setpassword(password.encode("utf-8"))
-        zf.write(src_file, arcname)
-
-
 def pack_layered(
     folder: str | Path,
     out_path: str | Path,
@@ -243,12 +508,17 @@ def pack_layered(
     *,
     carrier: str | Path | None = None,
     progress: ProgressCb | None = None,
+    workers: int | None = None,
 ) -> str:
     """把文件夹多重封缄为 N 层加密文件（N=len(passwords)）。
 
     passwords[0] 是最内层（最先施加）、passwords[-1] 是最外层。
     给 carrier 则把最外层结果伪装追加到载体之后。
     旁写 <out>.kkseal.json 明文记录层数（不含密码）。返回最终输出路径。
+
+    各层嵌套成流一次写完：最外层 zip 的成员写入句柄就是下一层 zip 的输出，
+    最内层 pack_folder 写进的数据逐层加密后直接落到输出文件，不生成每层一份的临时文件。
+    外层成员是已加密数据，不再压缩（存储）。
     """
     folder = Path(folder)
     out_path = Path(out_path)
@@ -258,36 +528,29 @@ def pack_layered(
         raise RuntimeError("多重封缄需要 pyzipper，请先安装：pip install pyzipper")
 
     n = len(passwords)
-    tmpdir = Path(tempfile.mkdtemp(prefix="kkseal_"))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
     try:
-        # 第 1 层：把文件夹打成加密 zip
-        layer = tmpdir / "layer_1.kkz"
-        pack_folder(folder, layer, password=passwords[0], progress=progress)
-        if progress:
-            progress(1, n, f"封缄第 1/{n} 层")
-        # 第 2..N 层：把上一层 zip 当作唯一成员再加密
-        for i in range(1, n):
-            nxt = tmpdir / f"layer_{i + 1}.kkz"
-            _aes_zip_single(layer, nxt, passwords[i], _SEAL_INNER_NAME)
-            layer = nxt
-            if progress:
-                progress(i + 1, n, f"封缄第 {i + 1}/{n} 层")
-
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-        if carrier:
-            disguise(carrier, layer, out_path)
-        else:
-            out_path.write_bytes(layer.read_bytes())
-    finally:
-        for f in tmpdir.glob("*"):
-            try:
-                f.unlink()
-            except OSError:
-                pass
+        with ExitStack() as stack:
+            sink = stack.enter_context(open(out_path, "wb"))
+            if carrier:
+                copy_file_into(carrier, sink, progress=progress, desc="写入载体")
+            # 从最外层(passwords[n-1])往内套到第 2 层；ExitStack 按相反顺序由内向外收尾
+            for depth in range(n, 1, -1):
+                zf = stack.enter_context(pyzipper.AESZipFile(
+                    sink, "w", compression=pyzipper.ZIP_STORED, encryption=pyzipper.WZ_AES))
+                zf.setpassword(passwords[depth - 1].encode("utf-8"))
+                # 内层大小事先未知，强制 zip64 以容纳超过 4GB 的内层封包
+                sink = stack.enter_context(zf.open(_SEAL_INNER_NAME, "w", force_zip64=True))
+            # 第 1 层：把文件夹打成加密 zip
+            pack_folder(folder, sink, password=passwords[0], progress=progress, workers=workers)
+    except BaseException:
         try:
-            tmpdir.rmdir()
+            out_path.unlink()
         except OSError:
             pass
+        raise
+    if progress:
+        progress(n, n, f"已封缄 {n} 层")
 
     # 明文伴随：只记层数，绝不含密码
     seal_sidecar_path(out_path).write_text(
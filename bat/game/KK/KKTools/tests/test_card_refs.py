@@ -0,0 +1,88 @@
+"""卡片依赖缓存 / 反向索引单测（monkeypatch 读卡，专测增量与反查逻辑）。"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import mod_index  # noqa: E402
+from core.mod_index import ModEntry, ModIndex  # noqa: E402
+
+DEPS = {
+    "a.png": {"g1": 2, "g2": 1},
+    "b.png": {"g2": 1},
+    "broken.png": None,
+}
+
+
+def _fake_reader(parsed: list[str]):
+    def read(path):
+        name = Path(path).name
+        parsed.append(name)
+        deps = DEPS[name]
+        if deps is None:
+            raise ValueError("坏卡")
+        return dict(deps)
+    return read
+
+
+def test_refresh_is_incremental_and_reverse_lookup():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        for name in DEPS:
+            (d / name).write_bytes(b"\x89PNG fake " + name.encode())
+        cards = [str(d / n) for n in DEPS]
+        index = ModIndex()
+        for g in ("g1", "g2", "g3"):
+            index.entries[g] = ModEntry(guid=g, path=str(d / f"{g}.zipmod"))
+
+        parsed: list[str] = []
+        orig = mod_index.read_card_requirements
+        mod_index.read_card_requirements = _fake_reader(parsed)
+        try:
+            reqs = index.refresh_cards(cards)
+            assert set(Path(p).name for p in reqs) == {"a.png", "b.png"}   # 坏卡不入结果
+            assert sorted(parsed) == ["a.png", "b.png", "broken.png"]
+            assert index.cards_dirty
+
+            parsed.clear()
+            index.refresh_cards(cards)
+            assert parsed == ["broken.png"]            # 只有解析失败的卡会重试
+
+            assert index.cards_using("g2") == sorted(os.path.abspath(c) for c in cards[:2])
+            assert index.cards_using("g1") == [os.path.abspath(cards[0])]
+            assert index.unused_guids() == ["g3"]
+            assert index.unused_guids([cards[1]]) == ["g1", "g3"]
+
+            # 改动一张卡：只重解析这一张，反向索引随之更新
+            DEPS["b.png"] = {"g3": 1}
+            (d / "b.png").write_bytes(b"\x89PNG changed, longer")
+            parsed.clear()
+            index.refresh_cards(cards[:2])
+            assert parsed == ["b.png"]
+            assert index.cards_using("g3") == [os.path.abspath(cards[1])]
+            assert index.unused_guids() == []
+        finally:
+            mod_index.read_card_requirements = orig
+            DEPS["b.png"] = {"g2": 1}
+
+
+def test_card_refs_persist_and_survive_rebuild():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        card = d / "a.png"; card.write_bytes(b"\x89PNG fake")
+        index = ModIndex()
+        parsed: list[str] = []
+        assert index.card_requirements(card, parse=_fake_reader(parsed)) == {"g1": 2, "g2": 1}
+
+        cache = d / "mod_index.json"
+        index.save(cache)
+        assert not index.cards_dirty
+        loaded = ModIndex.load(cache)
+        assert loaded.card_requirements(card, parse=_fake_reader(parsed)) == {"g1": 2, "g2": 1}
+        assert parsed == ["a.png"]                     # 读缓存，不再解析
+
+        rebuilt = ModIndex().build([str(d / "mods")], previous=loaded)
+        assert rebuilt.cards_using("g1") == [os.path.abspath(card)]
@@ -0,0 +1,105 @@
+"""卡片目录库增量扫描单测：只重新解析新增/改动的卡，删除的卡从库中移除。"""
+
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import card_scan  # noqa: E402
+
+
+def _make_png(color: tuple[int, int, int]) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _count_parses(monkeypatch) -> list[str]:
+    parsed: list[str] = []
+    orig = card_scan.read_card_light
+
+    def counting(path):
+        parsed.append(Path(path).name)
+        return orig(path)
+
+    monkeypatch.setattr(card_scan, "read_card_light", counting)
+    return parsed
+
+
+def test_rescan_only_parses_changed_files(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        cards = d / "cards"
+        (cards / "sub").mkdir(parents=True)
+        for name in ("a.png", "b.png", "sub/c.png"):
+            (cards / name).write_bytes(_make_png((10, 20, 30)))
+        db = d / "catalog.db"
+        parsed = _count_parses(monkeypatch)
+
+        first = card_scan.scan_dir(cards, recursive=True, catalog_path=db)
+        assert sorted(Path(it.path).name for it in first) == ["a.png", "b.png", "c.png"]
+        assert len(parsed) == 3
+
+        # 改一张、加一张、删一张
+        (cards / "a.png").write_bytes(_make_png((200, 0, 0)) + b"tail")
+        (cards / "new.png").write_bytes(_make_png((0, 200, 0)))
+        (cards / "b.png").unlink()
+        parsed.clear()
+        cached: list = []
+        second = card_scan.scan_dir(cards, recursive=True, catalog_path=db, partial=cached.extend)
+        assert sorted(parsed) == ["a.png", "new.png"]
+        assert [Path(it.path).name for it in cached] == ["c.png"]
+        assert sorted(Path(it.path).name for it in second) == ["a.png", "c.png", "new.png"]
+
+        with card_scan.CardCatalog(db) as catalog:
+            assert sorted(Path(p).name for p in catalog.rows_under(os.path.abspath(cards))) == \
+                ["a.png", "c.png", "new.png"]
+
+
+def test_cached_item_loads_thumbnail_lazily(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        png = _make_png((1, 2, 3))
+        (d / "x.png").write_bytes(png + b"card-tail")
+        db = d / "catalog.db"
+        card_scan.scan_dir(d, catalog_path=db)
+        parsed = _count_parses(monkeypatch)
+
+        (item,) = card_scan.scan_dir(d, catalog_path=db)
+        assert parsed == []
+        assert item.thumbnail == b""
+        assert card_scan.load_thumbnail(item) == png
+
+
+def test_non_recursive_scan_keeps_subdirectory_rows(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "sub").mkdir()
+        (d / "top.png").write_bytes(_make_png((5, 5, 5)))
+        (d / "sub" / "deep.png").write_bytes(_make_png((6, 6, 6)))
+        db = d / "catalog.db"
+        card_scan.scan_dir(d, recursive=True, catalog_path=db)
+        assert len(card_scan.scan_dir(d, catalog_path=db)) == 1
+
+        parsed = _count_parses(monkeypatch)
+        assert len(card_scan.scan_dir(d, recursive=True, catalog_path=db)) == 2
+        assert parsed == []
+
+
+def test_recursive_scan_skips_directory_symlinks():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "sub").mkdir()
+        (d / "sub" / "card.png").write_bytes(_make_png((7, 7, 7)))
+        try:
+            os.symlink(d, d / "sub" / "loop", target_is_directory=True)   # 指回上级，形成环
+        except (OSError, NotImplementedError):
+            print("[SKIP] 无法创建符号链接")
+            return
+        items = card_scan.scan_dir(d, recursive=True, catalog_path=d / "catalog.db")
+        assert [Path(item.path).name for item in items] == ["card.png"]
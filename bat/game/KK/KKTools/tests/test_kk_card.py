@@ -13,9 +13,13 @@ import msgpack
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
+from core import kk_card  # noqa: E402
 from core.kk_card import (  # noqa: E402
     KoikatuCard,
+    _skip_msgpack,
+    batch_update_parameter,
     is_character_card,
+    msgpack_map_spans,
     png_data_length,
     write_cs_string,
 )
@@ -154,6 +158,79 @@ def test_rejects_non_card():
     assert not is_character_card(_make_png((0, 0, 0), (4, 4)))  # 纯 PNG 不是卡片
 
 
+def test_skip_msgpack_matches_packed_lengths():
+    samples = [
+        0, -1, 127, -33, 255, 65536, -(2 ** 40), 2 ** 63, 1.5, None, True,
+        "", "x" * 31, "长" * 40, "y" * 70000, b"\x00" * 300, [], list(range(20)),
+        {"a": {"b": [1, {"c": b"zz"}]}}, {i: i for i in range(20)}, [[[[[]]]]] * 3,
+        msgpack.ExtType(5, b"abcd"), msgpack.ExtType(1, b"q" * 300),
+    ]
+    blob = b"".join(msgpack.packb(o, use_bin_type=True) for o in samples)
+    pos = 0
+    for o in samples:
+        end = _skip_msgpack(blob, pos)
+        assert end - pos == len(msgpack.packb(o, use_bin_type=True)), o
+        pos = end
+    assert pos == len(blob)
+
+
+def test_map_spans_and_float32_preserved():
+    raw = b"\x83" + msgpack.packb("voiceRate") + b"\xca" + struct.pack(">f", 0.71) \
+        + msgpack.packb("nickname") + msgpack.packb("旧名") + msgpack.packb("tags") + msgpack.packb([1, 2])
+    spans = msgpack_map_spans(raw)
+    assert [e[0] for e in spans.entries] == ["voiceRate", "nickname", "tags"]
+    assert spans.entries[-1][3] == len(raw)
+
+    patched = kk_card.patch_msgpack_map(raw, {"nickname": "新名", "voiceRate": msgpack.unpackb(raw)["voiceRate"]})
+    assert patched.startswith(raw[:spans.entries[1][2]])      # 未改的 float32 一个字节不动
+    assert msgpack.unpackb(patched)["nickname"] == "新名"
+    assert kk_card.patch_msgpack_map(raw, {"tags": [1, 2]}) == raw
+
+
+def test_batch_update_parameter(tmp_path):
+    raw, _ = _build_synthetic_card()
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"c{i}.png")
+        paths[-1].write_bytes(raw)
+    (tmp_path / "bad.png").write_bytes(b"not a card")
+    paths.append(tmp_path / "bad.png")
+
+    out = tmp_path / "out"
+    results = batch_update_parameter(paths, {"nickname": "批量", "ghost": 1}, out_dir=out, workers=0)
+    assert [r[1] for r in results] == ["ok", "ok", "ok", "error"]
+    assert KoikatuCard.load(out / "c1.png").parameter["nickname"] == "批量"
+    assert paths[0].read_bytes() == raw                          # 另存模式不动原卡
+
+    results = batch_update_parameter(paths[:3], {"nickname": "天の女神"}, workers=0)
+    assert {r[1] for r in results} == {"unchanged"}
+    assert not list(tmp_path.glob("*.bak"))
+
+    old = kk_card.BATCH_PROCESS_THRESHOLD
+    kk_card.BATCH_PROCESS_THRESHOLD = 1                           # 强制走进程池
+    try:
+        results = batch_update_parameter(paths[:3], {"firstname": "Rin"}, workers=2)
+    finally:
+        kk_card.BATCH_PROCESS_THRESHOLD = old
+    assert [r[1] for r in results] == ["ok"] * 3
+    assert KoikatuCard.load(paths[2]).parameter["firstname"] == "Rin"
+    assert (tmp_path / "c2.png.bak").exists()
+
+
+def test_batch_update_parameter_isolates_unexpected_errors(tmp_path):
+    raw, _ = _build_synthetic_card()
+    nick = "天の女神".encode("utf-8")
+    bad = tmp_path / "bad.png"
+    bad.write_bytes(raw.replace(nick, b"\xff" * len(nick)))   # nickname 不是合法 UTF-8
+    good = tmp_path / "good.png"
+    good.write_bytes(raw)
+
+    results = batch_update_parameter([bad, good], {"nickname": "新名"}, workers=0)
+    assert [r[1] for r in results] == ["error", "ok"]
+    assert "UnicodeDecodeError" in results[0][2]
+    assert KoikatuCard.load(good).parameter["nickname"] == "新名"
+
+
 if __name__ == "__main__":
     import traceback
 
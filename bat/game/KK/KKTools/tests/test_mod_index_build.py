@@ -0,0 +1,76 @@
+"""Mod 索引冷建单测：manifest 快速读取路径与 zipfile 结果一致，线程/进程两种模式结果一致。"""
+
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.mod_index import ModIndex, read_manifest, read_manifest_fast  # noqa: E402
+
+
+def _manifest(guid: str) -> str:
+    return (f'<?xml version="1.0"?><manifest><guid>{guid}</guid><name>名字 {guid}</name>'
+            f'<version>1.0</version><author>作者</author></manifest>')
+
+
+def _make_mods(d: Path) -> dict[str, str | None]:
+    """造各种形态的 zipmod，返回 {文件名: 期望 guid}。"""
+    expect: dict[str, str | None] = {}
+
+    def write(name, guid, *, compression=zipfile.ZIP_DEFLATED, prefix=b"", comment=b"",
+              manifest_name="manifest.xml", fillers=3):
+        path = d / name
+        tmp = d / (name + ".tmp")
+        with zipfile.ZipFile(tmp, "w", compression) as zf:
+            for i in range(fillers):
+                zf.writestr(f"abdata/list/{i}/manifest.xml.txt", "x" * 200)
+            if guid is not None:
+                zf.writestr(manifest_name, _manifest(guid))
+            zf.comment = comment
+        path.write_bytes(prefix + tmp.read_bytes())
+        tmp.unlink()
+        expect[name] = guid if manifest_name == "manifest.xml" else None
+
+    write("deflated.zipmod", "g.deflated")
+    write("stored.zipmod", "g.stored", compression=zipfile.ZIP_STORED)
+    write("comment.zipmod", "g.comment", comment=b"PK\x05\x06 fake marker in comment")
+    write("carrier.zip", "g.carrier", prefix=b"\x89PNG carrier bytes" * 100)  # 伪装包：前面拼了载体
+    write("nested.zipmod", "g.nested", manifest_name="sub/manifest.xml")      # 不在根目录
+    write("none.zipmod", None)
+    (d / "broken.zipmod").write_bytes(b"not a zip at all")
+    expect["broken.zipmod"] = None
+    return expect
+
+
+def test_fast_reader_matches_zipfile():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        expect = _make_mods(d)
+        for name, guid in expect.items():
+            slow = read_manifest(d / name)
+            fast = read_manifest_fast(d / name)
+            assert (fast.guid if fast else None) == guid, name
+            # 注释里带假结束记录签名时 zipfile 会读失败，快速路径仍能读出
+            if slow is not None:
+                assert fast == slow, name
+
+
+def test_thread_and_process_builds_agree():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        expect = _make_mods(d)
+        threaded = ModIndex().build([str(d)], mode="thread")
+        pooled = ModIndex().build([str(d)], mode="process", processes=2)
+        assert threaded.entries == pooled.entries
+        assert threaded.files == pooled.files
+        assert sorted(threaded.entries) == sorted(g for g in expect.values() if g)
+        assert pooled.build_stats["mode"] == "process"
+        assert pooled.build_stats["files"] == len(expect)
+        assert pooled.build_stats["files_per_sec"] > 0
+
+        # 增量：未变动文件不再读取
+        again = ModIndex().build([str(d)], previous=pooled)
+        assert again.build_stats["files"] == 0
+        assert again.entries == pooled.entries
@@ -0,0 +1,71 @@
+"""Mod 索引二进制缓存单测：往返一致、懒加载条目、旧版 JSON 迁移、损坏回退。"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.mod_index import ModEntry, ModIndex  # noqa: E402
+
+
+def _sample_index() -> ModIndex:
+    idx = ModIndex()
+    idx.entries["com.a"] = ModEntry("com.a", "名字A", "1.0", "作者", r"D:\mods\Sideloader Modpack\a.zipmod")
+    idx.entries["com.b"] = ModEntry("com.b", "", "", "", "/mods//odd/b.zipmod")
+    idx.entries["com.c"] = ModEntry("com.c", "c")                      # 无路径
+    idx.files[r"D:\mods\Sideloader Modpack\a.zipmod"] = (1700000000, 1234, "com.a")
+    idx.files["/mods//odd/b.zipmod"] = (1700000001, 99, "com.b")
+    idx.files["bad.zipmod"] = (5, 6, None)                            # 负缓存，无目录
+    idx.cards["/cards/x.png"] = (123456789012345678, 42, {"com.a": 2})
+    return idx
+
+
+def test_binary_roundtrip_is_lazy_and_exact():
+    with tempfile.TemporaryDirectory() as d:
+        cache = Path(d) / "mod_index.idx"
+        src = _sample_index()
+        src.save(cache)
+        assert not (Path(d) / "mod_index.idx.tmp").exists()
+
+        loaded = ModIndex.load(cache)
+        assert loaded.files == src.files
+        assert loaded.cards == src.cards
+        assert len(loaded.entries) == 3 and "com.b" in loaded.entries
+        assert loaded.entries._made == {}                 # 还没访问，不生成 ModEntry
+        assert loaded.get("com.a") == src.entries["com.a"]
+        assert list(loaded.entries._made) == ["com.a"]
+        assert loaded.entries == src.entries
+        assert sorted(loaded.entries) == ["com.a", "com.b", "com.c"]
+
+        # 载入后修改再保存：新增/删除条目都能写回
+        loaded.entries["com.d"] = ModEntry("com.d", path="/m/d.zipmod")
+        del loaded.entries["com.c"]
+        loaded.save(cache)
+        again = ModIndex.load(cache)
+        assert sorted(again.entries) == ["com.a", "com.b", "com.d"]
+        assert again.get("com.d").path == "/m/d.zipmod"
+
+
+def test_legacy_json_is_migrated():
+    with tempfile.TemporaryDirectory() as d:
+        src = _sample_index()
+        src.save(Path(d) / "mod_index.json", fmt="json")
+        # 新路径不存在时读同名旧版 JSON
+        loaded = ModIndex.load(Path(d) / "mod_index.idx")
+        assert loaded.entries == src.entries
+        assert loaded.files == src.files
+        assert loaded.cards == src.cards
+
+
+def test_empty_and_corrupt_cache():
+    with tempfile.TemporaryDirectory() as d:
+        cache = Path(d) / "mod_index.idx"
+        ModIndex().save(cache)
+        empty = ModIndex.load(cache)
+        assert empty.count == 0 and empty.files == {} and empty.cards == {}
+
+        _sample_index().save(cache)
+        data = cache.read_bytes()
+        cache.write_bytes(data[:-10])                     # 截断
+        assert ModIndex.load(cache).count == 0
@@ -0,0 +1,86 @@
+"""场景卡扫描单测：手工拼场景字节，验证一遍扫描 + 懒解析与整块解析结果一致、批量分析跳过角色卡。"""
+
+import io
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import scene_card  # noqa: E402
+from core.kk_card import write_cs_string  # noqa: E402
+
+UAR = "com.bepis.sideloader.universalautoresolver"
+
+
+def _make_png(color: tuple[int, int, int]) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (6, 6), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _uar(*guids: str) -> list:
+    return [1, {"info": [msgpack.packb({"ModID": g}, use_bin_type=True) for g in guids]}]
+
+
+def _chara(marker: str, name: str, guids: tuple[str, ...]) -> bytes:
+    """内嵌角色：productNo + marker + version + 脸图 + lstInfo + data（无前导缩略图）。"""
+    blocks = {
+        "Custom": msgpack.packb({"blob": b"\x00" * 500}, use_bin_type=True),
+        "Parameter": msgpack.packb({"lastname": "", "firstname": name, "nickname": ""}, use_bin_type=True),
+        "KKEx": msgpack.packb({UAR: _uar(*guids)}, use_bin_type=True),
+    }
+    data, lst, pos = b"", [], 0
+    for n, raw in blocks.items():
+        lst.append({"name": n, "version": "0.0.0", "pos": pos, "size": len(raw)})
+        data += raw
+        pos += len(raw)
+    lst_raw = msgpack.packb({"lstInfo": lst}, use_bin_type=True)
+    face = _make_png((9, 9, 9))
+    return (struct.pack("<i", 100) + write_cs_string(marker) + write_cs_string("0.0.0")
+            + struct.pack("<i", len(face)) + face + struct.pack("<i", len(lst_raw)) + lst_raw
+            + struct.pack("<q", len(data)) + data)
+
+
+def _make_scene() -> bytes:
+    return (_make_png((1, 2, 3)) + struct.pack("<i", 100) + write_cs_string("【KStudio】")
+            + b"junk" + "【KoiKatuChara".encode() + b" but not a header"
+            + _chara("【KoiKatuChara】", "Aki", ("g.a", "g.b"))
+            + b"\x00" * 100
+            + _chara("【KoiKatuCharaSun】", "Natsu", ("g.b",))
+            + b"scene-ext" + UAR.encode() + msgpack.packb(_uar("g.prop"), use_bin_type=True))
+
+
+def test_single_pass_scan_finds_all_variants_in_order():
+    data = _make_scene()
+    charas = list(scene_card.iter_embedded_characters(data))
+    assert [(c.name, c.game) for c in charas] == [("Aki", "KK"), ("Natsu", "KKS")]
+    assert charas[0].mod_ids() == {"g.a": 1, "g.b": 1}
+
+    cards = scene_card.find_embedded_characters(data)
+    assert [c.parameter["firstname"] for c in cards] == ["Aki", "Natsu"]
+    assert cards[1].face == cards[1].thumbnail and cards[1].face[:4] == b"\x89PNG"
+
+
+def test_analyze_scene_and_folder_skip_character_cards():
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        (d / "sub").mkdir()
+        (d / "sub" / "scene.png").write_bytes(_make_scene())
+        (d / "plain.png").write_bytes(_make_png((5, 5, 5)))
+        (d / "chara.png").write_bytes(_make_png((4, 4, 4)) + _chara("【KoiKatuChara】", "Solo", ("g.z",)))
+        (d / "empty.png").write_bytes(b"")
+
+        info = scene_card.analyze_scene(d / "sub" / "scene.png")
+        assert info["character_count"] == 2
+        assert info["mod_ids"] == {"g.a": 1, "g.b": 2, "g.prop": 1}
+        assert info["scene_mod_count"] == 1
+
+        results = scene_card.analyze_folder(d, workers=0)
+        assert [Path(r["path"]).name for r in results] == ["scene.png"]
+        assert results[0]["mod_ids"] == info["mod_ids"]
@@ -0,0 +1,68 @@
+"""分享包内容寻址去重 / 增量生成单测（monkeypatch 读卡依赖，专测放置逻辑）。"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import share  # noqa: E402
+from core.mod_index import ModEntry, ModIndex  # noqa: E402
+
+DEPS = {"a.png": {"g1": 1, "g2": 1}, "b.png": {"g1": 1}}
+
+
+def _setup(d: Path, monkeypatch) -> tuple[list[str], ModIndex]:
+    cards = []
+    for name in DEPS:
+        (d / name).write_bytes(b"\x89PNG fake " + name.encode())
+        cards.append(str(d / name))
+    index = ModIndex()
+    for g, size in (("g1", 300_000), ("g2", 1000)):
+        mod = d / "lib" / f"{g}.zipmod"
+        mod.parent.mkdir(exist_ok=True)
+        mod.write_bytes(os.urandom(size))
+        index.entries[g] = ModEntry(guid=g, path=str(mod))
+    monkeypatch.setattr(share, "_required_mods", lambda p: dict(DEPS[Path(p).name]))
+    return cards, index
+
+
+def test_shared_mod_stored_once_and_rebuild_is_incremental(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        cards, index = _setup(d, monkeypatch)
+        out = d / "pkg"
+        report = share.build_share_package(cards, index, out, group_by_char=True)
+        a_g1, b_g1 = out / "a" / "mods" / "g1.zipmod", out / "b" / "mods" / "g1.zipmod"
+        assert a_g1.read_bytes() == b_g1.read_bytes() == Path(index.get("g1").path).read_bytes()
+        assert report["bytes_total"] == 601_000
+        assert report["bytes_copied"] + report["bytes_linked"] == 601_000
+        assert report["bytes_saved"] == report["bytes_linked"] >= 300_000     # 第二份 g1 不写实体
+        if report["link_modes"]["hardlink"]:
+            assert os.stat(a_g1).st_ino == os.stat(b_g1).st_ino
+
+        # 原样重跑：什么都不写
+        again = share.build_share_package(cards, index, out, group_by_char=True)
+        assert again["bytes_copied"] == again["bytes_linked"] == 0
+        assert again["bytes_reused"] == 601_000
+
+        # 库里的 g2 更新了：只换 g2
+        Path(index.get("g2").path).write_bytes(b"new version" * 10)
+        third = share.build_share_package(cards, index, out, group_by_char=True)
+        assert third["bytes_copied"] + third["bytes_linked"] == 110
+        assert (out / "a" / "mods" / "g2.zipmod").read_bytes() == b"new version" * 10
+        assert "节省" in (out / "README.txt").read_text(encoding="utf-8")
+
+
+def test_foreign_file_in_package_is_not_overwritten(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        cards, index = _setup(d, monkeypatch)
+        out = d / "pkg"
+        (out / "mods").mkdir(parents=True)
+        (out / "mods" / "g1.zipmod").write_bytes(b"user's own copy")
+        share.build_share_package(cards, index, out, group_by_char=False)
+        assert (out / "mods" / "g1.zipmod").read_bytes() == b"user's own copy"
+        assert (out / "mods" / "g2.zipmod").exists()
+        assert (out / "cards" / "a.png").exists()
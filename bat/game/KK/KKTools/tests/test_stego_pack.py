@@ -0,0 +1,86 @@
+"""并行打包单测：分块并行 deflate 拼出的 zip 与逐个压缩的结果内容一致，已压缩格式直接存储。"""
+
+import os
+import random
+import sys
+import tempfile
+import zipfile
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import stego  # noqa: E402
+
+
+def _make_tree(root: Path) -> dict[str, bytes]:
+    rng = random.Random(3)
+    words = [bytes(rng.choices(b"abcdefgh", k=rng.randint(2, 8))) for _ in range(200)]
+    files = {
+        "big.txt": b" ".join(rng.choice(words) for _ in range(120_000)),
+        "sub/card.png": os.urandom(50_000),
+        "sub/empty.txt": b"",
+        "a.txt": "hello 恋活".encode("utf-8"),
+    }
+    for name, data in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_bytes(data)
+    return files
+
+
+def test_crc32_combine_matches_zlib():
+    a, b = os.urandom(1000), os.urandom(777)
+    assert stego.crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b)) == zlib.crc32(a + b)
+    assert stego.crc32_combine(zlib.crc32(a), zlib.crc32(b""), 0) == zlib.crc32(a)
+
+
+def test_parallel_blocks_roundtrip(monkeypatch):
+    monkeypatch.setattr(stego, "DEFLATE_BLOCK", 64 * 1024)       # big.txt 切成十几块
+    monkeypatch.setattr(stego, "PARALLEL_PACK_THRESHOLD", 0)
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        files = _make_tree(d / "src")
+        out = d / "out.zip"
+        stego.pack_folder(d / "src", out, workers=2)
+        with zipfile.ZipFile(out) as zf:
+            assert zf.testzip() is None
+            assert {n: zf.read(n) for n in zf.namelist()} == files
+            types = {i.filename: i.compress_type for i in zf.infolist()}
+        assert types["big.txt"] == zipfile.ZIP_DEFLATED
+        assert types["sub/card.png"] == zipfile.ZIP_STORED            # 已压缩格式不再 deflate
+        # 分块压缩率应与整条流相当（预设字典保住了块间的重复）
+        whole = len(zlib.compress(files["big.txt"]))
+        with zipfile.ZipFile(out) as zf:
+            assert zf.getinfo("big.txt").compress_size < whole * 1.02
+
+
+def test_encrypted_pack_uses_prepared_blocks(monkeypatch):
+    if not stego.HAVE_PYZIPPER:
+        print("[SKIP] pyzipper 未安装")
+        return
+    import pyzipper
+
+    monkeypatch.setattr(stego, "DEFLATE_BLOCK", 64 * 1024)
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        files = _make_tree(d / "src")
+        out = d / "enc.zip"
+        stego.pack_folder(d / "src", out, password="pw", workers=0)
+        with pyzipper.AESZipFile(out) as zf:
+            zf.setpassword(b"pw")
+            assert zf.read("big.txt") == files["big.txt"]
+            assert zf.testzip() is None
+
+
+def test_pack_falls_back_without_writer_internals(monkeypatch):
+    # 模拟 zipfile 写入句柄的私有属性改名：退回普通写入，内容与 CRC 仍然正确
+    monkeypatch.setattr(stego, "DEFLATE_BLOCK", 64 * 1024)
+    monkeypatch.setattr(stego, "_WRITER_INTERNALS", ("_no_such_attr",))
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        files = _make_tree(d / "src")
+        out = d / "out.zip"
+        stego.pack_folder(d / "src", out, workers=0)
+        with zipfile.ZipFile(out) as zf:
+            assert zf.testzip() is None
+            assert {n: zf.read(n) for n in zf.namelist()} == files
@@ -177,11 +177,13 @@ class BrowserPage(PageBase):
         self.progress.setVisible(True)
         self.progress.setRange(0, 0)
         self.status.setText("扫描中…")
+        self._icon_cache.clear()   # 新一轮扫描，旧图标缓存作废（缓存结果与最终结果同批，可沿用）
         log(f"开始扫描目录: {directory} (递归={self.chk_recursive.isChecked()})")
         self._worker = Worker(
             card_scan.scan_dir, directory, recursive=self.chk_recursive.isChecked()
         )
         self._worker.progress.connect(self._on_progress)
+        self._worker.partial.connect(self._on_cached)
         self._worker.finished_ok.connect(self._on_scanned)
         self._worker.failed.connect(self._on_failed)
         self._worker.start()
@@ -192,14 +194,22 @@ class BrowserPage(PageBase):
             self.progress.setValue(cur)
         self.status.setText(f"扫描中… {cur}/{total}  {desc}")
 
+    def _on_cached(self, items: list[CardItem]) -> None:
+        """目录库里未变化的卡先展示出来，增量扫描在后台继续。"""
+        log(f"从卡片目录库载入 {len(items)} 张未变化的卡片，继续检查新增/改动…")
+        self._show_items(items)
+        self.status.setText(f"已载入缓存 {len(items)} 张，增量扫描中…")
+
     def _on_scanned(self, items: list[CardItem]) -> None:
         self.progress.setVisible(False)
+        log(f"扫描完成，共 {len(items)} 张卡片")
+        self._show_items(items)
+
+    def _show_items(self, items: list[CardItem]) -> None:
         self._items = items
-        self._icon_cache.clear()   # 新一批卡片，旧图标缓存作废
         self._root_dir = self.path_edit.text().strip()
         self._folder_filter = None
         self.btn_csv.setEnabled(bool(items))
-        log(f"扫描完成，共 {len(items)} 张卡片")
         self._update_stats()
         self._rebuild_tree()
         self._apply_filter()
@@ -310,8 +320,9 @@ class BrowserPage(PageBase):
         icon = self._icon_cache.get(it.path)
         if icon is None:
             pix = QPixmap()
-            if it.thumbnail:
-                pix.loadFromData(it.thumbnail)
+            thumb = card_scan.load_thumbnail(it)
+            if thumb:
+                pix.loadFromData(thumb)
             if not pix.isNull():
                 pix = pix.scaled(self.grid.iconSize(), Qt.AspectRatioMode.KeepAspectRatio,
                                  Qt.TransformationMode.SmoothTransformation)
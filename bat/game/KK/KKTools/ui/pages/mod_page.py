@@ -27,7 +27,8 @@ from ui.applog import log
 from ui.widgets import PageBase, hint, make_card, section_title
 from ui.worker import Worker
 
-_INDEX_CACHE = Path(__file__).resolve().parent.parent.parent / "mod_index.json"
+# 二进制索引缓存；旧版 mod_index.json 会在加载时自动读取，下次保存即迁移
+_INDEX_CACHE = Path(__file__).resolve().parent.parent.parent / "mod_index.idx"
 
 
 class _CardDropList(QListWidget):
@@ -175,6 +176,11 @@ class ModPage(PageBase):
         self.progress.setVisible(False)
         self._refresh_index_status()
         log(f"Mod 索引完成：{idx.count} 个")
+        st = idx.build_stats
+        if st.get("files"):
+            log(f"读取 manifest {st['files']} 个（{'进程池' if st['mode'] == 'process' else '线程池'}）："
+                f"{st['seconds']:.1f}s，{st['files_per_sec']:.0f} 个/秒；"
+                f"累计磁盘 {st['disk_s']:.1f}s / 解析 {st['cpu_s']:.1f}s")
         QMessageBox.information(self, "完成", f"索引建立完成，共 {idx.count} 个 mod。")
 
     # ---- 检查 ----
@@ -197,14 +203,13 @@ class ModPage(PageBase):
 
         def job(progress=None):
             lines, missing, present = [], {}, set()
-            total = len(files)
-            for i, f in enumerate(files, 1):
+            # 先批量更新卡片依赖（未变动的卡直接取缓存，其余并行解析），再逐卡出报告
+            index.refresh_cards(files, progress=progress)
+            for f in files:
                 try:
                     rep = mod_index.check_card(f, index)
                 except Exception as exc:  # noqa: BLE001
                     lines.append(f"[X] {Path(f).name}: {exc}")
-                    if progress:
-                        progress(i, total, Path(f).name)
                     continue
                 present.update(rep.present)
                 lines.append(
@@ -213,8 +218,8 @@ class ModPage(PageBase):
                 if rep.missing:
                     missing[f] = rep.missing
                     lines.extend(f"      - {g}" for g in rep.missing)
-                if progress:
-                    progress(i, total, Path(f).name)
+            if index.cards_dirty:
+                index.save(_INDEX_CACHE)   # 卡片依赖写回缓存，下次检查/归档直接复用
             return lines, missing, sorted(present)
 
         self.progress.setVisible(True); self.progress.setRange(0, len(files))
@@ -258,14 +263,15 @@ class ModPage(PageBase):
     def _clear_index(self) -> None:
         ret = QMessageBox.question(
             self, "清空索引数据",
-            "确定清空索引（含缓存文件 mod_index.json）？卡片检查将需要重新建立索引。",
+            f"确定清空索引（含缓存文件 {_INDEX_CACHE.name}）？卡片检查将需要重新建立索引。",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if ret != QMessageBox.StandardButton.Yes:
             return
         self.index = mod_index.ModIndex()
         try:
-            if _INDEX_CACHE.exists():
-                _INDEX_CACHE.unlink()
+            for cache in (_INDEX_CACHE, _INDEX_CACHE.with_suffix(".json")):
+                if cache.exists():
+                    cache.unlink()
         except OSError:
             pass
         self._refresh_index_status()
@@ -351,7 +357,10 @@ class ModPage(PageBase):
         idx = self.index
 
         def job(progress=None):
-            return mod_index.archive_unreferenced(idx, cards, archive, move=move, progress=progress)
+            res = mod_index.archive_unreferenced(idx, cards, archive, move=move, progress=progress)
+            if idx.cards_dirty:
+                idx.save(_INDEX_CACHE)
+            return res
 
         def done(res):
             self.progress.setVisible(False)
@@ -18,8 +18,9 @@ from PyQt6.QtWidgets import (
 )
 
 from core import scene_card
-from core.scene_card import get_scene_preview
+from core.scene_card import get_scene_preview, open_scene_bytes
 from ui.applog import log
+from ui.worker import Worker
 from ui.widgets import PageBase, hint, make_card, section_title
 
 
@@ -27,6 +28,7 @@ class ScenePage(PageBase):
     def __init__(self):
         super().__init__("场景卡工具", "从 Studio 场景卡提取内嵌角色（带封面），分析依赖")
         self._scene_path: str | None = None
+        self._worker: Worker | None = None
         self._build_ui()
 
     def _build_ui(self) -> None:
@@ -35,7 +37,9 @@ class ScenePage(PageBase):
         b_pick.clicked.connect(self._pick)
         self.path_label = QLabel("未选择")
         self.path_label.setObjectName("HintLabel")
-        bar.addWidget(b_pick); bar.addWidget(self.path_label, 1)
+        self.b_batch = QPushButton("批量分析文件夹")
+        self.b_batch.clicked.connect(self._analyze_folder)
+        bar.addWidget(b_pick); bar.addWidget(self.path_label, 1); bar.addWidget(self.b_batch)
         self.body_layout.addLayout(bar)
 
         body = QHBoxLayout(); body.setSpacing(14)
@@ -69,8 +73,8 @@ class ScenePage(PageBase):
         self._scene_path = path
         self.path_label.setText(path)
         self.b_analyze.setEnabled(True); self.b_extract.setEnabled(True)
-        data = Path(path).read_bytes()
-        prev = get_scene_preview(data)
+        with open_scene_bytes(path) as data:
+            prev = get_scene_preview(data)
         if prev:
             pix = QPixmap(); pix.loadFromData(prev)
             self.preview.setPixmap(pix.scaled(self.preview.size(), Qt.AspectRatioMode.KeepAspectRatio,
@@ -119,3 +123,44 @@ class ScenePage(PageBase):
                                     f"已提取 {len(saved)} 个角色到:\n{out}")
         else:
             QMessageBox.information(self, "无角色", "未在该场景卡中找到可提取的内嵌角色。")
+
+    def _analyze_folder(self) -> None:
+        if self._worker and self._worker.isRunning():
+            QMessageBox.information(self, "请稍候", "已有任务进行中。"); return
+        folder = QFileDialog.getExistingDirectory(self, "选择场景卡文件夹")
+        if not folder:
+            return
+        self.b_batch.setEnabled(False)
+        self.analysis.setPlainText(f"正在批量分析: {folder}")
+        self._worker = Worker(scene_card.analyze_folder, folder)
+        self._worker.progress.connect(lambda c, t, d: self.path_label.setText(f"批量分析 {c}/{t}  {d}"))
+        self._worker.finished_ok.connect(lambda res: self._on_folder_done(folder, res))
+        self._worker.failed.connect(self._on_folder_failed)
+        self._worker.start()
+
+    def _on_folder_done(self, folder: str, results: list) -> None:
+        self.b_batch.setEnabled(True)
+        self.path_label.setText(self._scene_path or "未选择")
+        ok = [r for r in results if "error" not in r]
+        bad = [r for r in results if "error" in r]
+        total_mods: dict[str, int] = {}
+        for r in ok:
+            for g, n in r["mod_ids"].items():
+                total_mods[g] = total_mods.get(g, 0) + n
+        lines = [
+            f"文件夹: {folder}",
+            f"场景卡: {len(ok)} 张（解析失败 {len(bad)} 张），内嵌角色共 {sum(r['character_count'] for r in ok)} 个",
+            f"聚合 mod 依赖数: {len(total_mods)}",
+            "",
+        ]
+        for r in ok:
+            lines.append(f"  {Path(r['path']).name}  角色 {r['character_count']} 个  依赖 mod {len(r['mod_ids'])} 个")
+        for r in bad:
+            lines.append(f"  [失败] {Path(r['path']).name}: {r['error']}")
+        self.analysis.setPlainText("\n".join(lines))
+        log(f"批量分析场景卡 {len(ok)} 张: {folder}")
+
+    def _on_folder_failed(self, err: str) -> None:
+        self.b_batch.setEnabled(True)
+        self.path_label.setText(self._scene_path or "未选择")
+        QMessageBox.critical(self, "批量分析失败", err.splitlines()[0] if err else "未知错误")
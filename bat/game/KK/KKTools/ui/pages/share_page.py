@@ -27,7 +27,8 @@ from ui.applog import log
 from ui.widgets import PageBase, hint, make_card, section_title
 from ui.worker import Worker
 
-_INDEX_CACHE = Path(__file__).resolve().parent.parent.parent / "mod_index.json"
+# 二进制索引缓存；旧版 mod_index.json 会在加载时自动读取，下次保存即迁移
+_INDEX_CACHE = Path(__file__).resolve().parent.parent.parent / "mod_index.idx"
 
 
 class _CardDropList(QListWidget):
@@ -159,9 +160,12 @@ class SharePage(PageBase):
                 QMessageBox.warning(self, "参考清单为空", "参考清单里没有解析到任何 GUID。"); return
 
         def job(progress=None):
-            return share.build_share_package(
+            report = share.build_share_package(
                 files, index, out, group_by_char=group,
                 exclude_guids=exclude_guids, progress=progress)
+            if index.cards_dirty:
+                index.save(_INDEX_CACHE)
+            return report
 
         self._run(job, self._on_built)
 
@@ -172,6 +176,13 @@ class SharePage(PageBase):
                  f"总缺失 mod: {len(report['total_missing'])}"]
         if report.get("excluded_mods"):
             lines.append(f"按参考清单排除 mod 种类: {len(report['excluded_mods'])}")
+        if report.get("bytes_total"):
+            mb = 1024 * 1024
+            modes = report.get("link_modes", {})
+            lines.append(
+                f"mod 共 {report['bytes_total'] / mb:.1f} MB，实际写入 {report['bytes_copied'] / mb:.1f} MB，"
+                f"节省 {report['bytes_saved'] / mb:.1f} MB（硬链接 {modes.get('hardlink', 0)} / "
+                f"reflink {modes.get('reflink', 0)} / 复制 {modes.get('copy', 0)}）")
         lines.append("")
         for c in report["cards"]:
             lines.append(f"[{c['name']}] 依赖{c['required']} 含{c['copied']} 缺{len(c['missing'])}")
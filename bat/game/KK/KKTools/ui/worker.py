@@ -11,10 +11,12 @@ class Worker(QThread):
     """运行一个返回值的可调用对象；通过信号回报进度/结果/异常。
 
     传入的 fn 可接受一个可选的 progress 回调（若签名里含 'progress' 形参，
-    会自动注入，用于发射 progress 信号）。
+    会自动注入，用于发射 progress 信号）；同理 'partial' 形参会注入发射
+    partial 信号的回调，用于在最终结果前先交出一部分结果（如缓存命中）。
     """
 
     progress = pyqtSignal(int, int, str)   # (当前, 总数, 描述)
+    partial = pyqtSignal(object)           # 阶段性结果
     finished_ok = pyqtSignal(object)       # 结果
     failed = pyqtSignal(str)               # 错误信息
 
@@ -36,6 +38,8 @@ class Worker(QThread):
                 params = inspect.signature(self._fn).parameters
                 if "progress" in params and "progress" not in kwargs:
                     kwargs["progress"] = self._emit_progress
+                if "partial" in params and "partial" not in kwargs:
+                    kwargs["partial"] = self.partial.emit
             except (ValueError, TypeError):
                 pass
             result = self._fn(*self._args, **kwargs)
@@ -0,0 +1,133 @@
+"""
+真实分辨率分析 —— 抽取若干帧，按高频能量缺失估计画面的有效分辨率。
+
+自然画面行/列方向的功率谱近似幂律衰减。放大得来的视频（如 1080p 拉伸成 4K）在原始分辨率
+对应的截止频率之外能量被插值滤波大幅削弱：用低频段拟合出幂律，再看实际频谱从哪个频率开始
+持续低于拟合值一定倍数，该频率占奈奎斯特频率的比例 × 标称分辨率即为有效分辨率。
+
+分析函数在进程池中运行（解码和 FFT 都吃 CPU），每个文件有时间预算，超时用已取到的帧出结果。
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+# 算法或参数变化时递增，缓存中旧版本的结果自动作废
+ANALYSIS_VERSION = 1
+
+SAMPLE_FRAMES = 5            # 每个视频抽取的帧数（均匀分布在 10%~90% 之间）
+ANALYZE_BUDGET_SEC = 15.0    # 单个文件的时间预算
+ANALYZE_WORKERS = min(61, os.cpu_count() or 4)  # Windows 进程池上限 61
+
+# 拟合幂律用的低频段（占奈奎斯特频率的比例），低于常见放大倍数的截止频率
+FIT_BAND = (0.04, 0.18)
+# 实际功率低于拟合值的对数差阈值（自然对数，约 7 倍），从此处起持续低于即视为截止
+DEFICIT_THRESHOLD = 2.0
+# 频谱统一插值到的网格点数（0~1 对应 0~奈奎斯特频率）
+SPECTRUM_BINS = 512
+# 每隔多少行/列取一条做 FFT
+LINE_STEP = 4
+# 亮度标准差低于此值的帧（黑场、纯色转场）不参与分析
+MIN_FRAME_STD = 4.0
+
+
+def init_worker():
+    """进程池初始化：每个进程只用单线程，避免 OpenCV 线程数 × 进程数过度抢占。"""
+    cv2.setNumThreads(1)
+
+
+def analyze_video(path, budget=ANALYZE_BUDGET_SEC, samples=SAMPLE_FRAMES):
+    """返回 {"width", "height", "ratio", "frames", "partial"}；无法解码时返回 None。
+
+    width/height 为估计的有效分辨率（未发现高频缺失时等于标称分辨率），ratio 为两者之比，
+    frames 为实际参与分析的帧数，partial 表示因超时少取了帧。
+    """
+    deadline = time.monotonic() + budget
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            return None
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if width <= 0 or height <= 0:
+            return None
+
+        spectra = []
+        partial = False
+        for i in range(samples):
+            if time.monotonic() > deadline:
+                partial = True
+                break
+            if total > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(total * (0.1 + 0.8 * i / max(samples - 1, 1))))
+            ok, frame = cap.read()
+            if not ok:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            spectrum = frame_spectrum(gray)
+            if spectrum is not None:
+                spectra.append(spectrum)
+    finally:
+        cap.release()
+
+    if not spectra:
+        return {"width": width, "height": height, "ratio": 1.0, "frames": 0, "partial": partial}
+    ratio = estimate_cutoff(np.mean(spectra, axis=0))
+    return {
+        "width": round(width * ratio),
+        "height": round(height * ratio),
+        "ratio": round(ratio, 3),
+        "frames": len(spectra),
+        "partial": partial,
+    }
+
+
+def frame_spectrum(gray):
+    """单帧的平均对数功率谱（行、列两个方向取平均），黑场等无效帧返回 None。"""
+    gray = _trim_borders(gray)
+    if gray.shape[0] < 64 or gray.shape[1] < 64 or gray.std() < MIN_FRAME_STD:
+        return None
+    gray = gray.astype(np.float32)
+    rows = _line_spectrum(gray[::LINE_STEP, :])
+    cols = _line_spectrum(gray[:, ::LINE_STEP].T)
+    return (rows + cols) / 2
+
+
+def estimate_cutoff(spectrum):
+    """返回有效截止频率占奈奎斯特频率的比例（1.0 表示未发现高频缺失）。"""
+    grid = np.linspace(0.0, 1.0, len(spectrum))
+    band = (grid >= FIT_BAND[0]) & (grid <= FIT_BAND[1])
+    log_grid = np.log(np.maximum(grid, 1e-9))
+    slope, intercept = np.polyfit(log_grid[band], spectrum[band], 1)
+    deficit = slope * log_grid + intercept - spectrum
+    deficit = np.convolve(deficit, np.ones(9) / 9, mode="same")
+    # 某频率之后的平均缺失，要求"持续"低于拟合值，排除单点噪声
+    tail = np.cumsum(deficit[::-1])[::-1] / np.arange(len(deficit), 0, -1)
+    hits = np.flatnonzero(
+        (deficit >= DEFICIT_THRESHOLD) & (tail >= DEFICIT_THRESHOLD) & (grid > FIT_BAND[1])
+    )
+    return float(grid[hits[0]]) if len(hits) else 1.0
+
+
+def _line_spectrum(lines):
+    n = lines.shape[1]
+    lines = lines - lines.mean(axis=1, keepdims=True)
+    power = np.abs(np.fft.rfft(lines * np.hanning(n).astype(np.float32), axis=1)) ** 2
+    power = power.mean(axis=0)
+    return np.interp(
+        np.linspace(0.0, 1.0, SPECTRUM_BINS),
+        np.linspace(0.0, 1.0, len(power)),
+        np.log(power + 1e-6),
+    )
+
+
+def _trim_borders(gray, threshold=2.0):
+    """去掉上下/左右的黑边（遮幅），否则黑边的硬边缘会给高频带来大量能量。"""
+    rows = np.flatnonzero(gray.std(axis=1) > threshold)
+    cols = np.flatnonzero(gray.std(axis=0) > threshold)
+    if not len(rows) or not len(cols):
+        return gray[:0, :0]
+    return gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
@@ -9,9 +9,9 @@ import os
 import json
 import re
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-import cv2
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLineEdit, QTableWidget, QTableWidgetItem, QFileDialog,
@@ -25,6 +25,9 @@ from PyQt6.QtGui import (
     QLinearGradient, QPalette, QIcon,
 )
 
+from video_analyzer import ANALYSIS_VERSION, ANALYZE_WORKERS, analyze_video, init_worker
+from video_probe import ProbeCache, probe_video, scan_video_files
+
 VIDEO_EXTENSIONS = {
     '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv',
     '.webm', '.m4v', '.ts', '.mpg', '.mpeg', '.rmvb', '.rm',
@@ -32,6 +35,9 @@ VIDEO_EXTENSIONS = {
 
 SETTINGS_FILE = Path(__file__).parent / "inspector_settings.json"
 
+# 并发探测数；NAS 上主要是网络 I/O 等待，可以比 CPU 核数多
+PROBE_WORKERS = 8
+
 # ── 分辨率 / 帧率分级 ──────────────────────────────────────────────
 
 RESOLUTION_TIERS = [
@@ -137,20 +143,23 @@ def classify_fps(fps):
     return f"{fps:.0f}fps", "#868E96"
 
 
-# 疑似假分辨率检测 —— 码率(kbps)低于阈值则标记
-# 阈值参考: 真4K60fps通常 30Mbps+, 真4K30fps通常 15Mbps+
-FAKE_RES_THRESHOLDS = {
-    "4K":    15_000,   # 低于 15 Mbps 疑似假4K
-    "2K":     8_000,   # 低于 8 Mbps 疑似假2K
-    "1080p":  3_000,   # 低于 3 Mbps 疑似假1080p
-}
+# 疑似假分辨率检测 —— 抽帧分析出的有效分辨率（见 video_analyzer）低于标称等级则标记
+FAKE_CHECK_TIERS = ("4K", "2K", "1080p")
 FAKE_COLOR = "#FFD43B"  # 黄色警告
+# 有效/标称之比低于此值才考虑标记：略低于 1.0（如 0.99×3840 落入 2K 档）多是柔焦、
+# 降噪或压缩造成的，不应仅因跨档就报警
+FAKE_RATIO_MAX = 0.75
 
 
-def check_fake_resolution(res_label, bitrate_kbps):
-    """码率过低时返回警告文字和颜色，否则返回 None。"""
-    threshold = FAKE_RES_THRESHOLDS.get(res_label)
-    if threshold and bitrate_kbps > 0 and bitrate_kbps < threshold:
+def check_fake_resolution(res_label, analysis):
+    """有效分辨率明显偏低且等级低于标称等级时返回警告文字和颜色，否则返回 None。"""
+    if res_label not in FAKE_CHECK_TIERS or not analysis or not analysis["frames"]:
+        return None
+    if analysis["ratio"] >= FAKE_RATIO_MAX:
+        return None
+    eff_label, _ = classify_resolution(analysis["width"], analysis["height"])
+    order = [tier[2] for tier in RESOLUTION_TIERS] + ["低清"]
+    if order.index(eff_label) > order.index(res_label):
         return f"{res_label} ⚠疑似假", FAKE_COLOR
     return None
 
@@ -195,6 +204,7 @@ def load_settings():
         "last_folder": "",
         "video2x_path": VIDEO2X_DEFAULT_PATH,
         "gpu_device": 1,
+        "analyze_resolution": True,
     }
     if SETTINGS_FILE.exists():
         try:
@@ -276,62 +286,138 @@ class BackgroundWidget(QWidget):
 class ScanThread(QThread):
     progress = pyqtSignal(int, int)
     result = pyqtSignal(dict)
+    analysis_progress = pyqtSignal(int, int)
+    analyzed = pyqtSignal(str, dict)          # path, 分析结果
     finished_scan = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, folder, recursive=True):
+    def __init__(self, folder, recursive=True, analyze=True):
         super().__init__()
         self.folder = folder
         self.recursive = recursive
+        self.analyze = analyze
         self._stop = False
 
     def stop(self):
         self._stop = True
 
     def run(self):
-        root = Path(self.folder)
-        files = []
-        iterator = root.rglob("*") if self.recursive else root.iterdir()
-        for f in iterator:
-            if f.is_file() and f.suffix.lower() in VIDEO_EXTENSIONS:
-                files.append(f)
-
+        files = scan_video_files(self.folder, VIDEO_EXTENSIONS, self.recursive)
         total = len(files)
-        for i, fp in enumerate(files):
-            if self._stop:
-                break
-            self.progress.emit(i + 1, total)
-            try:
-                cap = cv2.VideoCapture(str(fp))
-                if not cap.isOpened():
-                    self.error.emit(f"无法打开: {fp.name}")
+        done = 0
+        targets = []   # 需要做清晰度分析的 (path, size, mtime_ns)
+        cache = ProbeCache()
+        try:
+            # 缓存命中的先直接出结果，其余交给线程池（读文件头 / OpenCV 以 I/O 为主）
+            pending = []
+            for path, size, mtime_ns in files:
+                if self._stop:
+                    break
+                meta = cache.get(path, size, mtime_ns)
+                if meta is None:
+                    pending.append((path, size, mtime_ns))
                     continue
-                w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-                fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
-                codec = "".join(
-                    chr((fourcc >> 8 * i) & 0xFF) for i in range(4)
-                ).strip('\x00')
-                cap.release()
-
-                size = fp.stat().st_size
-                dur = frames / fps if fps > 0 else 0
-                bitrate = (size * 8 / dur / 1000) if dur > 0 else 0
-
-                self.result.emit({
-                    "path": str(fp), "name": fp.name,
-                    "width": w, "height": h,
-                    "fps": round(fps, 2), "codec": codec,
-                    "duration": dur, "bitrate": bitrate,
-                    "file_size": size,
-                })
-            except Exception as e:
-                self.error.emit(f"{fp.name}: {e}")
+                done += 1
+                self.progress.emit(done, total)
+                self._emit_result(path, size, mtime_ns, meta, targets)
+
+            if pending and not self._stop:
+                pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+                futures = {
+                    pool.submit(probe_video, path): (path, size, mtime_ns)
+                    for path, size, mtime_ns in pending
+                }
+                try:
+                    for future in as_completed(futures):
+                        if self._stop:
+                            break
+                        path, size, mtime_ns = futures[future]
+                        done += 1
+                        self.progress.emit(done, total)
+                        name = os.path.basename(path)
+                        try:
+                            meta = future.result()
+                        except Exception as e:
+                            self.error.emit(f"{name}: {e}")
+                            continue
+                        if meta is None:
+                            self.error.emit(f"无法打开: {name}")
+                            continue
+                        cache.put(path, size, mtime_ns, meta)
+                        self._emit_result(path, size, mtime_ns, meta, targets)
+                finally:
+                    pool.shutdown(wait=True, cancel_futures=True)
+
+            if self.analyze and targets and not self._stop:
+                self._analyze(targets, cache)
+        finally:
+            cache.close()
 
         self.finished_scan.emit()
 
+    def _emit_result(self, path, size, mtime_ns, meta, targets):
+        info = self._build_info(path, size, meta)
+        self.result.emit(info)
+        res_label, _ = classify_resolution(info["width"], info["height"])
+        if res_label in FAKE_CHECK_TIERS:
+            targets.append((path, size, mtime_ns))
+
+    def _analyze(self, targets, cache):
+        """清晰度分析：解码 + FFT 吃 CPU，放进程池；结果按完成顺序推给界面并写缓存。"""
+        total = len(targets)
+        done = 0
+        pending = []
+        for path, size, mtime_ns in targets:
+            result = cache.get_analysis(path, size, mtime_ns, ANALYSIS_VERSION)
+            if result is None:
+                pending.append((path, size, mtime_ns))
+                continue
+            done += 1
+            self.analysis_progress.emit(done, total)
+            self.analyzed.emit(path, result)
+        if not pending or self._stop:
+            return
+
+        pool = ProcessPoolExecutor(
+            max_workers=min(ANALYZE_WORKERS, len(pending)), initializer=init_worker,
+        )
+        futures = {
+            pool.submit(analyze_video, path): (path, size, mtime_ns)
+            for path, size, mtime_ns in pending
+        }
+        try:
+            for future in as_completed(futures):
+                if self._stop:
+                    break
+                path, size, mtime_ns = futures[future]
+                done += 1
+                self.analysis_progress.emit(done, total)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.error.emit(f"{os.path.basename(path)} 清晰度分析失败: {e}")
+                    continue
+                if result is None:
+                    continue
+                cache.put_analysis(path, size, mtime_ns, ANALYSIS_VERSION, result)
+                self.analyzed.emit(path, result)
+        finally:
+            # 停止时不等正在分析的文件（各自受时间预算约束），只取消排队中的任务
+            pool.shutdown(wait=not self._stop, cancel_futures=True)
+
+    @staticmethod
+    def _build_info(path, size, meta):
+        fps = meta["fps"]
+        dur = meta["duration"]
+        bitrate = (size * 8 / dur / 1000) if dur > 0 else 0
+        return {
+            "path": path, "name": os.path.basename(path),
+            "width": meta["width"], "height": meta["height"],
+            "fps": round(fps, 2), "codec": meta["codec"],
+            "duration": dur, "bitrate": bitrate,
+            "file_size": size,
+        }
+
 
 # ── Video2X AI 修复线程 ────────────────────────────────────────────
 
@@ -788,6 +874,7 @@ class MainWindow(QMainWindow):
         self.scan_thread = None
         self.convert_thread = None
         self.video_count = {"4K": 0, "2K": 0, "1080p": 0, "720p": 0, "其他": 0}
+        self._res_items = {}   # path -> (等级列 item, 标称等级)，用于回填清晰度分析结果
         self._v2x_exe = find_video2x(self.settings)
         self._init_ui()
         self._apply_theme()
@@ -834,6 +921,12 @@ class MainWindow(QMainWindow):
         self.recursive_cb.setChecked(True)
         fc_layout.addWidget(self.recursive_cb)
 
+        self.analyze_cb = QCheckBox("清晰度分析")
+        self.analyze_cb.setToolTip("抽帧分析 4K/2K/1080p 视频的有效分辨率，标记放大得来的疑似假分辨率")
+        self.analyze_cb.setChecked(self.settings.get("analyze_resolution", True))
+        self.analyze_cb.toggled.connect(self._toggle_analyze)
+        fc_layout.addWidget(self.analyze_cb)
+
         self.scan_btn = QPushButton("开始扫描")
         self.scan_btn.setObjectName("primaryBtn")
         self.scan_btn.setFixedWidth(110)
@@ -1151,14 +1244,19 @@ class MainWindow(QMainWindow):
         self.table.setSortingEnabled(False)
         self.table.setRowCount(0)
         self.video_count = {"4K": 0, "2K": 0, "1080p": 0, "720p": 0, "其他": 0}
+        self._res_items = {}
         self.progress.setVisible(True)
         self.progress.setValue(0)
         self.scan_btn.setText("停止")
         self.statusBar().showMessage("扫描中...")
 
-        self.scan_thread = ScanThread(folder, self.recursive_cb.isChecked())
+        self.scan_thread = ScanThread(
+            folder, self.recursive_cb.isChecked(), self.analyze_cb.isChecked(),
+        )
         self.scan_thread.progress.connect(self._on_progress)
         self.scan_thread.result.connect(self._on_result)
+        self.scan_thread.analysis_progress.connect(self._on_analysis_progress)
+        self.scan_thread.analyzed.connect(self._on_analyzed)
         self.scan_thread.finished_scan.connect(self._on_finished)
         self.scan_thread.error.connect(self._on_error)
         self.scan_thread.start()
@@ -1184,11 +1282,6 @@ class MainWindow(QMainWindow):
             self.video_count["其他"] += 1
         self._update_stats()
 
-        # 再做假分辨率检测（会改变显示文字）
-        fake = check_fake_resolution(res_label, info["bitrate"])
-        if fake:
-            res_label, res_color = fake
-
         # 勾选框
         cb = QCheckBox()
         cb_w = QWidget()
@@ -1226,8 +1319,35 @@ class MainWindow(QMainWindow):
                 item.setTextAlignment(
                     Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
                 )
+            if col == COL_RES_LABEL:
+                self._res_items[info["path"]] = (item, res_label)
             self.table.setItem(row, col, item)
 
+    def _on_analysis_progress(self, current, total):
+        self.progress.setMaximum(total)
+        self.progress.setValue(current)
+        self.progress.setFormat(f"清晰度分析 {current}/{total}")
+        self.statusBar().showMessage("清晰度分析中...")
+
+    def _on_analyzed(self, path, analysis):
+        """清晰度分析结果回填到等级列（统计仍按标称等级，不受影响）。"""
+        entry = self._res_items.get(path)
+        if not entry:
+            return
+        item, res_label = entry
+        tip = f"估计有效分辨率 ≈ {analysis['width']} × {analysis['height']}（{analysis['frames']} 帧"
+        if analysis["partial"]:
+            tip += "，超时未取满"
+        item.setToolTip(tip + "）")
+        fake = check_fake_resolution(res_label, analysis)
+        if fake:
+            item.setText(fake[0])
+            item.setForeground(QColor(fake[1]))
+
+    def _toggle_analyze(self, checked):
+        self.settings["analyze_resolution"] = checked
+        save_settings(self.settings)
+
     def _on_finished(self):
         self.table.setSortingEnabled(True)
         self.progress.setVisible(False)
@@ -0,0 +1,434 @@
+"""
+视频元信息探测 —— 容器头快速解析 + OpenCV 回退 + SQLite 持久缓存（探测与清晰度分析结果）。
+
+MP4/MOV/M4V 直接读 moov，MKV/WebM 直接读 EBML 头中的 Info/Tracks，
+只读几十 KB 就能拿到分辨率、帧率、时长；解析不了的（AVI、TS、分片 MP4、
+缺少 DefaultDuration 的 MKV 等）再交给 cv2.VideoCapture。
+"""
+
+import json
+import os
+import sqlite3
+import struct
+from pathlib import Path
+
+CACHE_FILE = Path(__file__).parent / "inspector_cache.sqlite3"
+CACHE_COMMIT_EVERY = 200
+
+# moov 超过这个大小（极长的录像）就不整块读入，交给 OpenCV
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+# MKV 在 Segment 内最多查看这么多个顶层元素仍找不到 Info/Tracks 就放弃
+MAX_EBML_ELEMENTS = 64
+
+MKV_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264",
+    "V_MPEGH/ISO/HEVC": "hevc",
+    "V_AV1": "av01",
+    "V_VP9": "vp09",
+    "V_VP8": "vp08",
+    "V_MPEG4/ISO/ASP": "mp4v",
+    "V_MPEG2": "mpg2",
+    "V_MS/VFW/FOURCC": "vfw",
+}
+
+
+def scan_video_files(folder, extensions, recursive=True):
+    """遍历目录，返回 [(路径, 大小, mtime_ns)]。
+
+    用 os.scandir 一次拿到类型和 stat，避免 rglob + is_file + stat 对每个文件多次访问 NAS。
+    """
+    files = []
+    stack = [str(folder)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                # 与原先的 rglob 一致：不进入目录符号链接/联接点，指回上级的链接会无限循环、重复计数
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        subdirs.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                    st = entry.stat()
+                    files.append((entry.path, st.st_size, st.st_mtime_ns))
+            except OSError:
+                continue
+        # 逆序压栈，保证按目录名顺序遍历
+        stack.extend(reversed(subdirs))
+    return files
+
+
+def probe_video(path):
+    """返回 {"width", "height", "fps", "codec", "duration"}，打不开时返回 None。"""
+    try:
+        meta = probe_header(path)
+    except (OSError, ValueError, IndexError, struct.error):
+        # 截断或损坏的头部可能在任何一步越界，统一交给 OpenCV
+        meta = None
+    if meta is None:
+        meta = _probe_opencv(path)
+    return meta
+
+
+def probe_header(path):
+    """只解析容器头；格式不支持或信息不完整时返回 None。"""
+    with open(path, "rb") as f:
+        magic = f.read(12)
+        f.seek(0)
+        if magic[:4] == b"\x1a\x45\xdf\xa3":
+            meta = _probe_mkv(f)
+        elif magic[4:8] in (b"ftyp", b"moov", b"free", b"mdat", b"wide", b"skip"):
+            meta = _probe_mp4(f)
+        else:
+            return None
+    if not meta or meta["width"] <= 0 or meta["height"] <= 0:
+        return None
+    if meta["fps"] <= 0 or meta["duration"] <= 0:
+        return None
+    return meta
+
+
+def _probe_opencv(path):
+    import cv2
+
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            return None
+        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    finally:
+        cap.release()
+    codec = "".join(
+        chr((fourcc >> 8 * i) & 0xFF) for i in range(4)
+    ).strip('\x00')
+    return {
+        "width": w, "height": h, "fps": fps, "codec": codec,
+        "duration": frames / fps if fps > 0 else 0,
+    }
+
+
+# ── MP4 / MOV ──────────────────────────────────────────────────────
+
+def _iter_boxes(buf, start=0, end=None):
+    end = len(buf) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _find_box(buf, path, start=0, end=None):
+    for kind, body, box_end in _iter_boxes(buf, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return body, box_end
+            found = _find_box(buf, path[1:], body, box_end)
+            if found:
+                return found
+    return None
+
+
+def _read_moov(f):
+    """顺序跳过顶层 box（mdat 只 seek 不读），返回 moov 内容。"""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack_from(">I4s", header)
+        header_len = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_len:
+            return None
+        if kind == b"moov":
+            if size > MAX_MOOV_BYTES:
+                return None
+            f.seek(pos)
+            data = f.read(size)
+            return data if len(data) == size else None
+        pos += size
+    return None
+
+
+def _probe_mp4(f):
+    moov = _read_moov(f)
+    if moov is None:
+        return None
+    for kind, body, end in _iter_boxes(moov, 8):
+        if kind != b"trak":
+            continue
+        hdlr = _find_box(moov, (b"mdia", b"hdlr"), body, end)
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        return _parse_video_trak(moov, body, end)
+    return None
+
+
+def _parse_video_trak(moov, body, end):
+    mdhd = _find_box(moov, (b"mdia", b"mdhd"), body, end)
+    stbl = _find_box(moov, (b"mdia", b"minf", b"stbl"), body, end)
+    if not mdhd or not stbl:
+        return None
+
+    pos = mdhd[0]
+    if moov[pos] == 1:
+        timescale, duration = struct.unpack_from(">IQ", moov, pos + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", moov, pos + 12)
+
+    stsd = _find_box(moov, (b"stsd",), *stbl)
+    if not stsd:
+        return None
+    # stsd: version/flags(4) + entry_count(4)，首个条目: size(4) + 格式(4) + 保留(6)
+    # + data_ref(2) + 预留(16) + width(2) + height(2)
+    entry = stsd[0] + 8
+    codec = moov[entry + 4:entry + 8].decode("latin-1")
+    width, height = struct.unpack_from(">HH", moov, entry + 32)
+
+    samples = 0
+    stsz = _find_box(moov, (b"stsz",), *stbl)
+    if stsz:
+        samples = struct.unpack_from(">I", moov, stsz[0] + 8)[0]
+    else:
+        stts = _find_box(moov, (b"stts",), *stbl)
+        if stts:
+            count = struct.unpack_from(">I", moov, stts[0] + 4)[0]
+            for i in range(count):
+                samples += struct.unpack_from(">I", moov, stts[0] + 8 + i * 8)[0]
+
+    seconds = duration / timescale if timescale else 0
+    return {
+        "width": width, "height": height,
+        "fps": samples / seconds if seconds > 0 else 0,
+        "codec": codec.strip("\x00 "), "duration": seconds,
+    }
+
+
+# ── MKV / WebM ─────────────────────────────────────────────────────
+
+EBML_HEADER = 0x1A45DFA3
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TRACKS = 0x1654AE6B
+EBML_CLUSTER = 0x1F43B675
+EBML_TIMESTAMP_SCALE = 0x2AD7B1
+EBML_DURATION = 0x4489
+EBML_TRACK_ENTRY = 0xAE
+EBML_TRACK_TYPE = 0x83
+EBML_CODEC_ID = 0x86
+EBML_DEFAULT_DURATION = 0x23E383
+EBML_VIDEO = 0xE0
+EBML_PIXEL_WIDTH = 0xB0
+EBML_PIXEL_HEIGHT = 0xBA
+
+
+def _read_vint(data, pos, keep_marker):
+    if pos >= len(data):
+        raise ValueError("truncated EBML vint")
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or len(data) < pos + length:
+        raise ValueError("invalid EBML vint")
+    value = first if keep_marker else first & (mask - 1)
+    unknown = not keep_marker and value == mask - 1
+    for b in data[pos + 1:pos + length]:
+        value = (value << 8) | b
+        unknown = unknown and b == 0xFF
+    return value, pos + length, unknown
+
+
+def _read_element_header(f):
+    head = f.read(12)
+    if len(head) < 2:
+        return None
+    eid, pos, _ = _read_vint(head, 0, True)
+    size, pos, unknown = _read_vint(head, pos, False)
+    f.seek(pos - len(head), os.SEEK_CUR)
+    return eid, (None if unknown else size)
+
+
+def _iter_elements(data, start=0, end=None):
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        eid, pos, _ = _read_vint(data, pos, True)
+        size, pos, _ = _read_vint(data, pos, False)
+        yield eid, data[pos:pos + size]
+        pos += size
+
+
+def _uint(data):
+    return int.from_bytes(data, "big")
+
+
+def _float(data):
+    if len(data) == 4:
+        return struct.unpack(">f", data)[0]
+    if len(data) == 8:
+        return struct.unpack(">d", data)[0]
+    return 0.0
+
+
+def _probe_mkv(f):
+    element = _read_element_header(f)
+    if not element or element[0] != EBML_HEADER or element[1] is None:
+        return None
+    f.seek(element[1], os.SEEK_CUR)
+    element = _read_element_header(f)
+    if not element or element[0] != EBML_SEGMENT:
+        return None
+
+    info = tracks = None
+    for _ in range(MAX_EBML_ELEMENTS):
+        element = _read_element_header(f)
+        if element is None:
+            break
+        eid, size = element
+        if size is None or eid == EBML_CLUSTER:
+            # 到簇数据（或未知长度元素）还没找到 Info/Tracks，不再继续
+            break
+        if eid in (EBML_INFO, EBML_TRACKS):
+            data = f.read(size)
+            if eid == EBML_INFO:
+                info = data
+            else:
+                tracks = data
+            if info is not None and tracks is not None:
+                break
+        else:
+            f.seek(size, os.SEEK_CUR)
+    if info is None or tracks is None:
+        return None
+
+    scale, duration = 1_000_000, 0.0
+    for eid, data in _iter_elements(info):
+        if eid == EBML_TIMESTAMP_SCALE:
+            scale = _uint(data)
+        elif eid == EBML_DURATION:
+            duration = _float(data)
+
+    for eid, entry in _iter_elements(tracks):
+        if eid != EBML_TRACK_ENTRY:
+            continue
+        fields = dict(_iter_elements(entry))
+        if _uint(fields.get(EBML_TRACK_TYPE, b"")) != 1:
+            continue
+        video = dict(_iter_elements(fields.get(EBML_VIDEO, b"")))
+        frame_ns = _uint(fields.get(EBML_DEFAULT_DURATION, b""))
+        codec_id = fields.get(EBML_CODEC_ID, b"").decode("ascii", "replace").rstrip("\x00")
+        return {
+            "width": _uint(video.get(EBML_PIXEL_WIDTH, b"")),
+            "height": _uint(video.get(EBML_PIXEL_HEIGHT, b"")),
+            "fps": 1e9 / frame_ns if frame_ns else 0,
+            "codec": MKV_CODECS.get(codec_id, codec_id),
+            "duration": duration * scale / 1e9,
+        }
+    return None
+
+
+# ── 持久缓存 ───────────────────────────────────────────────────────
+
+class ProbeCache:
+    """以 (路径, 大小, mtime_ns) 为键缓存探测结果和清晰度分析结果；只能在创建它的线程中使用。"""
+
+    def __init__(self, db_path=CACHE_FILE):
+        self._conn = None
+        self._pending = 0
+        try:
+            self._conn = sqlite3.connect(str(db_path))
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probe ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, meta TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, version INTEGER, result TEXT)"
+            )
+        except sqlite3.Error:
+            # 缓存不可用（只读目录、文件损坏）时退化为不缓存
+            self._conn = None
+
+    def get(self, path, size, mtime_ns):
+        return self._select(
+            "SELECT meta FROM probe WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns),
+        )
+
+    def put(self, path, size, mtime_ns, meta):
+        self._write(
+            "INSERT OR REPLACE INTO probe (path, size, mtime_ns, meta) VALUES (?, ?, ?, ?)",
+            (path, size, mtime_ns, json.dumps(meta)),
+        )
+
+    def get_analysis(self, path, size, mtime_ns, version):
+        return self._select(
+            "SELECT result FROM analysis WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+            (path, size, mtime_ns, version),
+        )
+
+    def put_analysis(self, path, size, mtime_ns, version, result):
+        self._write(
+            "INSERT OR REPLACE INTO analysis (path, size, mtime_ns, version, result) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, version, json.dumps(result)),
+        )
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.commit()
+            self._conn.close()
+        except sqlite3.Error:
+            pass
+        self._conn = None
+
+    def _select(self, sql, params):
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(sql, params).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _write(self, sql, params):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(sql, params)
+            self._pending += 1
+            if self._pending >= CACHE_COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+        except sqlite3.Error:
+            pass